@@ -0,0 +1,5 @@
+"""
+Benchmarks for paraview_wrapper, run on synthetic Nektar-like output so that they don't
+depend on real simulation data. Run with
+    python -m benchmarks --help
+"""
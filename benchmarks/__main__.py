@@ -0,0 +1,74 @@
+import argparse
+import json
+import sys
+
+from .batch_check import check_batch
+from .leaks import check_leaks
+from .runner import compare_results, run_benchmarks, write_results
+from .scenarios import SCENARIOS
+from .synthetic import SIZES
+
+parser = argparse.ArgumentParser(
+    prog="python -m benchmarks",
+    description="Time paraview_wrapper scenarios on synthetic data",
+)
+parser.add_argument("-w", "--work-dir", default="bench_work")
+parser.add_argument("-o", "--output", default="bench_results.json")
+parser.add_argument("-s", "--scenarios", nargs="+", choices=list(SCENARIOS))
+parser.add_argument("--size", choices=list(SIZES), default="small")
+parser.add_argument("-p", "--npartitions", type=int, default=1)
+parser.add_argument("-r", "--repeats", type=int, default=3)
+parser.add_argument("-c", "--compare", help="Baseline results JSON to compare against")
+parser.add_argument(
+    "-t",
+    "--threshold",
+    type=float,
+    default=0.1,
+    help="Fractional slow-down counted as a regression",
+)
+parser.add_argument(
+    "--leak-check",
+    type=int,
+    metavar="NJOBS",
+    help="Instead of timing, run each scenario NJOBS times in one process and check "
+    "for growth in memory use and registered proxies",
+)
+parser.add_argument(
+    "--batch-check",
+    action="store_true",
+    help="Instead of timing, run trivial jobs through run_egs.py and the batch runner",
+)
+args = parser.parse_args()
+
+if args.batch_check:
+    batch_results = check_batch(args.work_dir)
+    write_results(batch_results, args.output)
+    sys.exit(0 if batch_results["passed"] else 1)
+
+if args.leak_check:
+    leak_results = {
+        name: check_leaks(
+            args.work_dir,
+            scenario=name,
+            njobs=args.leak_check,
+            size=args.size,
+            npartitions=args.npartitions,
+        )
+        for name in args.scenarios or ["gen_img", "fluid_slice"]
+    }
+    write_results(leak_results, args.output)
+    sys.exit(1 if any(r["leaked"] for r in leak_results.values()) else 0)
+
+results = run_benchmarks(
+    args.work_dir,
+    scenarios=args.scenarios,
+    size=args.size,
+    npartitions=args.npartitions,
+    repeats=args.repeats,
+)
+write_results(results, args.output)
+if args.compare:
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    if compare_results(baseline, results, threshold=args.threshold):
+        sys.exit(1)
@@ -0,0 +1,75 @@
+"""
+End-to-end check of the batch runner as run_egs.py drives it: a copy of run_egs.py runs
+a trivial job file, so the jobs' spawned workers re-import the script just as they do
+for the real examples.
+"""
+
+import json
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_marker(fpath, text="ok"):
+    """
+    Trivial job: write <text> to <fpath>.
+    """
+    with open(fpath, "w") as f:
+        f.write(text)
+
+
+def check_batch(work_dir, njobs=2, nworkers=2, timeout=120):
+    """
+    Run <njobs> trivial jobs through a copy of run_egs.py in <work_dir>, then run it
+    again to check that the (now up to date) jobs are skipped.
+    Returns results as a JSON-serialisable dict.
+    """
+    check_dir = os.path.abspath(os.path.join(work_dir, "batch_check"))
+    shutil.rmtree(check_dir, ignore_errors=True)
+    os.makedirs(check_dir)
+    shutil.copy(os.path.join(_REPO_DIR, "run_egs.py"), check_dir)
+    marker_fpaths = [os.path.join(check_dir, f"marker_{i}.txt") for i in range(njobs)]
+    jobs = [
+        dict(
+            name=f"marker_{i}",
+            entry_point="benchmarks.batch_check.write_marker",
+            args=[fpath],
+            outputs=[fpath],
+        )
+        for i, fpath in enumerate(marker_fpaths)
+    ]
+    with open(os.path.join(check_dir, "example_jobs.json"), "w") as f:
+        json.dump(dict(jobs=jobs), f, indent=1)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [_REPO_DIR] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+
+    def run_egs():
+        proc = subprocess.run(
+            [sys.executable, "run_egs.py", "-n", str(nworkers)],
+            cwd=check_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        return proc.returncode, proc.stdout + proc.stderr
+
+    returncode, output = run_egs()
+    ran = returncode == 0 and all(os.path.isfile(p) for p in marker_fpaths)
+    returncode_rerun, output_rerun = run_egs()
+    skipped = returncode_rerun == 0 and f"{njobs} up to date" in output_rerun
+    passed = ran and skipped
+    print(
+        f"batch check: jobs {'ran' if ran else 'FAILED'}, "
+        f"rerun {'skipped them' if skipped else 'did NOT skip them'}"
+    )
+    if not passed:
+        print(output if not ran else output_rerun)
+    return dict(njobs=njobs, ran=ran, skipped=skipped, passed=passed)
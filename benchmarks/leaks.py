@@ -0,0 +1,81 @@
+"""
+Leak check: run a scenario many times in one process, as a batch session would, and
+check that the number of registered pipeline proxies and the RSS stay flat.
+"""
+
+import multiprocessing
+import os
+import os.path
+
+from .runner import get_synthetic_run
+from .scenarios import SCENARIOS
+
+
+def _run_jobs(name, run, output_dir, njobs):
+    from paraview_wrapper.utils.memory import get_rss
+    from paraview_wrapper.utils.pipeline import count_proxies
+
+    rss, nproxies = [], []
+    for ijob in range(njobs):
+        SCENARIOS[name](run, output_dir)
+        rss.append(get_rss())
+        nproxies.append(count_proxies())
+        if (ijob + 1) % 10 == 0:
+            print(
+                f"  job {ijob + 1}/{njobs}: RSS {rss[-1] / 2**20:.1f} MB, "
+                f"{nproxies[-1]} proxies"
+            )
+    return rss, nproxies
+
+
+def check_leaks(
+    work_dir,
+    scenario="gen_img",
+    njobs=100,
+    size="small",
+    npartitions=1,
+    warmup_fraction=0.1,
+    rss_tolerance_MB=50.0,
+):
+    """
+    Run <scenario> <njobs> times in a fresh process, recording RSS and the number of
+    registered proxies after each job. Growth is measured from the end of the warm-up
+    jobs (the first <warmup_fraction>, which fill caches etc.) to the last job; any
+    proxy growth or RSS growth above <rss_tolerance_MB> counts as a leak.
+    Returns results as a JSON-serialisable dict.
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(
+            f"check_leaks: unknown scenario {scenario}; choose from {list(SCENARIOS)}"
+        )
+    run = get_synthetic_run(work_dir, size=size, npartitions=npartitions)
+    output_dir = os.path.join(work_dir, "output", f"leaks_{scenario}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Running {scenario} {njobs} times...")
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        rss, nproxies = pool.apply(_run_jobs, (scenario, run, output_dir, njobs))
+
+    iref = min(int(warmup_fraction * njobs), njobs - 1)
+    rss_growth_MB = None
+    if rss[iref] is not None and rss[-1] is not None:
+        rss_growth_MB = (rss[-1] - rss[iref]) / 2**20
+    proxy_growth = nproxies[-1] - nproxies[iref]
+    leaked = proxy_growth > 0 or (
+        rss_growth_MB is not None and rss_growth_MB > rss_tolerance_MB
+    )
+    rss_str = "unknown" if rss_growth_MB is None else f"{rss_growth_MB:+.1f} MB"
+    print(
+        f"{scenario}: RSS {rss_str}, proxies {proxy_growth:+d} after job {iref + 1}"
+        f"{'  <-- leak' if leaked else ''}"
+    )
+    return dict(
+        scenario=scenario,
+        njobs=njobs,
+        rss_MB=[None if r is None else r / 2**20 for r in rss],
+        nproxies=nproxies,
+        rss_growth_MB=rss_growth_MB,
+        proxy_growth=proxy_growth,
+        leaked=leaked,
+    )
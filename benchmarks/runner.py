@@ -0,0 +1,145 @@
+"""
+Run benchmark scenarios and write/compare JSON results.
+Each scenario runs in a fresh process, so that ParaView state from one scenario can't
+affect the next; import time isn't included in the timings.
+"""
+
+import datetime
+import json
+import multiprocessing
+import os
+import os.path
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from .scenarios import SCENARIOS
+from .synthetic import make_synthetic_run
+
+
+def _time_scenario(name, run, output_dir, repeats, warmup):
+    # Untimed run, so that imports and first-use costs aren't included
+    if warmup:
+        SCENARIOS[name](run, output_dir)
+    times = []
+    for _ in range(repeats):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        SCENARIOS[name](run, output_dir)
+        times.append(
+            (time.perf_counter() - wall_start, time.process_time() - cpu_start)
+        )
+    return times
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_synthetic_run(work_dir, size="small", npartitions=1):
+    """
+    Description of the synthetic run for <size> and <npartitions> in <work_dir>,
+    generating it if it isn't already there.
+    """
+    data_dir = os.path.join(work_dir, f"data_{size}_p{npartitions}")
+    run_fpath = os.path.join(data_dir, "run.json")
+    if os.path.isfile(run_fpath):
+        with open(run_fpath) as f:
+            return json.load(f)
+    run = make_synthetic_run(data_dir, size=size, npartitions=npartitions)
+    with open(run_fpath, "w") as f:
+        json.dump(run, f)
+    return run
+
+
+def run_benchmarks(
+    work_dir,
+    scenarios=None,
+    size="small",
+    npartitions=1,
+    repeats=3,
+    warmup=True,
+):
+    """
+    Generate a synthetic run in <work_dir> (reused if already present) and time each
+    scenario <repeats> times, after an untimed warm-up run if <warmup> is set.
+    Returns results as a JSON-serialisable dict.
+    """
+    scenarios = list(SCENARIOS.keys()) if scenarios is None else scenarios
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise ValueError(
+                f"run_benchmarks: unknown scenario {name}; choose from {list(SCENARIOS)}"
+            )
+    run = get_synthetic_run(work_dir, size=size, npartitions=npartitions)
+
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for name in scenarios:
+        output_dir = os.path.join(work_dir, "output", name)
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"Running {name}...")
+        with ctx.Pool(1) as pool:
+            times = pool.apply(_time_scenario, (name, run, output_dir, repeats, warmup))
+        walls = [t[0] for t in times]
+        cpus = [t[1] for t in times]
+        results[name] = dict(
+            wall_s=walls,
+            cpu_s=cpus,
+            wall_min_s=min(walls),
+            wall_median_s=statistics.median(walls),
+            cpu_median_s=statistics.median(cpus),
+        )
+        print(f"  median wall {results[name]['wall_median_s']:.3f} s")
+
+    return dict(
+        meta=dict(
+            date=datetime.datetime.now().isoformat(),
+            git_commit=_git_commit(),
+            host=platform.node(),
+            platform=platform.platform(),
+            python=sys.version.split()[0],
+            size=size,
+            npartitions=npartitions,
+            repeats=repeats,
+            warmup=warmup,
+            run={k: v for k, v in run.items() if k != "fpaths"},
+        ),
+        results=results,
+    )
+
+
+def write_results(results, fpath):
+    with open(fpath, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote benchmark results to {fpath}")
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """
+    Print median wall time ratios (current/baseline) for scenarios present in both.
+    Returns the names of scenarios that are slower by more than <threshold>.
+    """
+    regressions = []
+    for name, cur in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        base_t = baseline["results"][name]["wall_median_s"]
+        cur_t = cur["wall_median_s"]
+        ratio = cur_t / base_t if base_t > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  <-- regression"
+        print(f"{name:>20}: {base_t:8.3f} s -> {cur_t:8.3f} s ({ratio:5.2f}x){flag}")
+    return regressions
@@ -0,0 +1,117 @@
+"""
+Timed benchmark scenarios. Each scenario takes a synthetic run (see
+synthetic.make_synthetic_run) and a scratch output directory.
+"""
+
+import json
+import os.path
+import subprocess
+import sys
+
+SCENARIOS = {}
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+@scenario
+def get_paths(run, output_dir):
+    from paraview_wrapper.utils.pv import get_paths
+
+    ext = "pvtu" if run["npartitions"] > 1 else "vtu"
+    get_paths(run["data_dir"], run["basename"], ext)
+
+
+@scenario
+def gen_movie(run, output_dir):
+    from paraview_wrapper.NESO import gen_movie
+
+    gen_movie(
+        run["arrays"][0],
+        run["data_dir"],
+        output_dir,
+        animation_settings=dict(ImageResolution=[640, 360]),
+        data_settings=dict(range=[0.0, 1.0]),
+        particle_fname=run["particle_fname"],
+        vtu_basename=run["basename"],
+    )
+
+
+@scenario
+def gen_img(run, output_dir):
+    from paraview_wrapper.NESO import gen_img
+
+    gen_img(
+        run["data_dir"],
+        run["arrays"][0],
+        run["nsteps"] // 2,
+        fluid_vtu_basename=run["basename"],
+        output_dir=output_dir,
+        part_data_fname=run["particle_fname"],
+    )
+
+
+@scenario
+def fluid_slice(run, output_dir):
+    from paraview_wrapper.NESO import fluid_slice
+
+    fluid_slice(
+        run["data_dir"],
+        run["arrays"][0],
+        output_dir=output_dir,
+        fluid_vtu_basename=run["basename"],
+    )
+
+
+@scenario
+def line_plot_1d(run, output_dir):
+    from paraview_wrapper.NESO import line_plot_1d
+
+    line_plot_1d(
+        [run["arrays"][0]],
+        run["data_dir"],
+        output_dir,
+        axis=0,
+        vtu_basename=run["basename"],
+    )
+
+
+@scenario
+def avi_to_mp4(run, output_dir):
+    from paraview_wrapper.utils.video import avi_to_mp4
+
+    from .synthetic import write_test_avi
+
+    fbase = "test_pattern"
+    if not os.path.isfile(os.path.join(output_dir, fbase + ".avi")):
+        write_test_avi(os.path.join(output_dir, fbase + ".avi"))
+    avi_to_mp4(output_dir, fbase)
+
+
+@scenario
+def import_time(run, output_dir):
+    """
+    Import the package and its non-rendering utilities in a fresh interpreter, checking
+    that doing so doesn't pull in ParaView.
+    """
+    script = "; ".join(
+        [
+            "import json, sys",
+            "import paraview_wrapper",
+            "from paraview_wrapper import avi_to_mp4, get_nektar_params",
+            "print(json.dumps(bool({'paraview', 'vtkmodules'} & set(sys.modules))))",
+        ]
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        cwd=_REPO_ROOT,
+        text=True,
+    )
+    if json.loads(result.stdout.strip().splitlines()[-1]):
+        raise RuntimeError("import_time: importing paraview_wrapper imported ParaView")
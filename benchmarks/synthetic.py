@@ -0,0 +1,294 @@
+"""
+Generators for synthetic Nektar-like output: (p)vtu series on a structured hex/quad mesh,
+H5Part particle files and a matching Nektar session XML.
+"""
+
+import os
+import os.path
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+# Preset sizes for generated runs
+SIZES = dict(
+    small=dict(dims=[16, 16, 4], nsteps=5, nparticles=1000),
+    medium=dict(dims=[64, 64, 16], nsteps=20, nparticles=100000),
+    large=dict(dims=[128, 128, 32], nsteps=50, nparticles=1000000),
+)
+
+
+def make_ugrid(dims, bounds):
+    """
+    Unstructured grid of dims[0] x dims[1] x dims[2] hexes covering <bounds>, or of
+    quads if dims[2] is 0.
+    """
+    from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+    from vtkmodules.vtkCommonCore import vtkPoints
+    from vtkmodules.vtkCommonDataModel import (
+        VTK_HEXAHEDRON,
+        VTK_QUAD,
+        vtkCellArray,
+        vtkUnstructuredGrid,
+    )
+
+    nx, ny, nz = dims
+    is_3d = nz > 0
+    npx, npy, npz = nx + 1, ny + 1, nz + 1 if is_3d else 1
+    x = np.linspace(bounds[0], bounds[1], npx)
+    y = np.linspace(bounds[2], bounds[3], npy)
+    z = np.linspace(bounds[4], bounds[5], npz) if is_3d else np.array([bounds[4]])
+    zz, yy, xx = np.meshgrid(z, y, x, indexing="ij")
+    pts = np.column_stack([xx.ravel(), yy.ravel(), zz.ravel()])
+
+    def node_idx(i, j, k):
+        return i + npx * (j + npy * k)
+
+    kk, jj, ii = np.meshgrid(
+        np.arange(max(nz, 1)), np.arange(ny), np.arange(nx), indexing="ij"
+    )
+    ii, jj, kk = ii.ravel(), jj.ravel(), kk.ravel()
+    corners = [
+        node_idx(ii, jj, kk),
+        node_idx(ii + 1, jj, kk),
+        node_idx(ii + 1, jj + 1, kk),
+        node_idx(ii, jj + 1, kk),
+    ]
+    if is_3d:
+        corners += [node_idx(*c) for c in [(ii, jj, kk + 1), (ii + 1, jj, kk + 1)]]
+        corners += [
+            node_idx(*c) for c in [(ii + 1, jj + 1, kk + 1), (ii, jj + 1, kk + 1)]
+        ]
+    conn = np.column_stack(corners).astype(np.int64)
+    ncells, npts_per_cell = conn.shape
+
+    ugrid = vtkUnstructuredGrid()
+    vtk_pts = vtkPoints()
+    vtk_pts.SetData(numpy_to_vtk(pts, deep=1))
+    ugrid.SetPoints(vtk_pts)
+    cells = vtkCellArray()
+    cells.SetData(
+        numpy_to_vtkIdTypeArray(
+            np.arange(0, (ncells + 1) * npts_per_cell, npts_per_cell, dtype=np.int64),
+            deep=1,
+        ),
+        numpy_to_vtkIdTypeArray(conn.ravel(), deep=1),
+    )
+    ugrid.SetCells(VTK_HEXAHEDRON if is_3d else VTK_QUAD, cells)
+    return ugrid
+
+
+def field_values(pts, t, iarr=0):
+    """
+    Smooth, time-dependent test field: a Gaussian blob drifting across the domain plus
+    a small wave, with a different phase for each array.
+    """
+    xmin, xmax = pts[:, 0].min(), pts[:, 0].max()
+    ymid = 0.5 * (pts[:, 1].min() + pts[:, 1].max())
+    width = 0.1 * (xmax - xmin) + 1e-12
+    xc = xmin + (0.2 + 0.6 * ((0.1 * t + 0.3 * iarr) % 1.0)) * (xmax - xmin)
+    blob = np.exp(-((pts[:, 0] - xc) ** 2 + (pts[:, 1] - ymid) ** 2) / width**2)
+    wave = 0.05 * np.sin(2 * np.pi * (pts[:, 0] - xmin) / (xmax - xmin) + t + iarr)
+    return blob + wave
+
+
+def _add_arrays(ugrid, arrays, t):
+    from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+
+    pts = vtk_to_numpy(ugrid.GetPoints().GetData())
+    for iarr, name in enumerate(arrays):
+        vtk_arr = numpy_to_vtk(field_values(pts, t, iarr), deep=1)
+        vtk_arr.SetName(name)
+        ugrid.GetPointData().AddArray(vtk_arr)
+
+
+def _write_vtu(ugrid, fpath):
+    from vtkmodules.vtkIOXML import vtkXMLUnstructuredGridWriter
+
+    writer = vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(fpath)
+    writer.SetInputData(ugrid)
+    writer.Write()
+
+
+def _write_pvtu(fpath, piece_fpaths, arrays):
+    root = ET.Element(
+        "VTKFile", type="PUnstructuredGrid", version="0.1", byte_order="LittleEndian"
+    )
+    pugrid = ET.SubElement(root, "PUnstructuredGrid", GhostLevel="0")
+    ppd = ET.SubElement(pugrid, "PPointData")
+    for name in arrays:
+        ET.SubElement(ppd, "PDataArray", type="Float64", Name=name)
+    ppts = ET.SubElement(pugrid, "PPoints")
+    ET.SubElement(ppts, "PDataArray", type="Float64", NumberOfComponents="3")
+    for piece_fpath in piece_fpaths:
+        ET.SubElement(
+            pugrid,
+            "Piece",
+            Source=os.path.relpath(piece_fpath, os.path.dirname(fpath)),
+        )
+    ET.ElementTree(root).write(fpath, xml_declaration=True)
+
+
+def write_vtu_series(
+    output_dir,
+    basename="synth",
+    dims=[16, 16, 4],
+    bounds=[0.0, 10.0, -2.0, 2.0, 0.0, 4.0],
+    nsteps=5,
+    arrays=["n", "T"],
+    npartitions=1,
+):
+    """
+    Write <nsteps> checkpoints named <basename>_<i>.vtu, or, if npartitions > 1,
+    <basename>_<i>.pvtu with pieces in <basename>_<i>_vtu/ (as FieldConvert does).
+    Partitions are slabs in x. Returns the list of (p)vtu paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    npartitions = max(min(npartitions, dims[0]), 1)
+    slab_edges = np.linspace(0, dims[0], npartitions + 1).astype(int)
+    dx = (bounds[1] - bounds[0]) / dims[0]
+    grids = []
+    for ipart in range(npartitions):
+        i0, i1 = slab_edges[ipart], slab_edges[ipart + 1]
+        slab_bounds = [bounds[0] + i0 * dx, bounds[0] + i1 * dx] + list(bounds[2:])
+        grids.append(make_ugrid([i1 - i0, dims[1], dims[2]], slab_bounds))
+
+    fpaths = []
+    for istep in range(nsteps):
+        for ugrid in grids:
+            _add_arrays(ugrid, arrays, float(istep))
+        if npartitions == 1:
+            fpath = os.path.join(output_dir, f"{basename}_{istep}.vtu")
+            _write_vtu(grids[0], fpath)
+        else:
+            fpath = os.path.join(output_dir, f"{basename}_{istep}.pvtu")
+            pieces_dir = os.path.join(output_dir, f"{basename}_{istep}_vtu")
+            os.makedirs(pieces_dir, exist_ok=True)
+            piece_fpaths = [
+                os.path.join(pieces_dir, f"P{ipart:07d}.vtu")
+                for ipart in range(npartitions)
+            ]
+            for ugrid, piece_fpath in zip(grids, piece_fpaths):
+                _write_vtu(ugrid, piece_fpath)
+            _write_pvtu(fpath, piece_fpaths, arrays)
+        fpaths.append(fpath)
+    return fpaths
+
+
+def write_h5part(
+    fpath,
+    nsteps=5,
+    nparticles=1000,
+    bounds=[0.0, 10.0, -2.0, 2.0, 0.0, 4.0],
+    ndims=3,
+    seed=0,
+):
+    """
+    Write an H5Part file of particles random-walking inside <bounds>, with
+    COMPUTATIONAL_WEIGHT and PARTICLE_ID datasets. A few particles are lost each step,
+    so that ids don't line up trivially between steps.
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("h5py is required to write synthetic H5Part files")
+
+    rng = np.random.default_rng(seed)
+    lo = np.array(bounds[0::2][:ndims])
+    hi = np.array(bounds[1::2][:ndims])
+    pos = lo + (hi - lo) * rng.random((nparticles, ndims))
+    weights = 1e14 * (0.5 + rng.random(nparticles))
+    ids = np.arange(nparticles)
+    step_size = 0.01 * (hi - lo)
+    with h5py.File(fpath, "w") as f:
+        for istep in range(nsteps):
+            group = f.create_group(f"Step#{istep}")
+            for idim, name in enumerate(["x", "y", "z"][:ndims]):
+                group.create_dataset(name, data=pos[:, idim])
+            group.create_dataset("COMPUTATIONAL_WEIGHT", data=weights)
+            group.create_dataset("PARTICLE_ID", data=ids)
+            # Advance, keeping particles in bounds, and drop ~1% of them
+            pos = np.clip(pos + step_size * rng.standard_normal(pos.shape), lo, hi)
+            keep = rng.random(ids.size) > 0.01
+            pos, weights, ids = pos[keep], weights[keep], ids[keep]
+    return fpath
+
+
+def write_nektar_session(fpath, params={}):
+    """
+    Write a minimal Nektar session XML with a CONDITIONS/PARAMETERS node. Includes
+    parameters defined in terms of others, as real sessions often do.
+    """
+    int_params = dict(
+        TimeStep="0.001",
+        NumSteps="1000",
+        IO_CheckSteps="100",
+        IO_InfoSteps="IO_CheckSteps/10",
+        Lambda="2*TimeStep",
+        Ge="sqrt(Lambda)",
+    )
+    int_params.update(params)
+    root = ET.Element("NEKTAR")
+    conditions = ET.SubElement(root, "CONDITIONS")
+    params_node = ET.SubElement(conditions, "PARAMETERS")
+    for name, val in int_params.items():
+        ET.SubElement(params_node, "P").text = f" {name} = {val} "
+    ET.ElementTree(root).write(fpath, xml_declaration=True)
+    return fpath
+
+
+def write_test_avi(fpath, duration=2, frame_rate=10, size=[640, 360]):
+    """
+    Write an avi of ffmpeg's test pattern.
+    """
+    import ffmpeg
+
+    ffmpeg.input(
+        f"testsrc=size={size[0]}x{size[1]}:rate={frame_rate}", f="lavfi", t=duration
+    ).output(fpath, vcodec="mjpeg").run(overwrite_output=True, quiet=True)
+    return fpath
+
+
+def make_synthetic_run(
+    output_dir,
+    size="small",
+    basename="synth",
+    arrays=["n", "T"],
+    npartitions=1,
+    particle_fname="particles.h5part",
+    size_settings={},
+):
+    """
+    Generate a complete synthetic run (vtus, particles, session) in <output_dir>.
+    Returns a dict describing what was generated.
+    """
+    settings = dict(SIZES[size])
+    settings.update(size_settings)
+    bounds = [0.0, 10.0, -2.0, 2.0, 0.0, 4.0 if settings["dims"][2] > 0 else 0.0]
+    fpaths = write_vtu_series(
+        output_dir,
+        basename=basename,
+        dims=settings["dims"],
+        bounds=bounds,
+        nsteps=settings["nsteps"],
+        arrays=arrays,
+        npartitions=npartitions,
+    )
+    write_h5part(
+        os.path.join(output_dir, particle_fname),
+        nsteps=settings["nsteps"],
+        nparticles=settings["nparticles"],
+        bounds=bounds,
+        ndims=3 if settings["dims"][2] > 0 else 2,
+    )
+    write_nektar_session(os.path.join(output_dir, "session.xml"))
+    return dict(
+        data_dir=output_dir,
+        basename=basename,
+        arrays=list(arrays),
+        bounds=bounds,
+        fpaths=fpaths,
+        npartitions=npartitions,
+        particle_fname=particle_fname,
+        **settings,
+    )
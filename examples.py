@@ -34,7 +34,7 @@ def driftwave_movie(
     var_name="n",
     host="",
     output_basename="driftwave",
-    output_dir=get_desktop_dir(),
+    output_dir=None,
     animation_settings=dict(FrameRate=15, FrameWindow=[1, 200], Quality=2),
     cbar_settings=dict(
         title="Δn", label_fontsize=20, pos=[0.9, 0.06], title_fontsize=20
@@ -55,6 +55,8 @@ def driftwave_movie(
     """
     Movie showing turbulence in 2D HW (nektar-driftwave).
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
 
     # Set checkpoint dt from nektar params
     nek_params = get_nektar_params(data_dir)
@@ -83,10 +85,12 @@ def driftwave_movie(
     avi_to_mp4(output_dir, output_basename)
 
 
-def lapd_ne_blob_split(data_dir, output_dir=get_desktop_dir()):
+def lapd_ne_blob_split(data_dir, output_dir=None):
     """
     Movie of ne in simplified LAPD sim, showing blob splitting.
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     output_basename = "lapd_blob-split"
     gen_movie(
         "ne",
@@ -98,17 +102,19 @@ def lapd_ne_blob_split(data_dir, output_dir=get_desktop_dir()):
         ),
         data_settings=dict(range=[1.0, 1.4], opacities=[(1.0, 0.0), (1.4, 1.0)]),
     )
-    avi_to_mp4(get_desktop_dir(), output_basename)
+    avi_to_mp4(output_dir, output_basename)
 
 
 def ne_Ge_line_plot(
     data_dir,
     host="",
-    output_dir=get_desktop_dir(),
+    output_dir=None,
     output_basename=None,
     animation_settings={},
     axis=0,
 ):
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     nek_params = get_nektar_params(data_dir)
 
     # Read params from the Nektar session file
@@ -174,12 +180,14 @@ def ne_Ge_line_plot(
 def t4c2_1d_profs(
     data_dir,
     output_basename="t4c2_1dprofs",
-    output_dir=get_desktop_dir(),
+    output_dir=None,
     animation_settings={},
 ):
     """
     Plot rho, u, T from 1D / 1D-in-2D SimpleSOL prob. Also demonstrates setting custom colors and linestyles
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
 
     # Read params from the Nektar session file
     nek_params = get_nektar_params(data_dir)
@@ -221,10 +229,12 @@ def t4c2_1d_profs(
     )
 
 
-def t4c2_img(data_dir, output_dir=get_desktop_dir()):
+def t4c2_img(data_dir, output_dir=None):
     """
     Image of 2D-coupled sim at the output time used in the t4c2 report.
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     gen_img(
         data_dir,
         "rho",
@@ -234,11 +244,13 @@ def t4c2_img(data_dir, output_dir=get_desktop_dir()):
     )
 
 
-def t4c3_movie_coupled_fades_zoomed_out(data_dir, output_dir=get_desktop_dir()):
+def t4c3_movie_coupled_fades_zoomed_out(data_dir, output_dir=None):
     """
     Movie showing (fluid-only) ne in coupled t4c3 sim.
     Color scale config is appropriate for blob that dissipates (high-ish alpha)
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     output_basename = "t4c3_coupled_zoomed-out_fades"
     gen_movie(
         "ne",
@@ -256,7 +268,7 @@ def t4c3_movie_coupled_fades_zoomed_out(data_dir, output_dir=get_desktop_dir()):
             opacities=[(-0.7, 0.0), (0.0, 0.0), (0.8, 0.15), (6.0, 1.0)],
         ),
     )
-    avi_to_mp4(get_desktop_dir(), output_basename)
+    avi_to_mp4(output_dir, output_basename)
 
 
 def t4c3_movie_coupled_zoomed_out(data_dir, host):
@@ -292,10 +304,12 @@ def t4c3_movie_fluid_full(data_dir, host):
     hw3d_fluid_only_movie(data_dir, host=host, output_basename="t4c3_fluid-only_turb")
 
 
-def t4c4_HW3D_imgs(data_dir, var, output_dir=get_desktop_dir()):
+def t4c4_HW3D_imgs(data_dir, var, output_dir=None):
     """
     Images of a 3DHW sim used in the t4c4 report.
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     for output_time in [0.0, 40.0, 70.0, 100.0, 130.0, 160.0]:
         gen_img(
             data_dir,
@@ -327,7 +341,7 @@ def hw3d_fluid_only_movie(
     host="",
     convert_to_mp4=False,
     output_basename="3DHW",
-    output_dir=get_desktop_dir(),
+    output_dir=None,
     animation_settings=dict(FrameRate=20, FrameWindow=[1, 160], Quality=2),
     max_val=15.0,
     tlbl_settings={},
@@ -342,6 +356,8 @@ def hw3d_fluid_only_movie(
     Movie showing turbulence in fluid-only t4c3 sim (params optimised to boost turbulence).
     Given to WA, ET for demos at IAEA FEC.
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
 
     # Set checkpoint dt from nektar params
     nek_params = get_nektar_params(data_dir)
@@ -371,15 +387,17 @@ def hw3d_fluid_only_movie(
         avi_to_mp4(output_dir, output_basename)
 
 
-def t4c3_movie_w_remote(data_dir, host, output_dir=get_desktop_dir()):
+def t4c3_movie_w_remote(data_dir, host, output_dir=None):
     """
     Movie of vorticity in t4c3 coupled sim.
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     output_basename = "t4c3_w"
     gen_movie(
         "w",
         data_dir=data_dir,
-        output_dir=get_desktop_dir(),
+        output_dir=output_dir,
         output_fname=f"{output_basename}.avi",
         vtu_basename="hw_",
         animation_settings=dict(FrameRate=8, FrameWindow=[40, 200], Quality=2),
@@ -392,14 +410,16 @@ def t4c3_movie_w_remote(data_dir, host, output_dir=get_desktop_dir()):
         ),
         host=host,
     )
-    avi_to_mp4(get_desktop_dir(), output_basename)
+    avi_to_mp4(output_dir, output_basename)
 
 
-def t4c3_movie_zoomed_blob(data_dir, output_dir=get_desktop_dir()):
+def t4c3_movie_zoomed_blob(data_dir, output_dir=None):
     """
     Zoomed-in movie of ionised blob (density) forming in t4c3 coupled sim.
     Used in a talk by Ian C, also given to WA, ET for demos at IAEA FEC.
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
 
     output_basename = "t4c3_coupled-zoom"
     gen_movie(
@@ -430,7 +450,7 @@ def t4c3_movie_zoomed_blob(data_dir, output_dir=get_desktop_dir()):
             psize=2.5,
         ),
     )
-    avi_to_mp4(get_desktop_dir(), output_basename)
+    avi_to_mp4(output_dir, output_basename)
 
 
 def hw2d_comp_slice(
@@ -439,7 +459,7 @@ def hw2d_comp_slice(
     chk_num=None,
     host="",
     output_basename="",
-    output_dir=get_desktop_dir(),
+    output_dir=None,
     animation_settings=dict(FrameRate=20),
     tlbl_settings={},
     fluid_view_settings=dict(
@@ -456,6 +476,8 @@ def hw2d_comp_slice(
     max_val=None,
     convert_to_mp4=False,
 ):
+    if output_dir is None:
+        output_dir = get_desktop_dir()
     fluid_props = dict(cbar_orient="Vertical", cbar_pos=[0.09, 0.13])
     if max_val is None:
         max_vals = dict(ne=0.75, w=0.2, phi=0.03)
@@ -495,7 +517,7 @@ def hw3d_comp_movie(
     data_dir,
     host="",
     output_basename="",
-    output_dir=get_desktop_dir(),
+    output_dir=None,
     animation_settings=dict(FrameRate=20, FrameWindow=[1, 100], Quality=2),
     max_val=0.1,
     tlbl_settings={},
@@ -511,6 +533,8 @@ def hw3d_comp_movie(
     """
     Slice movie for comparison of H3 / NESO HW sims
     """
+    if output_dir is None:
+        output_dir = get_desktop_dir()
 
     # # Set checkpoint dt from nektar params
     # nek_params = get_nektar_params(data_dir)
@@ -1,4 +1,40 @@
-from .fluid_particle_movie import gen_movie
-from .fluid_particle_image import gen_img
-from .fluid_slice import fluid_slice
-from .line_plot_1d import line_plot_1d, PyExpr
+"""
+Entry points are loaded from their submodules on first access, so that importing the
+package doesn't import ParaView.
+"""
+
+import importlib
+
+from ..utils.system import find_paraview
+
+# Exported names, by submodule (relative to this package)
+_EXPORTS = {
+    ".fluid_particle_movie": ["gen_movie"],
+    ".fluid_particle_image": ["gen_img"],
+    ".fluid_slice": ["fluid_slice"],
+    ".line_plot_1d": ["line_plot_1d"],
+    ".line_samples": ["extract_line_samples", "plot_line_samples"],
+    ".probes": ["gen_probe_time_series"],
+    ".time_series": ["gen_time_series"],
+    "..utils.pyexpr": ["PyExpr"],
+}
+
+_EXPORT_MODULES = {name: mod for mod, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_EXPORT_MODULES)
+
+
+def __getattr__(name):
+    if name not in _EXPORT_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name = _EXPORT_MODULES[name]
+    # Everything here renders with ParaView, except the expression class
+    if not module_name.startswith(".."):
+        find_paraview()
+    val = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
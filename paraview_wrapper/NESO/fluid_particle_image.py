@@ -12,13 +12,39 @@ from paraview.simple import (
     GetOpacityTransferFunction,
     GetScalarBar,
     H5PartReader,
+    Hide,
     SaveScreenshot,
     Show,
 )
 
-from ..utils import gen_cbar_props, gen_opacity_pts, get_ugrid_props, get_vtu_data
+from ..utils import (
+    DEPOSIT_ARRAY_NAME,
+    add_text_label,
+    decimate_surface,
+    deposit_particles,
+    gen_cbar_props,
+    gen_opacity_pts,
+    get_frustum_planes,
+    get_manifest_vtu_data,
+    get_memory_report_fpath,
+    get_quality_settings,
+    get_trace_fpath,
+    get_ugrid_props,
+    get_vtu_data,
+    label_output_fname,
+    memory_monitored,
+    reduce_particles,
+    resample_to_image,
+    resolve_auto_colour_map,
+    scale_resolution,
+    scoped_pipeline,
+    stage,
+    traced,
+    update_python_filter,
+)
 
 
+@scoped_pipeline
 def gen_img(
     data_dir,
     fluid_var,
@@ -31,9 +57,15 @@ def gen_img(
     part_data_fname=None,
     part_props={},
     part_view_settings={},
+    memory_budget=None,
+    profile=False,
+    quality="full",
+    quality_settings={},
+    time_manifest=False,
 ):
     if output_basename is None:
         output_basename = fluid_vtu_basename
+    int_quality_settings = get_quality_settings(quality, quality_settings)
     plotting_particles = part_data_fname is not None
 
     # Camera position(s), focal point(s)
@@ -57,131 +89,238 @@ def gen_img(
 
     # Ouput path
     output_fpath = os.path.join(
-        output_dir, f"{output_basename}_t{str(output_time)}.png"
+        output_dir,
+        label_output_fname(f"{output_basename}_t{str(output_time)}.png", quality),
     )
     # -------------------------------------------------------------------------
 
-    # Read all Nektar vtus
-    fluid_data = get_vtu_data(data_dir, basename=fluid_vtu_basename)
+    # Optionally record per-stage timings and memory usage
+    with traced(get_trace_fpath(output_fpath), enabled=profile), memory_monitored(
+        memory_budget,
+        get_memory_report_fpath(output_fpath),
+        enabled=memory_budget is not None,
+    ):
+        # Read Nektar vtus. With a time manifest, <output_time> is a physical time and
+        # only the closest checkpoint is read; particle data is read at the matching
+        # step
+        if time_manifest:
+            fluid_data, _, output_step = get_manifest_vtu_data(
+                data_dir, basename=fluid_vtu_basename, time=output_time
+            )
+        else:
+            fluid_data = get_vtu_data(data_dir, basename=fluid_vtu_basename)
+            output_step = output_time
 
-    # Read particle data
-    if plotting_particles:
-        part_data = H5PartReader(
-            registrationName=part_data_fname,
-            FileName=f"{data_dir}/{part_data_fname}",
-        )
+        # Read particle data, optionally depositing it onto a grid
+        if plotting_particles:
+            deposit_dims = part_props.get("deposit_dims")
+            if deposit_dims:
+                deposit_bounds = part_props.get("deposit_bounds")
+                if deposit_bounds is None:
+                    deposit_bounds = get_ugrid_props(fluid_data)["bounds"]
+                part_data = deposit_particles(
+                    f"{data_dir}/{part_data_fname}",
+                    deposit_bounds,
+                    deposit_dims,
+                    nprocs=part_props.get("deposit_nprocs"),
+                )
+            else:
+                part_data = H5PartReader(
+                    registrationName=part_data_fname,
+                    FileName=f"{data_dir}/{part_data_fname}",
+                )
+                # Optionally subsample (preserving density) and cull particles
+                part_reduction = dict(
+                    stride=part_props.get("stride", 1)
+                    * int_quality_settings["particle_stride"],
+                    fraction=part_props.get("sample_fraction"),
+                    seed=part_props.get("sample_seed", 0),
+                    bounds=part_props.get("cull_bounds"),
+                )
+                if (
+                    part_reduction["stride"] > 1
+                    or part_reduction["fraction"] is not None
+                    or part_reduction["bounds"] is not None
+                    or part_props.get("cull_to_view", False)
+                ):
+                    part_data = reduce_particles(part_data, part_reduction)
 
-    # ------------------------------------------------------------------------------
-    # Create view(s), layout(s), assign data to views
-    layout = CreateLayout()
-    fluid_view = CreateView("RenderView")
-    fluid_Display = Show(fluid_data, fluid_view, "UnstructuredGridRepresentation")
-    views = [fluid_view]
-    if plotting_particles:
-        layout.SplitVertical(0, 0.5)
-        part_view = CreateView("RenderView")
-        part_Display = Show(part_data, part_view, "GeometryRepresentation")
-        views.append(part_view)
-        AssignViewToLayout(view=fluid_view, layout=layout, hint=0)
-        AssignViewToLayout(view=part_view, layout=layout, hint=2)
-    else:
-        AssignViewToLayout(view=fluid_view, layout=layout)
-
-    # Get data dimension, this only works after calling Show()!
-    data_ndims = get_ugrid_props(fluid_data)["ndims"]
-    # Common settings for both views
-    for view in views:
-        view.OrientationAxesVisibility = 0
-        view.AxesGrid.Visibility = 1
-
-    # Choose animation frame
-    animation_scene = GetAnimationScene()
-    animation_scene.UpdateAnimationUsingDataTimeSteps()
-    animation_scene.AnimationTime = output_time
-
-    # Colour fluid by density, set scale, setup colorbar
-    int_fluid_props = gen_cbar_props(
-        fluid_props,
-        colorby=fluid_var,
-        cbar_pos=[0.3, 0.75],
-        cbar_range=[0, 5],
-        cbar_title="n / $3*10^{18} m^{-3}$",
-    )
-    int_fluid_props["render_type"] = "Volume" if data_ndims == 3 else "Surface"
+        # ------------------------------------------------------------------------------
+        # Create view(s), layout(s), assign data to views
+        layout = CreateLayout()
+        fluid_view = CreateView("RenderView")
+        fluid_Display = Show(fluid_data, fluid_view, "UnstructuredGridRepresentation")
+        views = [fluid_view]
+        if plotting_particles:
+            layout.SplitVertical(0, 0.5)
+            part_view = CreateView("RenderView")
+            if deposit_dims:
+                part_Display = Show(part_data, part_view, "UniformGridRepresentation")
+                part_Display.SetRepresentationType(
+                    "Volume" if deposit_dims[2] > 1 else "Surface"
+                )
+            else:
+                part_Display = Show(part_data, part_view, "GeometryRepresentation")
+            views.append(part_view)
+            AssignViewToLayout(view=fluid_view, layout=layout, hint=0)
+            AssignViewToLayout(view=part_view, layout=layout, hint=2)
+        else:
+            AssignViewToLayout(view=fluid_view, layout=layout)
 
-    # Create fluid color bar
-    ColorBy(fluid_Display, ("POINTS", int_fluid_props["colorby"]))
-    fluid_cbar = GetScalarBar(
-        GetColorTransferFunction(int_fluid_props["colorby"]), fluid_view
-    )
-    cbars = [(fluid_cbar, int_fluid_props)]
+        # Get data dimension, this only works after calling Show()!
+        data_ndims = get_ugrid_props(fluid_data)["ndims"]
+        # Common settings for both views
+        for view in views:
+            view.OrientationAxesVisibility = 0
+            view.AxesGrid.Visibility = 1
 
-    if plotting_particles:
-        int_part_props = gen_cbar_props(
-            part_props,
-            colorby="COMPUTATIONAL_WEIGHT",
-            cbar_label_fontsize=15,
-            cbar_pos=[0.3, 0.1],
-            cbar_title="Particle Weight",
-            cbar_use_log=1,
-            cbar_vals=[v * 1e14 for v in [0.3, 1, 3, 10, 30]],
-            psize=2,
+        # Choose animation frame
+        animation_scene = GetAnimationScene()
+        animation_scene.UpdateAnimationUsingDataTimeSteps()
+        animation_scene.AnimationTime = output_step
+
+        # Colour fluid by density, set scale, setup colorbar
+        int_fluid_props = gen_cbar_props(
+            fluid_props,
+            colorby=fluid_var,
+            cbar_pos=[0.3, 0.75],
+            cbar_range=[0, 5],
+            cbar_title="n / $3*10^{18} m^{-3}$",
         )
+        int_fluid_props["render_type"] = "Volume" if data_ndims == 3 else "Surface"
+        int_fluid_props["resample_dims"] = int_fluid_props.get(
+            "resample_dims", int_quality_settings["resample_dims"]
+        )
+
+        # Optionally reduce the amount of data sent to the renderer
+        render_repr = "UnstructuredGridRepresentation"
+        if int_fluid_props["render_type"] == "Volume":
+            if int_fluid_props["resample_dims"]:
+                render_repr = "UniformGridRepresentation"
+                render_data = resample_to_image(
+                    fluid_data, int_fluid_props["resample_dims"]
+                )
+        elif int_quality_settings["decimation"] > 0:
+            render_repr = "GeometryRepresentation"
+            render_data = decimate_surface(
+                fluid_data, int_quality_settings["decimation"]
+            )
+        if render_repr != "UnstructuredGridRepresentation":
+            Hide(fluid_data, fluid_view)
+            fluid_Display = Show(render_data, fluid_view, render_repr)
 
-        # Colour particle data by weight, set scale, setup colorbar
-        ColorBy(part_Display, ("POINTS", int_part_props["colorby"]))
-        part_cbar = GetScalarBar(
-            GetColorTransferFunction(int_part_props["colorby"]), part_view
+        # Create fluid color bar
+        ColorBy(fluid_Display, ("POINTS", int_fluid_props["colorby"]))
+        fluid_cbar = GetScalarBar(
+            GetColorTransferFunction(int_fluid_props["colorby"]), fluid_view
         )
-        cbars.append((part_cbar, int_part_props))
-
-    # Set colorbar properties
-    for cbar, props in cbars:
-        cbar.ComponentTitle = ""
-        cbar.LabelFontSize = props["cbar_label_fontsize"]
-        cbar.Orientation = props["cbar_orient"]
-        cbar.Position = props["cbar_pos"]
-        cbar.ScalarBarLength = props["cbar_len"]
-        cbar.Title = props["cbar_title"]
-        cbar.TitleFontSize = props["cbar_title_fontsize"]
-        cbar.WindowLocation = props["cbar_loc"]
-        if props["cbar_vals"]:
-            cbar.UseCustomLabels = 1
-            cbar.CustomLabels = props["cbar_vals"]
-
-        if "cbar_range" in props:
-            cbar_range = props["cbar_range"]
-        elif props["cbar_vals"]:
-            cbar_range = [props["cbar_vals"][0], props["cbar_vals"][-1]]
-        else:
-            cbar_range = [0, 1]
-
-        color_trans_func = GetColorTransferFunction(props["colorby"])
-        opac_trans_func = GetOpacityTransferFunction(props["colorby"])
-        for trans_func in [color_trans_func, opac_trans_func]:
-            trans_func.RescaleTransferFunction(*cbar_range)
-            trans_func.UseLogScale = props["cbar_use_log"]
-
-        if "opacities" in props:
-            opac_trans_func.Points = gen_opacity_pts(props["opacities"])
-            color_trans_func.EnableOpacityMapping = 1
-
-    # Rendering type
-    fluid_Display.SetRepresentationType(int_fluid_props["render_type"])
-    if int_fluid_props["render_type"] == "Volume":
-        fluid_Display.SelectMapper = int_fluid_props["render_mode"]
-
-    # ------------------------------------------------------------------------------
-    # Generate screenshot
-    layout.SetSize(1216, 776)
-
-    # Set camera positions, focal points
-    for view, settings in zip(views, int_view_settings):
-        view.InteractionMode = f"{data_ndims}D"
-        view.CameraPosition = settings["pos"]
-        view.CameraFocalPoint = settings["fpt"]
-        view.CameraParallelScale = settings["pscale"]
-        view.CameraViewUp = settings["up"]
-
-    SaveScreenshot(output_fpath, layout)
-    print(f"Saved image to {output_fpath}")
+        resolve_auto_colour_map(
+            int_fluid_props,
+            data_dir,
+            fluid_var,
+            basename=fluid_vtu_basename,
+            range_key="cbar_range",
+            percentiles_key="cbar_percentiles",
+        )
+        cbars = [(fluid_cbar, int_fluid_props)]
+
+        if plotting_particles:
+            if deposit_dims:
+                # Deposited density has different units/range to individual weights
+                int_part_props = gen_cbar_props(
+                    part_props,
+                    colorby=DEPOSIT_ARRAY_NAME,
+                    cbar_label_fontsize=15,
+                    cbar_pos=[0.3, 0.1],
+                    cbar_title="Particle Density",
+                )
+                if "cbar_range" not in int_part_props:
+                    part_data.UpdatePipeline(output_step)
+                    int_part_props["cbar_range"] = list(
+                        part_data.PointData[DEPOSIT_ARRAY_NAME].GetRange()
+                    )
+            else:
+                int_part_props = gen_cbar_props(
+                    part_props,
+                    colorby="COMPUTATIONAL_WEIGHT",
+                    cbar_label_fontsize=15,
+                    cbar_pos=[0.3, 0.1],
+                    cbar_title="Particle Weight",
+                    cbar_use_log=1,
+                    cbar_vals=[v * 1e14 for v in [0.3, 1, 3, 10, 30]],
+                    psize=2,
+                )
+
+            # Colour particle data by weight, set scale, setup colorbar
+            ColorBy(part_Display, ("POINTS", int_part_props["colorby"]))
+            part_cbar = GetScalarBar(
+                GetColorTransferFunction(int_part_props["colorby"]), part_view
+            )
+            cbars.append((part_cbar, int_part_props))
+
+        # Set colorbar properties
+        for cbar, props in cbars:
+            cbar.ComponentTitle = ""
+            cbar.LabelFontSize = props["cbar_label_fontsize"]
+            cbar.Orientation = props["cbar_orient"]
+            cbar.Position = props["cbar_pos"]
+            cbar.ScalarBarLength = props["cbar_len"]
+            cbar.Title = props["cbar_title"]
+            cbar.TitleFontSize = props["cbar_title_fontsize"]
+            cbar.WindowLocation = props["cbar_loc"]
+            if props["cbar_vals"]:
+                cbar.UseCustomLabels = 1
+                cbar.CustomLabels = props["cbar_vals"]
+
+            if "cbar_range" in props:
+                cbar_range = props["cbar_range"]
+            elif props["cbar_vals"]:
+                cbar_range = [props["cbar_vals"][0], props["cbar_vals"][-1]]
+            else:
+                cbar_range = [0, 1]
+
+            color_trans_func = GetColorTransferFunction(props["colorby"])
+            opac_trans_func = GetOpacityTransferFunction(props["colorby"])
+            for trans_func in [color_trans_func, opac_trans_func]:
+                trans_func.RescaleTransferFunction(*cbar_range)
+                trans_func.UseLogScale = props["cbar_use_log"]
+
+            if "opacities" in props:
+                opac_trans_func.Points = gen_opacity_pts(props["opacities"])
+                color_trans_func.EnableOpacityMapping = 1
+
+        # Rendering type
+        fluid_Display.SetRepresentationType(int_fluid_props["render_type"])
+        if render_repr == "UnstructuredGridRepresentation" and (
+            int_fluid_props["render_type"] == "Volume"
+        ):
+            fluid_Display.SelectMapper = int_fluid_props["render_mode"]
+
+        # ------------------------------------------------------------------------------
+        # Generate screenshot
+        layout.SetSize(
+            *scale_resolution([1216, 776], int_quality_settings["resolution_scale"])
+        )
+        if quality != "full":
+            add_text_label(fluid_view, f"Quick-look ({quality} quality)")
+
+        # Set camera positions, focal points
+        for view, settings in zip(views, int_view_settings):
+            view.InteractionMode = f"{data_ndims}D"
+            view.CameraPosition = settings["pos"]
+            view.CameraFocalPoint = settings["fpt"]
+            view.CameraParallelScale = settings["pscale"]
+            view.CameraViewUp = settings["up"]
+
+        # Now the camera is set, discard particles that are out of view
+        if plotting_particles and not deposit_dims and part_props.get("cull_to_view"):
+            part_reduction["planes"] = get_frustum_planes(part_view)
+            update_python_filter(
+                part_data,
+                "paraview_wrapper.utils.particles.reduce_particles",
+                part_reduction,
+            )
+
+        with stage("SaveScreenshot"):
+            SaveScreenshot(output_fpath, layout)
+        print(f"Saved image to {output_fpath}")
@@ -21,18 +21,47 @@ import re
 
 from .time_filter import add_time_filter
 from ..utils import (
+    DEPOSIT_ARRAY_NAME,
+    TRAIL_AGE_ARRAY_NAME,
+    add_text_label,
+    autotune_volume_render,
+    cached_resample_to_image,
     data_file_exists,
+    decimate_surface,
+    deposit_particles,
+    difference_from_run,
+    frame_timer,
     gen_default_opacity_pts,
     gen_opacity_pts,
+    get_frame_window,
+    get_frustum_planes,
+    get_manifest_vtu_data,
+    get_memory_report_fpath,
+    get_quality_settings,
+    get_trace_fpath,
     get_ugrid_props,
     get_vtu_data,
+    interpolate_in_time,
+    label_output_fname,
+    memory_monitored,
+    particle_trails,
+    reduce_particles,
+    resample_to_image,
+    resolve_auto_colour_map,
+    save_animation_coarse_to_fine,
     scale_data,
+    scale_resolution,
+    scoped_pipeline,
+    stage,
+    traced,
+    update_python_filter,
 )
 
 #### disable automatic camera reset on 'Show'
 _DisableFirstRenderCameraReset()
 
 
+@scoped_pipeline
 def gen_movie(
     varname,
     data_dir,
@@ -48,254 +77,470 @@ def gen_movie(
     view_settings={},
     output_fname="",
     host="",
+    interp_frames=0,
+    render_order="linear",
+    quality="full",
+    quality_settings={},
+    autotune=False,
+    diff_data_dir=None,
+    diff_settings={},
+    profile=False,
+    memory_budget=None,
+    time_manifest=False,
     **kwargs,
 ):
     if not output_fname:
         output_fname = f"{varname}_movie.avi"
+    if render_order not in ["linear", "bisection"]:
+        raise ValueError(
+            f"gen_movie: render_order must be 'linear' or 'bisection' (got {render_order})"
+        )
+
+    # Cuts to apply for the requested quality level; label output accordingly
+    int_quality_settings = get_quality_settings(quality, quality_settings)
+    output_fname = label_output_fname(output_fname, quality)
 
     # Output path
     output_fpath = os.path.join(output_dir, output_fname)
 
-    if host:
-        Connect(host)
+    # Optionally record per-stage and per-frame timings and memory usage
+    with traced(get_trace_fpath(output_fpath), enabled=profile), memory_monitored(
+        memory_budget,
+        get_memory_report_fpath(output_fpath),
+        enabled=memory_budget is not None,
+    ):
+        if host:
+            Connect(host)
+
+        # Optionally list and time checkpoints with a manifest, for correct time labels
+        # with variable output cadence
+        if time_manifest:
+            raw_vtu_data, times, _ = get_manifest_vtu_data(
+                data_dir, basename=vtu_basename, dt=dt
+            )
+        else:
+            raw_vtu_data = get_vtu_data(data_dir, basename=vtu_basename)
+            times = None
 
-    raw_vtu_data = get_vtu_data(data_dir, basename=vtu_basename)
+        # Optionally show the difference from another run on the same mesh
+        if diff_data_dir is None:
+            field_data = raw_vtu_data
+        else:
+            field_data = difference_from_run(
+                raw_vtu_data, data_dir, varname, diff_data_dir, diff_settings
+            )
 
-    scale_facs = view_settings.get("scale")
-    if scale_facs is None:
-        vtu_data = raw_vtu_data
-    else:
-        vtu_data = scale_data(raw_vtu_data, scale_facs)
+        # Optionally synthesise frames between checkpoints
+        if interp_frames:
+            time_data = interpolate_in_time(field_data, interp_frames)
+        else:
+            time_data = field_data
 
-    # get animation scene
-    anim_scene = GetAnimationScene()
+        scale_facs = view_settings.get("scale")
+        if scale_facs is None:
+            vtu_data = time_data
+        else:
+            vtu_data = scale_data(time_data, scale_facs)
 
-    # update animation scene based on data timesteps
-    anim_scene.UpdateAnimationUsingDataTimeSteps()
+        # get animation scene
+        anim_scene = GetAnimationScene()
 
-    # set active source
-    SetActiveSource(vtu_data)
+        # update animation scene based on data timesteps
+        anim_scene.UpdateAnimationUsingDataTimeSteps()
 
-    # get active view
-    view = FindViewOrCreate(f"gen_{varname}_movie", "RenderView")
+        # set active source
+        SetActiveSource(vtu_data)
 
-    # show vtu data in view
-    display = Show(vtu_data, view, "UnstructuredGridRepresentation")
+        # get active view
+        view = FindViewOrCreate(f"gen_{varname}_movie", "RenderView")
 
-    # Particle data
-    if particle_fname:
-        if data_file_exists(data_dir, particle_fname):
-            int_particle_props = dict(
-                colorby="COMPUTATIONAL_WEIGHT",
-                cbar_len=0.25,
-                cbar_title="Particle Weight",
-                cbar_pos=[0.05, 0.9],
-                cbar_vals=[1e14 * x for x in [0, 0.5, 1, 1.5, 2, 2.5]],
-                orient="Horizontal",
-                psize=2,
+        # Data settings
+        int_data_settings = dict(
+            range=[0, 1],
+            render_mode="Resample To Image",
+            render_type="Volume",
+            resample_bounds=None,
+            resample_cache=False,
+            resample_dims=int_quality_settings["resample_dims"],
+        )
+        int_data_settings.update(data_settings)
+        if diff_data_dir is not None and "auto" in [
+            int_data_settings["range"],
+            int_data_settings.get("opacities"),
+        ]:
+            raise ValueError(
+                "gen_movie: 'auto' colour maps aren't supported for differences"
             )
-            int_particle_props.update(particle_props)
-            particle_fpath = os.path.join(data_dir, particle_fname)
-            part_data = H5PartReader(
-                registrationName=particle_fname,
-                FileName=particle_fpath,
+        resolve_auto_colour_map(
+            int_data_settings, data_dir, varname, basename=vtu_basename
+        )
+
+        # Optionally reduce the amount of data sent to the renderer
+        if int_data_settings["render_type"] == "Volume":
+            if int_data_settings["resample_cache"]:
+                # Resample onto an image with weights computed once for the static mesh
+                render_data = cached_resample_to_image(
+                    vtu_data,
+                    int_data_settings["resample_dims"] or [128, 128, 128],
+                    [varname],
+                    bounds=int_data_settings["resample_bounds"],
+                )
+                render_repr = "UniformGridRepresentation"
+            elif int_data_settings["resample_dims"]:
+                render_data = resample_to_image(
+                    vtu_data, int_data_settings["resample_dims"]
+                )
+                render_repr = "UniformGridRepresentation"
+            else:
+                render_data = vtu_data
+                render_repr = "UnstructuredGridRepresentation"
+        elif int_quality_settings["decimation"] > 0:
+            render_data = decimate_surface(vtu_data, int_quality_settings["decimation"])
+            render_repr = "GeometryRepresentation"
+        else:
+            render_data = vtu_data
+            render_repr = "UnstructuredGridRepresentation"
+
+        # show vtu data in view
+        display = Show(render_data, view, render_repr)
+
+        # Particle data
+        part_reduction = None
+        if particle_fname:
+            if data_file_exists(data_dir, particle_fname):
+                int_particle_props = dict(
+                    colorby="COMPUTATIONAL_WEIGHT",
+                    cbar_len=0.25,
+                    cbar_title="Particle Weight",
+                    cbar_pos=[0.05, 0.9],
+                    cbar_vals=[1e14 * x for x in [0, 0.5, 1, 1.5, 2, 2.5]],
+                    cull_bounds=None,
+                    cull_to_view=False,
+                    deposit_bounds=None,
+                    deposit_dims=None,
+                    deposit_nprocs=None,
+                    orient="Horizontal",
+                    plot_spheres=False,
+                    psize=2,
+                    sample_fraction=None,
+                    sample_seed=0,
+                    stride=1,
+                    trail_id_name="PARTICLE_ID",
+                    trail_len=0,
+                    trail_width=1.0,
+                )
+                if particle_props.get("deposit_dims"):
+                    # Deposited density has different units/range to individual weights
+                    int_particle_props.update(
+                        colorby=DEPOSIT_ARRAY_NAME,
+                        cbar_title="Particle Density",
+                        cbar_vals=[],
+                    )
+                int_particle_props.update(particle_props)
+                particle_fpath = os.path.join(data_dir, particle_fname)
+                if int_particle_props["deposit_dims"]:
+                    # Render weighted particle density on a grid, rather than the
+                    # particles
+                    deposit_bounds = int_particle_props["deposit_bounds"]
+                    if deposit_bounds is None:
+                        deposit_bounds = get_ugrid_props(raw_vtu_data)["bounds"]
+                    deposit_dims = int_particle_props["deposit_dims"]
+                    part_data = deposit_particles(
+                        particle_fpath,
+                        deposit_bounds,
+                        deposit_dims,
+                        nprocs=int_particle_props["deposit_nprocs"],
+                    )
+                    part_display = Show(part_data, view, "UniformGridRepresentation")
+                    part_display.SetRepresentationType(
+                        "Volume" if deposit_dims[2] > 1 else "Surface"
+                    )
+                else:
+                    part_data = H5PartReader(
+                        registrationName=particle_fname,
+                        FileName=particle_fpath,
+                    )
+                    # Optionally subsample (preserving density) and cull particles
+                    part_reduction = dict(
+                        stride=int_particle_props["stride"]
+                        * int_quality_settings["particle_stride"],
+                        fraction=int_particle_props["sample_fraction"],
+                        seed=int_particle_props["sample_seed"],
+                        bounds=int_particle_props["cull_bounds"],
+                    )
+                    if (
+                        part_reduction["stride"] > 1
+                        or part_reduction["fraction"] is not None
+                        or part_reduction["bounds"] is not None
+                        or int_particle_props["cull_to_view"]
+                    ):
+                        part_data = reduce_particles(part_data, part_reduction)
+                    part_display = Show(part_data, view, "GeometryRepresentation")
+                    part_display.PointSize = int_particle_props["psize"]
+                    if int_particle_props["plot_spheres"]:
+                        part_display.RenderPointsAsSpheres = 1
+                ColorBy(part_display, ("POINTS", int_particle_props["colorby"]))
+                part_color_tf = GetColorTransferFunction(int_particle_props["colorby"])
+
+                if int_particle_props["cbar_vals"]:
+                    part_color_tf.RescaleTransferFunction(
+                        int_particle_props["cbar_vals"][0],
+                        int_particle_props["cbar_vals"][-1],
+                    )
+                else:
+                    part_display.RescaleTransferFunctionToDataRange(True, False)
+
+                part_cbar = GetScalarBar(part_color_tf, view)
+                part_cbar.ComponentTitle = ""
+                part_cbar.Orientation = int_particle_props["orient"]
+                part_cbar.ScalarBarLength = int_particle_props["cbar_len"]
+                part_cbar.WindowLocation = "Any Location"
+                part_cbar.Title = int_particle_props["cbar_title"]
+                part_cbar.Position = int_particle_props["cbar_pos"]
+                if int_particle_props["cbar_vals"]:
+                    part_cbar.UseCustomLabels = 1
+                    part_cbar.CustomLabels = int_particle_props["cbar_vals"]
+
+                # Optionally draw trails through recent particle positions, fading
+                # with age
+                if int_particle_props["trail_len"] > 1:
+                    trails = particle_trails(
+                        particle_fpath,
+                        int_particle_props["trail_len"],
+                        id_name=int_particle_props["trail_id_name"],
+                    )
+                    trail_display = Show(trails, view, "GeometryRepresentation")
+                    trail_display.LineWidth = int_particle_props["trail_width"]
+                    ColorBy(trail_display, ("POINTS", TRAIL_AGE_ARRAY_NAME))
+                    trail_color_tf = GetColorTransferFunction(TRAIL_AGE_ARRAY_NAME)
+                    trail_color_tf.RescaleTransferFunction(0.0, 1.0)
+                    trail_color_tf.EnableOpacityMapping = 1
+                    GetOpacityTransferFunction(TRAIL_AGE_ARRAY_NAME).Points = (
+                        gen_opacity_pts([(0.0, 1.0), (1.0, 0.0)])
+                    )
+                    trail_display.SetScalarBarVisibility(view, False)
+            else:
+                print(f"No particle data at {data_dir}/{particle_fname}, skipping")
+
+        # init the 'PiecewiseFunction' selected for 'ScaleTransferFunction'
+        display.ScaleTransferFunction.Points = [
+            0.0,
+            0.0,
+            0.5,
+            0.0,
+            0.0,
+            1.0,
+            0.5,
+            0.0,
+        ]
+
+        # init the 'PiecewiseFunction' selected for 'OpacityTransferFunction'
+        display.OpacityTransferFunction.Points = [
+            0.0,
+            0.0,
+            0.5,
+            0.0,
+            0.0,
+            1.0,
+            0.5,
+            0.0,
+        ]
+
+        # reset view to fit data
+        view.ResetCamera(False)
+
+        # set scalar coloring
+        ColorBy(display, ("POINTS", varname))
+
+        # rescale color and/or opacity maps used to include current data range
+        display.RescaleTransferFunctionToDataRange(True, False)
+
+        # show color bar/color legend
+        display.SetScalarBarVisibility(view, True)
+
+        # get color transfer function/color map for variable
+        color_tf = GetColorTransferFunction(varname)
+        # Rescale transfer function
+        color_tf.RescaleTransferFunction(*int_data_settings["range"])
+
+        if "opacities" in int_data_settings:
+            opacity_map = GetOpacityTransferFunction(varname)
+            opacity_map.Points = gen_opacity_pts(int_data_settings["opacities"])
+            color_tf.EnableOpacityMapping = 1
+        else:
+            color_tf.EnableOpacityMapping = 0
+
+        # Color bar properties
+        int_cbar_settings = dict(
+            label_fontsize=15,
+            len=0.35,
+            loc="Any Location",
+            orient="Vertical",
+            pos=[0.93, 0.09],
+            title_fontsize=15,
+            title=varname if diff_data_dir is None else f"Δ{varname}",
+            vals=[],
+        )
+        int_cbar_settings.update(cbar_settings)
+        cbar = GetScalarBar(color_tf, view)
+        cbar.ComponentTitle = ""
+        cbar.LabelFontSize = int_cbar_settings["label_fontsize"]
+        cbar.Orientation = int_cbar_settings["orient"]
+        cbar.ScalarBarLength = int_cbar_settings["len"]
+        cbar.WindowLocation = int_cbar_settings["loc"]
+        cbar.Title = int_cbar_settings["title"]
+        cbar.TitleFontSize = int_cbar_settings["title_fontsize"]
+        cbar.Position = int_cbar_settings["pos"]
+        if int_cbar_settings["vals"]:
+            cbar.UseCustomLabels = 1
+            cbar.CustomLabels = int_cbar_settings["vals"]
+
+        slice_settings = kwargs.get("slice_settings", {})
+        if slice_settings:
+            slice_settings["axis"] = slice_settings.pop("axis", "z")
+
+            # Create slice
+            slice = Slice(registrationName="Slice1", Input=vtu_data)
+            slice.SliceType = "Plane"
+            slice.HyperTreeGridSlicer = "Plane"
+            slice.SliceOffsetValues = [0.0]
+
+            # Set norm
+            slice_idx = dict(x=0, y=1, z=2)
+            slice_normal = [0.0, 0.0, 0.0]
+            slice_normal[slice_idx[slice_settings["axis"]]] = 1.0
+            slice.SliceType.Normal = slice_normal
+            slice_display = Show(slice, view, "GeometryRepresentation")
+            slice_display.OpacityTransferFunction.Points = gen_default_opacity_pts(
+                int_data_settings["range"]
             )
-            part_display = Show(part_data, view, "GeometryRepresentation")
-            ColorBy(part_display, ("POINTS", int_particle_props["colorby"]))
-            part_color_tf = GetColorTransferFunction(int_particle_props["colorby"])
+            # set scalar coloring using an separate color/opacity maps
+            ColorBy(slice_display, ("POINTS", varname), True)
 
-            part_color_tf.RescaleTransferFunction(
-                int_particle_props["cbar_vals"][0], int_particle_props["cbar_vals"][-1]
+            # get separate opacity transfer function/opacity map for 'density'
+            slice_opacity_tf = GetOpacityTransferFunction(
+                varname, slice_display, separate=True
             )
 
-            part_display.PointSize = int_particle_props["psize"]
-            if int_particle_props["plot_spheres"]:
-                part_display.RenderPointsAsSpheres = 1
-
-            part_cbar = GetScalarBar(part_color_tf, view)
-            part_cbar.ComponentTitle = ""
-            part_cbar.Orientation = int_particle_props["orient"]
-            part_cbar.ScalarBarLength = int_particle_props["cbar_len"]
-            part_cbar.WindowLocation = "Any Location"
-            part_cbar.Title = int_particle_props["cbar_title"]
-            part_cbar.Position = int_particle_props["cbar_pos"]
-            part_cbar.UseCustomLabels = 1
-            part_cbar.CustomLabels = int_particle_props["cbar_vals"]
-        else:
-            print(f"No particle data at {data_dir}/{particle_fname}, skipping")
-
-    # init the 'PiecewiseFunction' selected for 'ScaleTransferFunction'
-    display.ScaleTransferFunction.Points = [
-        0.0,
-        0.0,
-        0.5,
-        0.0,
-        0.0,
-        1.0,
-        0.5,
-        0.0,
-    ]
-
-    # init the 'PiecewiseFunction' selected for 'OpacityTransferFunction'
-    display.OpacityTransferFunction.Points = [
-        0.0,
-        0.0,
-        0.5,
-        0.0,
-        0.0,
-        1.0,
-        0.5,
-        0.0,
-    ]
-
-    # reset view to fit data
-    view.ResetCamera(False)
-
-    # set scalar coloring
-    ColorBy(display, ("POINTS", varname))
-
-    # rescale color and/or opacity maps used to include current data range
-    display.RescaleTransferFunctionToDataRange(True, False)
-
-    # show color bar/color legend
-    display.SetScalarBarVisibility(view, True)
-
-    # Data settings
-    int_data_settings = dict(
-        range=[0, 1], render_mode="Resample To Image", render_type="Volume"
-    )
-    int_data_settings.update(data_settings)
-
-    # get color transfer function/color map for variable
-    color_tf = GetColorTransferFunction(varname)
-    # Rescale transfer function
-    color_tf.RescaleTransferFunction(*int_data_settings["range"])
-
-    if "opacities" in data_settings:
-        opacity_map = GetOpacityTransferFunction(varname)
-        opacity_map.Points = gen_opacity_pts(data_settings["opacities"])
-        color_tf.EnableOpacityMapping = 1
-    else:
-        color_tf.EnableOpacityMapping = 0
-
-    # Color bar properties
-    int_cbar_settings = dict(
-        label_fontsize=15,
-        len=0.35,
-        loc="Any Location",
-        orient="Vertical",
-        pos=[0.93, 0.09],
-        title_fontsize=15,
-        title=varname,
-        vals=[],
-    )
-    int_cbar_settings.update(cbar_settings)
-    cbar = GetScalarBar(color_tf, view)
-    cbar.ComponentTitle = ""
-    cbar.LabelFontSize = int_cbar_settings["label_fontsize"]
-    cbar.Orientation = int_cbar_settings["orient"]
-    cbar.ScalarBarLength = int_cbar_settings["len"]
-    cbar.WindowLocation = int_cbar_settings["loc"]
-    cbar.Title = int_cbar_settings["title"]
-    cbar.TitleFontSize = int_cbar_settings["title_fontsize"]
-    cbar.Position = int_cbar_settings["pos"]
-    if int_cbar_settings["vals"]:
-        cbar.UseCustomLabels = 1
-        cbar.CustomLabels = int_cbar_settings["vals"]
-
-    slice_settings = kwargs.get("slice_settings", {})
-    if slice_settings:
-        slice_settings["axis"] = slice_settings.pop("axis", "z")
-
-        # Create slice
-        slice = Slice(registrationName="Slice1", Input=vtu_data)
-        slice.SliceType = "Plane"
-        slice.HyperTreeGridSlicer = "Plane"
-        slice.SliceOffsetValues = [0.0]
-
-        # Set norm
-        slice_idx = dict(x=0, y=1, z=2)
-        slice_normal = [0.0, 0.0, 0.0]
-        slice_normal[slice_idx[slice_settings["axis"]]] = 1.0
-        slice.SliceType.Normal = slice_normal
-        slice_display = Show(slice, view, "GeometryRepresentation")
-        slice_display.OpacityTransferFunction.Points = gen_default_opacity_pts(
-            int_data_settings["range"]
+            # get separate 2D transfer function for 'density'
+            slice_color_tf = GetColorTransferFunction(
+                varname, slice_display, separate=True
+            )
+            slice_color_tf.RescaleTransferFunction(*int_data_settings["range"])
+
+            if "opacities" in slice_settings:
+                slice_opacity_tf.Points = gen_opacity_pts(slice_settings["opacities"])
+
+        # Add a time label
+        if dt is not None or times is not None:
+            add_time_filter(dt, vtu_data, view, tlbl_settings, times=times)
+
+        # Display properties
+        display.SetRepresentationType(int_data_settings["render_type"])
+        if render_repr == "UnstructuredGridRepresentation" and (
+            int_data_settings["render_type"] == "Volume"
+        ):
+            display.SelectMapper = int_data_settings["render_mode"]
+
+        # Default camera settings
+        int_view_settings = dict(
+            pos=[16.3, 3.1, 21.9],
+            fpt=[0.0, 0.0, 5.0],
+            up=[0.0, 1.0, -0.30],
+            pscale=6.1,
+            show_axes_grid=1,
+            show_orient_axes=0,
         )
-        # set scalar coloring using an separate color/opacity maps
-        ColorBy(slice_display, ("POINTS", varname), True)
-
-        # get separate opacity transfer function/opacity map for 'density'
-        slice_opacity_tf = GetOpacityTransferFunction(
-            varname, slice_display, separate=True
+        # Apply any camera settings passed by the user
+        int_view_settings.update(view_settings)
+
+        # Set coordinate axes visibility. Always hide if doing projected tetra rendering
+        view.AxesGrid.Visibility = int_view_settings["show_axes_grid"]
+        if int_data_settings["render_mode"] == "Projected tetra":
+            if int_view_settings["show_axes_grid"]:
+                print("Rendering in 'Projected tetra' mode; hiding coord axes")
+            view.AxesGrid.Visibility = 0
+
+        data_ndims = get_ugrid_props(vtu_data)["ndims"]
+        view.InteractionMode = f"{data_ndims}D"
+        view.CameraPosition = int_view_settings["pos"]
+        view.CameraFocalPoint = int_view_settings["fpt"]
+        view.CameraViewUp = int_view_settings["up"]
+        view.CameraParallelScale = int_view_settings["pscale"]
+
+        # Show / hide xyz pointer
+        view.OrientationAxesVisibility = int_view_settings["show_orient_axes"]
+
+        # Default animation settings
+        int_animation_settings = dict(ImageResolution=[1920, 1080], FrameRate=5)
+        # Apply any animation settings passed by the user
+        int_animation_settings.update(animation_settings)
+
+        # Apply quality cuts to the animation
+        int_animation_settings["ImageResolution"] = scale_resolution(
+            int_animation_settings["ImageResolution"],
+            int_quality_settings["resolution_scale"],
         )
+        frame_stride = int_quality_settings["frame_stride"]
+        if frame_stride > 1:
+            int_animation_settings["FrameStride"] = frame_stride
+            int_animation_settings["FrameRate"] = max(
+                round(int_animation_settings["FrameRate"] / frame_stride), 1
+            )
+        if quality != "full":
+            add_text_label(view, f"Quick-look ({quality} quality)")
+
+        if "FrameWindow" in int_animation_settings:
+            int_animation_settings["FrameWindow"] = get_frame_window(
+                int_animation_settings["FrameWindow"],
+                len(raw_vtu_data.FileName),
+                interp_frames,
+            )
 
-        # get separate 2D transfer function for 'density'
-        slice_color_tf = GetColorTransferFunction(varname, slice_display, separate=True)
-        slice_color_tf.RescaleTransferFunction(*int_data_settings["range"])
-
-        if "opacities" in slice_settings:
-            slice_opacity_tf.Points = gen_opacity_pts(slice_settings["opacities"])
-
-    # Add a time label
-    if dt is not None:
-        add_time_filter(dt, vtu_data, view, tlbl_settings)
-
-    # Display properties
-    display.SetRepresentationType(int_data_settings["render_type"])
-    if int_data_settings["render_type"] == "Volume":
-        display.SelectMapper = int_data_settings["render_mode"]
-
-    # Default camera settings
-    int_view_settings = dict(
-        pos=[16.3, 3.1, 21.9],
-        fpt=[0.0, 0.0, 5.0],
-        up=[0.0, 1.0, -0.30],
-        pscale=6.1,
-        show_axes_grid=1,
-        show_orient_axes=0,
-    )
-    # Apply any camera settings passed by the user
-    int_view_settings.update(view_settings)
-
-    # Set coordinate axes visibility. Always hide if doing projected tetra rendering
-    view.AxesGrid.Visibility = int_view_settings["show_axes_grid"]
-    if int_data_settings["render_mode"] == "Projected tetra":
-        if int_view_settings["show_axes_grid"]:
-            print("Rendering in 'Projected tetra' mode; hiding coord axes")
-        view.AxesGrid.Visibility = 0
-
-    data_ndims = get_ugrid_props(vtu_data)["ndims"]
-    view.InteractionMode = f"{data_ndims}D"
-    view.CameraPosition = int_view_settings["pos"]
-    view.CameraFocalPoint = int_view_settings["fpt"]
-    view.CameraViewUp = int_view_settings["up"]
-    view.CameraParallelScale = int_view_settings["pscale"]
-
-    # Show / hide xyz pointer
-    view.OrientationAxesVisibility = int_view_settings["show_orient_axes"]
-
-    # Default animation settings
-    int_animation_settings = dict(ImageResolution=[1920, 1080], FrameRate=5)
-    # Apply any animation settings passed by the user
-    int_animation_settings.update(animation_settings)
-
-    if "FrameWindow" in int_animation_settings:
-        nframes_max = len(raw_vtu_data.FileName)
-        fw = int_animation_settings["FrameWindow"]
-        fw = [max(fw[0], 0), min(fw[1], nframes_max - 1)]
-
-    # Set layout/tab size in pixels
-    layout = GetLayout(view)
-    layout.SetSize(*int_animation_settings["ImageResolution"])
-
-    print("Saving animation...")
-
-    # save animation
-    SaveAnimation(
-        output_fpath,
-        view,
-        **int_animation_settings,
-    )
-
-    print(f"Saved animation to {output_fpath}")
+        # Set layout/tab size in pixels
+        layout = GetLayout(view)
+        layout.SetSize(*int_animation_settings["ImageResolution"])
+
+        # Now the camera is set, discard particles that are out of view
+        if part_reduction is not None and int_particle_props["cull_to_view"]:
+            part_reduction["planes"] = get_frustum_planes(view)
+            update_python_filter(
+                part_data,
+                "paraview_wrapper.utils.particles.reduce_particles",
+                part_reduction,
+            )
+
+        # Optionally time the available volume mappers and use the fastest acceptable
+        # one
+        if autotune and int_data_settings["render_type"] == "Volume":
+            with stage("autotune"):
+                display, render_choice = autotune_volume_render(
+                    varname,
+                    vtu_data,
+                    view,
+                    display,
+                    int_animation_settings,
+                    autotune_settings=autotune if isinstance(autotune, dict) else {},
+                    output_fpath=output_fpath,
+                )
+            # The chosen mapper may differ from the requested one
+            view.AxesGrid.Visibility = (
+                0
+                if render_choice["render_mode"] == "Projected tetra"
+                else int_view_settings["show_axes_grid"]
+            )
+
+        print("Saving animation...")
+
+        # save animation
+        if render_order == "bisection":
+            save_animation_coarse_to_fine(output_fpath, view, **int_animation_settings)
+        else:
+            with stage("SaveAnimation"), frame_timer(anim_scene, view):
+                SaveAnimation(
+                    output_fpath,
+                    view,
+                    **int_animation_settings,
+                )
+
+        print(f"Saved animation to {output_fpath}")
@@ -21,14 +21,29 @@ from paraview.simple import (
 )
 from .time_filter import add_time_filter
 from ..utils import (
+    difference_from_run,
+    find_time_index,
+    frame_timer,
     gen_cbar_props,
     gen_opacity_pts,
     gen_registration_name,
+    get_frame_window,
+    get_manifest_vtu_data,
+    get_memory_report_fpath,
+    get_trace_fpath,
     get_ugrid_props,
     get_vtu_data,
+    interpolate_in_time,
+    memory_monitored,
+    resolve_auto_colour_map,
+    save_animation_coarse_to_fine,
+    scoped_pipeline,
+    stage,
+    traced,
 )
 
 
+@scoped_pipeline
 def fluid_slice(
     data_dir,
     fluid_var,
@@ -47,9 +62,20 @@ def fluid_slice(
     #     part_view_settings={},
     slice_settings={},
     tlbl_settings={},
+    interp_frames=0,
+    render_order="linear",
+    diff_data_dir=None,
+    diff_settings={},
+    profile=False,
+    memory_budget=None,
+    time_manifest=False,
 ):
     if output_basename is None:
         output_basename = fluid_vtu_basename
+    if render_order not in ["linear", "bisection"]:
+        raise ValueError(
+            f"fluid_slice: render_order must be 'linear' or 'bisection' (got {render_order})"
+        )
     # plotting_particles = part_data_fname is not None
 
     # Camera position(s), focal point(s)
@@ -75,207 +101,271 @@ def fluid_slice(
     if host:
         Connect(host)
 
-    # Read all Nektar vtus
-    fluid_data = get_vtu_data(data_dir, basename=fluid_vtu_basename)
-
-    # # Read particle data
-    # if plotting_particles:
-    #     part_data = H5PartReader(
-    #         registrationName=part_data_fname,
-    #         FileName=f"{data_dir}/{part_data_fname}",
-    #     )
-
-    # ------------------------------------------------------------------------------
-    # Create view(s), layout(s), assign data to views
-    layout = CreateLayout()
-    fluid_view = CreateView("RenderView")
-
-    views = [fluid_view]
-
-    # Get data dimension, this only works after calling Show()!
-    _dummy = Show(fluid_data, fluid_view, "UnstructuredGridRepresentation")
-    data_ndims = get_ugrid_props(fluid_data)["ndims"]
-    Hide(fluid_data, fluid_view)
-    # if plotting_particles:
-    #     layout.SplitVertical(0, 0.5)
-    #     part_view = CreateView("RenderView")
-    #     part_Display = Show(part_data, part_view, "GeometryRepresentation")
-    #     views.append(part_view)
-    #     AssignViewToLayout(view=fluid_view, layout=layout, hint=0)
-    #     AssignViewToLayout(view=part_view, layout=layout, hint=2)
-    # else:
-    #     AssignViewToLayout(view=fluid_view, layout=layout)
-    AssignViewToLayout(view=fluid_view, layout=layout)
-    slice = Slice(registrationName=gen_registration_name("Slice"), Input=fluid_data)
-
-    # Default origin is domain midpoint
-    def_origin = [0.00815, 0.00815, 5.0]
-    int_slice_settings = dict(
-        type="Plane",
-        HTGslicer="Plane",
-        normal=[0.0, 0.0, 1.0],
-        offset_vals=[0.0],
-        origin=def_origin,
-        HTG_origin=def_origin,
-    )
-    int_slice_settings.update(slice_settings)
-    slice.SliceType = int_slice_settings["type"]
-    slice.HyperTreeGridSlicer = int_slice_settings["HTGslicer"]
-    slice.SliceOffsetValues = int_slice_settings["offset_vals"]
-    slice.SliceType.Origin = int_slice_settings["origin"]
-    slice.HyperTreeGridSlicer.Origin = int_slice_settings["HTG_origin"]
-    slice.SliceType.Normal = int_slice_settings["normal"]
-
-    sliceDisplay = Show(slice, fluid_view, "GeometryRepresentation")
-
-    sliceDisplay.Representation = "Surface"
-    sliceDisplay.ColorArrayName = [None, ""]
-    sliceDisplay.SelectTCoordArray = "None"
-    sliceDisplay.SelectNormalArray = "None"
-    sliceDisplay.SelectTangentArray = "None"
-    sliceDisplay.OSPRayScaleArray = fluid_var
-    sliceDisplay.OSPRayScaleFunction = "PiecewiseFunction"
-    sliceDisplay.SelectOrientationVectors = "None"
-    sliceDisplay.ScaleFactor = 0.00163000003
-    sliceDisplay.SelectScaleArray = "None"
-    sliceDisplay.GlyphType = "Arrow"
-    sliceDisplay.GlyphTableIndexArray = "None"
-    sliceDisplay.GaussianRadius = 8.15000015e-05
-    sliceDisplay.SetScaleArray = ["POINTS", fluid_var]
-    sliceDisplay.ScaleTransferFunction = "PiecewiseFunction"
-    sliceDisplay.OpacityArray = ["POINTS", fluid_var]
-    sliceDisplay.OpacityTransferFunction = "PiecewiseFunction"
-    sliceDisplay.DataAxesGrid = "GridAxesRepresentation"
-    sliceDisplay.PolarAxes = "PolarAxesRepresentation"
-    sliceDisplay.SelectInputVectors = [None, ""]
-    sliceDisplay.WriteLog = ""
-    sliceDisplay.Triangulate = 0
-
-    if coord_scale is not None:
-        sliceDisplay.Scale = [coord_scale] * 3
-        sliceDisplay.DataAxesGrid.Scale = [coord_scale] * 3
-
-    # Common settings for all views
-    for view in views:
-        view.OrientationAxesVisibility = 0
-        view.AxesGrid.Visibility = 1
-
-    animation_scene = GetAnimationScene()
-    animation_scene.UpdateAnimationUsingDataTimeSteps()
-
-    # Colour fluid by density, set scale, setup colorbar
-    int_fluid_props = gen_cbar_props(
-        fluid_props,
-        colorby=fluid_var,
-        cbar_pos=[0.3, 0.75],
-        cbar_range=[0, 5],
-        cbar_title=fluid_var,
-        render_type="Surface",
-    )
-
-    # Create fluid color bar
-    ColorBy(sliceDisplay, ("POINTS", int_fluid_props["colorby"]))
-    fluid_cbar = GetScalarBar(
-        GetColorTransferFunction(int_fluid_props["colorby"]), fluid_view
-    )
-    cbars = [(fluid_cbar, int_fluid_props)]
-
-    #     if plotting_particles:
-    #         int_part_props = gen_cbar_props(
-    #             part_props,
-    #             colorby="COMPUTATIONAL_WEIGHT",
-    #             cbar_label_fontsize=15,
-    #             cbar_pos=[0.3, 0.1],
-    #             cbar_title="Particle Weight",
-    #             cbar_use_log=1,
-    #             cbar_vals=[v * 1e14 for v in [0.3, 1, 3, 10, 30]],
-    #             psize=2,
-    #         )
-
-    #         # Colour particle data by weight, set scale, setup colorbar
-    #         ColorBy(part_Display, ("POINTS", int_part_props["colorby"]))
-    #         part_cbar = GetScalarBar(
-    #             GetColorTransferFunction(int_part_props["colorby"]), part_view
-    #         )
-    #         cbars.append((part_cbar, int_part_props))
-
-    # Set colorbar properties
-    for cbar, props in cbars:
-        cbar.ComponentTitle = ""
-        cbar.LabelFontSize = props["cbar_label_fontsize"]
-        cbar.Orientation = props["cbar_orient"]
-        cbar.Position = props["cbar_pos"]
-        cbar.ScalarBarLength = props["cbar_len"]
-        cbar.Title = props["cbar_title"]
-        cbar.TitleFontSize = props["cbar_title_fontsize"]
-        cbar.WindowLocation = props["cbar_loc"]
-        if props["cbar_vals"]:
-            cbar.UseCustomLabels = 1
-            cbar.CustomLabels = props["cbar_vals"]
-
-        if "cbar_range" in props:
-            cbar_range = props["cbar_range"]
-        elif props["cbar_vals"]:
-            cbar_range = [props["cbar_vals"][0], props["cbar_vals"][-1]]
-        else:
-            cbar_range = [0, 1]
-
-        color_trans_func = GetColorTransferFunction(props["colorby"])
-        opac_trans_func = GetOpacityTransferFunction(props["colorby"])
-        for trans_func in [color_trans_func, opac_trans_func]:
-            trans_func.RescaleTransferFunction(*cbar_range)
-            trans_func.UseLogScale = props["cbar_use_log"]
-
-        if "opacities" in props:
-            opac_trans_func.Points = gen_opacity_pts(props["opacities"])
-            color_trans_func.EnableOpacityMapping = 1
-
-    #     # Rendering type
-    #     fluid_Display.SetRepresentationType(int_fluid_props["render_type"])
-    #     if int_fluid_props["render_type"] == "Volume":
-    #         fluid_Display.SelectMapper = int_fluid_props["render_mode"]
-
-    # Add a time label
-    int_tlbl_settings = {}
-    int_tlbl_settings.update(tlbl_settings)
-    if dt is not None:
-        add_time_filter(dt, fluid_data, view, int_tlbl_settings)
-
-    # ------------------------------------------------------------------------------
-    # Generate screenshot
-    layout.SetSize(1132, 816)
-
-    # Set camera positions, focal points
-    for view, settings in zip(views, int_view_settings):
-        # view.InteractionMode = f"{data_ndims}D"
-        view.CameraPosition = settings["pos"]
-        view.CameraFocalPoint = settings["fpt"]
-        view.CameraParallelScale = settings["pscale"]
-        view.CameraViewUp = settings["up"]
-
+    # Output path: a movie, or an image of the frame at <output_time>
     if output_time is None:
-        # Default animation settings
-        int_animation_settings = dict(FrameRate=20)
-        # Apply any animation settings passed by the user
-        int_animation_settings.update(animation_settings)
-
-        if "FrameWindow" in int_animation_settings:
-            nframes_max = len(fluid_data.FileName)
-            fw = int_animation_settings["FrameWindow"]
-            fw = [max(fw[0], 0), min(fw[1], nframes_max - 1)]
-            int_animation_settings["FrameWindow"] = fw
-
         output_fpath = os.path.join(output_dir, f"{output_basename}_{fluid_var}.avi")
-        SaveAnimation(
-            output_fpath,
-            view,
-            **int_animation_settings,
-        )
     else:
         t_string = f"_t{str(output_time)}"
         output_fpath = os.path.join(
             output_dir, f"{output_basename}_{fluid_var}{t_string}.png"
         )
-        # Choose animation frame
-        animation_scene.AnimationTime = output_time
-        SaveScreenshot(output_fpath, layout)
+
+    # Optionally record per-stage and per-frame timings and memory usage
+    with traced(get_trace_fpath(output_fpath), enabled=profile), memory_monitored(
+        memory_budget,
+        get_memory_report_fpath(output_fpath),
+        enabled=memory_budget is not None,
+    ):
+        # Read Nektar vtus. With a time manifest, <output_time> is a physical time and,
+        # for images, only the closest checkpoint is read (differences need the full
+        # series)
+        times = None
+        anim_time = output_time
+        if time_manifest:
+            single_file = output_time is not None and diff_data_dir is None
+            raw_fluid_data, times, time_idx = get_manifest_vtu_data(
+                data_dir,
+                basename=fluid_vtu_basename,
+                dt=dt,
+                time=output_time if single_file else None,
+            )
+            if single_file:
+                times, anim_time = [times[time_idx]], 0
+            elif output_time is not None:
+                anim_time = find_time_index(times, output_time)
+        else:
+            raw_fluid_data = get_vtu_data(data_dir, basename=fluid_vtu_basename)
+
+        # Optionally show the difference from another run on the same mesh
+        if diff_data_dir is None:
+            field_data = raw_fluid_data
+        else:
+            field_data = difference_from_run(
+                raw_fluid_data, data_dir, fluid_var, diff_data_dir, diff_settings
+            )
+
+        # Optionally synthesise frames between checkpoints (animations only)
+        if interp_frames and output_time is None:
+            fluid_data = interpolate_in_time(field_data, interp_frames)
+        else:
+            fluid_data = field_data
+
+        # # Read particle data
+        # if plotting_particles:
+        #     part_data = H5PartReader(
+        #         registrationName=part_data_fname,
+        #         FileName=f"{data_dir}/{part_data_fname}",
+        #     )
+
+        # ------------------------------------------------------------------------------
+        # Create view(s), layout(s), assign data to views
+        layout = CreateLayout()
+        fluid_view = CreateView("RenderView")
+
+        views = [fluid_view]
+
+        # Get data dimension, this only works after calling Show()!
+        _dummy = Show(fluid_data, fluid_view, "UnstructuredGridRepresentation")
+        data_ndims = get_ugrid_props(fluid_data)["ndims"]
+        Hide(fluid_data, fluid_view)
+        # if plotting_particles:
+        #     layout.SplitVertical(0, 0.5)
+        #     part_view = CreateView("RenderView")
+        #     part_Display = Show(part_data, part_view, "GeometryRepresentation")
+        #     views.append(part_view)
+        #     AssignViewToLayout(view=fluid_view, layout=layout, hint=0)
+        #     AssignViewToLayout(view=part_view, layout=layout, hint=2)
+        # else:
+        #     AssignViewToLayout(view=fluid_view, layout=layout)
+        AssignViewToLayout(view=fluid_view, layout=layout)
+        slice = Slice(registrationName=gen_registration_name("Slice"), Input=fluid_data)
+
+        # Default origin is domain midpoint
+        def_origin = [0.00815, 0.00815, 5.0]
+        int_slice_settings = dict(
+            type="Plane",
+            HTGslicer="Plane",
+            normal=[0.0, 0.0, 1.0],
+            offset_vals=[0.0],
+            origin=def_origin,
+            HTG_origin=def_origin,
+        )
+        int_slice_settings.update(slice_settings)
+        slice.SliceType = int_slice_settings["type"]
+        slice.HyperTreeGridSlicer = int_slice_settings["HTGslicer"]
+        slice.SliceOffsetValues = int_slice_settings["offset_vals"]
+        slice.SliceType.Origin = int_slice_settings["origin"]
+        slice.HyperTreeGridSlicer.Origin = int_slice_settings["HTG_origin"]
+        slice.SliceType.Normal = int_slice_settings["normal"]
+
+        sliceDisplay = Show(slice, fluid_view, "GeometryRepresentation")
+
+        sliceDisplay.Representation = "Surface"
+        sliceDisplay.ColorArrayName = [None, ""]
+        sliceDisplay.SelectTCoordArray = "None"
+        sliceDisplay.SelectNormalArray = "None"
+        sliceDisplay.SelectTangentArray = "None"
+        sliceDisplay.OSPRayScaleArray = fluid_var
+        sliceDisplay.OSPRayScaleFunction = "PiecewiseFunction"
+        sliceDisplay.SelectOrientationVectors = "None"
+        sliceDisplay.ScaleFactor = 0.00163000003
+        sliceDisplay.SelectScaleArray = "None"
+        sliceDisplay.GlyphType = "Arrow"
+        sliceDisplay.GlyphTableIndexArray = "None"
+        sliceDisplay.GaussianRadius = 8.15000015e-05
+        sliceDisplay.SetScaleArray = ["POINTS", fluid_var]
+        sliceDisplay.ScaleTransferFunction = "PiecewiseFunction"
+        sliceDisplay.OpacityArray = ["POINTS", fluid_var]
+        sliceDisplay.OpacityTransferFunction = "PiecewiseFunction"
+        sliceDisplay.DataAxesGrid = "GridAxesRepresentation"
+        sliceDisplay.PolarAxes = "PolarAxesRepresentation"
+        sliceDisplay.SelectInputVectors = [None, ""]
+        sliceDisplay.WriteLog = ""
+        sliceDisplay.Triangulate = 0
+
+        if coord_scale is not None:
+            sliceDisplay.Scale = [coord_scale] * 3
+            sliceDisplay.DataAxesGrid.Scale = [coord_scale] * 3
+
+        # Common settings for all views
+        for view in views:
+            view.OrientationAxesVisibility = 0
+            view.AxesGrid.Visibility = 1
+
+        animation_scene = GetAnimationScene()
+        animation_scene.UpdateAnimationUsingDataTimeSteps()
+
+        # Colour fluid by density, set scale, setup colorbar
+        int_fluid_props = gen_cbar_props(
+            fluid_props,
+            colorby=fluid_var,
+            cbar_pos=[0.3, 0.75],
+            cbar_range=[0, 5],
+            cbar_title=fluid_var if diff_data_dir is None else f"Δ{fluid_var}",
+            render_type="Surface",
+        )
+
+        # Create fluid color bar
+        ColorBy(sliceDisplay, ("POINTS", int_fluid_props["colorby"]))
+        fluid_cbar = GetScalarBar(
+            GetColorTransferFunction(int_fluid_props["colorby"]), fluid_view
+        )
+        if diff_data_dir is not None and "auto" in [
+            int_fluid_props["cbar_range"],
+            int_fluid_props.get("opacities"),
+        ]:
+            raise ValueError(
+                "fluid_slice: 'auto' colour maps aren't supported for differences"
+            )
+        resolve_auto_colour_map(
+            int_fluid_props,
+            data_dir,
+            fluid_var,
+            basename=fluid_vtu_basename,
+            range_key="cbar_range",
+            percentiles_key="cbar_percentiles",
+        )
+        cbars = [(fluid_cbar, int_fluid_props)]
+
+        #     if plotting_particles:
+        #         int_part_props = gen_cbar_props(
+        #             part_props,
+        #             colorby="COMPUTATIONAL_WEIGHT",
+        #             cbar_label_fontsize=15,
+        #             cbar_pos=[0.3, 0.1],
+        #             cbar_title="Particle Weight",
+        #             cbar_use_log=1,
+        #             cbar_vals=[v * 1e14 for v in [0.3, 1, 3, 10, 30]],
+        #             psize=2,
+        #         )
+
+        #         # Colour particle data by weight, set scale, setup colorbar
+        #         ColorBy(part_Display, ("POINTS", int_part_props["colorby"]))
+        #         part_cbar = GetScalarBar(
+        #             GetColorTransferFunction(int_part_props["colorby"]), part_view
+        #         )
+        #         cbars.append((part_cbar, int_part_props))
+
+        # Set colorbar properties
+        for cbar, props in cbars:
+            cbar.ComponentTitle = ""
+            cbar.LabelFontSize = props["cbar_label_fontsize"]
+            cbar.Orientation = props["cbar_orient"]
+            cbar.Position = props["cbar_pos"]
+            cbar.ScalarBarLength = props["cbar_len"]
+            cbar.Title = props["cbar_title"]
+            cbar.TitleFontSize = props["cbar_title_fontsize"]
+            cbar.WindowLocation = props["cbar_loc"]
+            if props["cbar_vals"]:
+                cbar.UseCustomLabels = 1
+                cbar.CustomLabels = props["cbar_vals"]
+
+            if "cbar_range" in props:
+                cbar_range = props["cbar_range"]
+            elif props["cbar_vals"]:
+                cbar_range = [props["cbar_vals"][0], props["cbar_vals"][-1]]
+            else:
+                cbar_range = [0, 1]
+
+            color_trans_func = GetColorTransferFunction(props["colorby"])
+            opac_trans_func = GetOpacityTransferFunction(props["colorby"])
+            for trans_func in [color_trans_func, opac_trans_func]:
+                trans_func.RescaleTransferFunction(*cbar_range)
+                trans_func.UseLogScale = props["cbar_use_log"]
+
+            if "opacities" in props:
+                opac_trans_func.Points = gen_opacity_pts(props["opacities"])
+                color_trans_func.EnableOpacityMapping = 1
+
+        #     # Rendering type
+        #     fluid_Display.SetRepresentationType(int_fluid_props["render_type"])
+        #     if int_fluid_props["render_type"] == "Volume":
+        #         fluid_Display.SelectMapper = int_fluid_props["render_mode"]
+
+        # Add a time label
+        int_tlbl_settings = {}
+        int_tlbl_settings.update(tlbl_settings)
+        if dt is not None or times is not None:
+            add_time_filter(dt, fluid_data, view, int_tlbl_settings, times=times)
+
+        # ------------------------------------------------------------------------------
+        # Generate screenshot
+        layout.SetSize(1132, 816)
+
+        # Set camera positions, focal points
+        for view, settings in zip(views, int_view_settings):
+            # view.InteractionMode = f"{data_ndims}D"
+            view.CameraPosition = settings["pos"]
+            view.CameraFocalPoint = settings["fpt"]
+            view.CameraParallelScale = settings["pscale"]
+            view.CameraViewUp = settings["up"]
+
+        if output_time is None:
+            # Default animation settings
+            int_animation_settings = dict(FrameRate=20)
+            # Apply any animation settings passed by the user
+            int_animation_settings.update(animation_settings)
+
+            if "FrameWindow" in int_animation_settings:
+                int_animation_settings["FrameWindow"] = get_frame_window(
+                    int_animation_settings["FrameWindow"],
+                    len(raw_fluid_data.FileName),
+                    interp_frames if output_time is None else 0,
+                )
+
+            if render_order == "bisection":
+                save_animation_coarse_to_fine(
+                    output_fpath, view, **int_animation_settings
+                )
+            else:
+                with stage("SaveAnimation"), frame_timer(animation_scene, view):
+                    SaveAnimation(
+                        output_fpath,
+                        view,
+                        **int_animation_settings,
+                    )
+        else:
+            # Choose animation frame
+            animation_scene.AnimationTime = anim_time
+            with stage("SaveScreenshot"):
+                SaveScreenshot(output_fpath, layout)
@@ -13,23 +13,56 @@ from paraview.simple import (
 )
 import re
 
+from .line_samples import extract_line_samples, plot_line_samples
 from .time_filter import add_time_filter
 from ..utils import (
+    PyExpr,
+    cached_plot_over_line,
+    frame_timer,
     gen_registration_name,
     get_color_array,
+    get_frame_window,
+    get_manifest_vtu_data,
+    get_memory_report_fpath,
+    get_trace_fpath,
     get_ugrid_bounds,
     get_vtu_data,
+    interpolate_in_time,
+    memory_monitored,
+    python_filter,
+    scoped_pipeline,
+    stage,
+    traced,
 )
 
 ### disable automatic camera reset on 'Show'
 _DisableFirstRenderCameraReset()
 
 
-class PyExpr:
-    def __init__(self, name, expr, data_dir=None):
-        self.name = name
-        self.expr = expr
-        self.data_dir = data_dir
+def _read_time_data(data_dir, vtu_basename, interp_frames, time_manifest, dt):
+    if time_manifest:
+        raw_data, times, _ = get_manifest_vtu_data(
+            data_dir, basename=vtu_basename, dt=dt
+        )
+    else:
+        raw_data = get_vtu_data(data_dir, basename=vtu_basename)
+        times = None
+    if interp_frames:
+        return raw_data, interpolate_in_time(raw_data, interp_frames), times
+    else:
+        return raw_data, raw_data, times
+
+
+def _sample_line(data, pts, line_sampler):
+    if line_sampler == "cached":
+        return cached_plot_over_line(data, pts[0], pts[1])
+    else:
+        line_plot = PlotOverLine(
+            registrationName=gen_registration_name("Line"), Input=data
+        )
+        line_plot.Point1 = pts[0]
+        line_plot.Point2 = pts[1]
+        return line_plot
 
 
 def set_series_props(display, varname, series_lbl, plot_settings):
@@ -78,6 +111,7 @@ def set_series_props(display, varname, series_lbl, plot_settings):
     return True
 
 
+@scoped_pipeline
 def line_plot_1d(
     varnames,
     data_dirs,
@@ -87,11 +121,18 @@ def line_plot_1d(
     dt=None,
     exprs_to_plot=[],
     host="",
+    interp_frames=0,
+    line_sampler="PlotOverLine",
+    mode="paraview",
+    nprocs=None,
     output_basename="",
     plot_settings={},
+    memory_budget=None,
+    profile=False,
     pts_arr=None,
     series_lbls=None,
     series_lbl_mode="var",
+    time_manifest=False,
     tlbl_settings={},
     vtu_basename="",
 ):
@@ -108,6 +149,33 @@ def line_plot_1d(
         assert isinstance(vn, str)
 
     assert len(data_dirs) == nseries
+    assert line_sampler in ["PlotOverLine", "cached"]
+    if mode not in ["paraview", "headless"]:
+        raise ValueError("line_plot_1d: mode must be 'paraview' or 'headless'")
+    if mode == "headless":
+        # Options that only apply to ParaView rendering
+        unsupported = [
+            name
+            for name, is_set in [
+                ("host", bool(host)),
+                ("interp_frames", bool(interp_frames)),
+                ("line_sampler", line_sampler != "PlotOverLine"),
+                ("time_manifest", bool(time_manifest)),
+            ]
+            if is_set
+        ]
+        if unsupported:
+            raise ValueError(
+                f"line_plot_1d: {', '.join(unsupported)} not supported in headless mode"
+            )
+    if host and line_sampler == "cached":
+        # The cached sampler is a programmable filter that imports this package, which
+        # a remote pvserver can't do
+        print(
+            "line_plot_1d: cached line sampler not available with a remote host; "
+            "using PlotOverLine"
+        )
+        line_sampler = "PlotOverLine"
     # Series labels
     if series_lbls is None:
         assert series_lbl_mode in ["var", "basename"]
@@ -116,145 +184,209 @@ def line_plot_1d(
         elif series_lbl_mode == "basename":
             series_lbls = [os.path.basename(d) for d in data_dirs]
 
-    if host:
-        Connect(host)
-
-    # Set line start-end points
-    vtu_data = {}
-    if pts_arr is None:
-        midpoints = [0.0, 0.0, 0.0]
-        pts = [list(midpoints), list(midpoints)]
-        # Get axis lims using first data dir
-        vtu_data[data_dirs[0]] = get_vtu_data(data_dirs[0], basename=vtu_basename)
-        axis_min, axis_max = get_ugrid_bounds(
-            vtu_data[data_dirs[0]], 0 if axis is None else axis
-        )
-        pts[0][axis] = axis_min
-        pts[1][axis] = axis_max
-        # Same start-end points for all series
-        pts_arr = [pts] * nseries
-    elif len(pts_arr) == 1:
-        if nseries > 1:
-            pts_arr = [pts_arr[0]] * nseries
-
-    assert len(pts_arr) == nseries
-
-    var_str = "-".join(varnames)
-    default_lbl = f"{var_str}_line_plot"
-    if not output_basename:
-        output_basename = default_lbl
-
-    # Ensure expressions are all instances instances of PyExpr
-    for expr in exprs_to_plot:
-        assert isinstance(expr, PyExpr)
-
     # Output path
+    if not output_basename:
+        output_basename = f"{'-'.join(varnames)}_line_plot"
     output_fpath = os.path.join(output_dir, output_basename + ".avi")
 
-    # Set up plot settings
-    int_plot_settings = dict(
-        legend_loc="TopRight",
-        legend_pos=[],
-        xlabel="x",
-        ylabel="",
-        xrange=[0.0, 2.0],
-        yrange=[-1.1, 2.2],
-        font_size=16,
-        colors={},
-        lstys={},
-    )
-    int_plot_settings.update(plot_settings)
-
-    # Get animation scene
-    anim_scene = GetAnimationScene()
-
-    # Update animation scene based on data timesteps
-    anim_scene.UpdateAnimationUsingDataTimeSteps()
-
-    line_plots = []
-    view = CreateView("XYChartView")
-    displays = []
-    for data_dir, varname, series_lbl, pts in zip(
-        data_dirs, varnames, series_lbls, pts_arr
+    # Optionally record per-stage and per-frame timings and memory usage
+    with traced(get_trace_fpath(output_fpath), enabled=profile), memory_monitored(
+        memory_budget,
+        get_memory_report_fpath(output_fpath),
+        enabled=memory_budget is not None,
     ):
-        if not data_dir in vtu_data:
-            vtu_data[data_dir] = get_vtu_data(data_dir, basename=vtu_basename)
-
-        # Create line plot
-        line_plot = PlotOverLine(
-            registrationName=gen_registration_name("Line"), Input=vtu_data[data_dir]
+        # Headless mode: sample everything into an array, then plot with matplotlib
+        if mode == "headless":
+            with stage("extract_line_samples"):
+                samples_fpath = extract_line_samples(
+                    varnames,
+                    data_dirs,
+                    os.path.join(output_dir, output_basename + "_samples.npz"),
+                    axis=axis,
+                    dt=dt,
+                    exprs_to_plot=exprs_to_plot,
+                    pts_arr=pts_arr,
+                    series_lbls=series_lbls,
+                    vtu_basename=vtu_basename,
+                )
+            with stage("plot_line_samples"):
+                plot_line_samples(
+                    samples_fpath,
+                    output_fpath,
+                    animation_settings=animation_settings,
+                    nprocs=nprocs,
+                    plot_settings=plot_settings,
+                    tlbl_settings=tlbl_settings,
+                )
+            return
+
+        if host:
+            Connect(host)
+
+        # Set line start-end points
+        raw_vtu_data = {}
+        vtu_data = {}
+        times = {}
+        if pts_arr is None:
+            midpoints = [0.0, 0.0, 0.0]
+            pts = [list(midpoints), list(midpoints)]
+            # Get axis lims using first data dir
+            (
+                raw_vtu_data[data_dirs[0]],
+                vtu_data[data_dirs[0]],
+                times[data_dirs[0]],
+            ) = _read_time_data(
+                data_dirs[0], vtu_basename, interp_frames, time_manifest, dt
+            )
+            axis_min, axis_max = get_ugrid_bounds(
+                vtu_data[data_dirs[0]], 0 if axis is None else axis
+            )
+            pts[0][axis] = axis_min
+            pts[1][axis] = axis_max
+            # Same start-end points for all series
+            pts_arr = [pts] * nseries
+        elif len(pts_arr) == 1:
+            if nseries > 1:
+                pts_arr = [pts_arr[0]] * nseries
+
+        assert len(pts_arr) == nseries
+
+        # Ensure expressions are all instances instances of PyExpr
+        for expr in exprs_to_plot:
+            assert isinstance(expr, PyExpr)
+
+        # Set up plot settings
+        int_plot_settings = dict(
+            legend_loc="TopRight",
+            legend_pos=[],
+            xlabel="x",
+            ylabel="",
+            xrange=[0.0, 2.0],
+            yrange=[-1.1, 2.2],
+            font_size=16,
+            colors={},
+            lstys={},
         )
-        line_plot.Point1 = pts[0]
-        line_plot.Point2 = pts[1]
-        line_plots.append(line_plot)
-
-        # show line plot in view
-        display = Show(line_plots[-1], view, "XYChartRepresentation")
-        displays.append(display)
-
-        series_props_set = set_series_props(
-            displays[-1], varname, series_lbl, int_plot_settings
-        )
-        if not series_props_set:
-            raise ValueError(f"Variable {varname} not found in [{data_dir}] data")
-
-    for expr_props in exprs_to_plot:
-        # If no data_dir was specified for the expression, just use the first one
-        expr_input = (
-            vtu_data[data_dirs[0]]
-            if expr_props.data_dir is None
-            else vtu_data[expr_props.data_dir]
-        )
-        expr = PythonCalculator(registrationName=expr_props.name, Input=expr_input)
-        expr.Expression = expr_props.expr
-        expr.ArrayName = expr_props.name
-        display = Show(expr, view, "XYChartRepresentation")
-        series_props_set = set_series_props(
-            display, expr.ArrayName, expr.ArrayName, int_plot_settings
-        )
-
-    view.BottomAxisRangeMinimum = int_plot_settings["xrange"][0]
-    view.BottomAxisRangeMaximum = int_plot_settings["xrange"][1]
-    view.BottomAxisTitle = int_plot_settings["xlabel"]
-    view.BottomAxisTitleBold = 0
-    view.BottomAxisTitleFontSize = int_plot_settings["font_size"]
-    view.BottomAxisUseCustomRange = 1
-    view.LeftAxisRangeMinimum = int_plot_settings["yrange"][0]
-    view.LeftAxisRangeMaximum = int_plot_settings["yrange"][1]
-    view.LeftAxisTitle = int_plot_settings["ylabel"]
-    view.LeftAxisTitleBold = 0
-    view.LeftAxisTitleFontSize = int_plot_settings["font_size"]
-    view.LeftAxisUseCustomRange = 1
-    if int_plot_settings["legend_pos"]:
-        view.LegendLocation = "Custom"
-        view.LegendPosition = int_plot_settings["legend_pos"]
-    else:
-        view.LegendLocation = int_plot_settings["legend_loc"]
-
-    if dt is not None:
-        add_time_filter(dt, vtu_data[data_dir], view, tlbl_settings)
-
-    # Default animation settings
-    int_animation_settings = dict(FrameRate=5)
-    # Apply any animation settings passed by the user
-    int_animation_settings.update(animation_settings)
-
-    if "FrameWindow" in int_animation_settings:
-        nframes_max = len(vtu_data[data_dir].FileName)
-        fw = int_animation_settings["FrameWindow"]
-        fw = [max(fw[0], 0), min(fw[1], nframes_max - 1)]
-
-    # Add view to layout
-    layout = GetLayout(view)
-    if "ImageResolution" in int_animation_settings:
-        layout.SetSize(*int_animation_settings["ImageResolution"])
-    AssignViewToLayout(view=view, layout=layout, hint=0)
-
-    # Save animation
-    SaveAnimation(
-        output_fpath,
-        view,
-        **int_animation_settings,
-    )
-
-    print(f"Saved animation to {output_fpath}")
+        int_plot_settings.update(plot_settings)
+
+        # Get animation scene
+        anim_scene = GetAnimationScene()
+
+        # Update animation scene based on data timesteps
+        anim_scene.UpdateAnimationUsingDataTimeSteps()
+
+        line_plots = []
+        view = CreateView("XYChartView")
+        displays = []
+        for data_dir, varname, series_lbl, pts in zip(
+            data_dirs, varnames, series_lbls, pts_arr
+        ):
+            if not data_dir in vtu_data:
+                (
+                    raw_vtu_data[data_dir],
+                    vtu_data[data_dir],
+                    times[data_dir],
+                ) = _read_time_data(
+                    data_dir, vtu_basename, interp_frames, time_manifest, dt
+                )
+
+            # Create line plot
+            line_plots.append(_sample_line(vtu_data[data_dir], pts, line_sampler))
+
+            # show line plot in view
+            display = Show(line_plots[-1], view, "XYChartRepresentation")
+            displays.append(display)
+
+            series_props_set = set_series_props(
+                displays[-1], varname, series_lbl, int_plot_settings
+            )
+            if not series_props_set:
+                raise ValueError(f"Variable {varname} not found in [{data_dir}] data")
+
+        for expr_props in exprs_to_plot:
+            # If no data_dir was specified for the expression, just use the first one
+            expr_dir = (
+                data_dirs[0] if expr_props.data_dir is None else expr_props.data_dir
+            )
+            if not expr_dir in vtu_data:
+                (
+                    raw_vtu_data[expr_dir],
+                    vtu_data[expr_dir],
+                    times[expr_dir],
+                ) = _read_time_data(
+                    expr_dir, vtu_basename, interp_frames, time_manifest, dt
+                )
+            # Evaluate the expression on the sampled line only, using the same line as
+            # the first series
+            expr_line = _sample_line(vtu_data[expr_dir], pts_arr[0], line_sampler)
+            if host:
+                # A remote pvserver can't import this package, so use the built-in
+                # filter
+                expr = PythonCalculator(
+                    registrationName=expr_props.name, Input=expr_line
+                )
+                expr.Expression = expr_props.expr
+                expr.ArrayName = expr_props.name
+            else:
+                # Compiled once and evaluated with NumPy
+                expr = python_filter(
+                    expr_line,
+                    "paraview_wrapper.utils.pyexpr.append_expr_array",
+                    kwargs=dict(name=expr_props.name, expr=expr_props.expr),
+                    prefix=expr_props.name,
+                )
+            display = Show(expr, view, "XYChartRepresentation")
+            series_props_set = set_series_props(
+                display, expr_props.name, expr_props.name, int_plot_settings
+            )
+
+        view.BottomAxisRangeMinimum = int_plot_settings["xrange"][0]
+        view.BottomAxisRangeMaximum = int_plot_settings["xrange"][1]
+        view.BottomAxisTitle = int_plot_settings["xlabel"]
+        view.BottomAxisTitleBold = 0
+        view.BottomAxisTitleFontSize = int_plot_settings["font_size"]
+        view.BottomAxisUseCustomRange = 1
+        view.LeftAxisRangeMinimum = int_plot_settings["yrange"][0]
+        view.LeftAxisRangeMaximum = int_plot_settings["yrange"][1]
+        view.LeftAxisTitle = int_plot_settings["ylabel"]
+        view.LeftAxisTitleBold = 0
+        view.LeftAxisTitleFontSize = int_plot_settings["font_size"]
+        view.LeftAxisUseCustomRange = 1
+        if int_plot_settings["legend_pos"]:
+            view.LegendLocation = "Custom"
+            view.LegendPosition = int_plot_settings["legend_pos"]
+        else:
+            view.LegendLocation = int_plot_settings["legend_loc"]
+
+        if dt is not None or times[data_dir] is not None:
+            add_time_filter(
+                dt, vtu_data[data_dir], view, tlbl_settings, times=times[data_dir]
+            )
+
+        # Default animation settings
+        int_animation_settings = dict(FrameRate=5)
+        # Apply any animation settings passed by the user
+        int_animation_settings.update(animation_settings)
+
+        if "FrameWindow" in int_animation_settings:
+            int_animation_settings["FrameWindow"] = get_frame_window(
+                int_animation_settings["FrameWindow"],
+                len(raw_vtu_data[data_dir].FileName),
+                interp_frames,
+            )
+
+        # Add view to layout
+        layout = GetLayout(view)
+        if "ImageResolution" in int_animation_settings:
+            layout.SetSize(*int_animation_settings["ImageResolution"])
+        AssignViewToLayout(view=view, layout=layout, hint=0)
+
+        # Save animation
+        with stage("SaveAnimation"), frame_timer(anim_scene, view):
+            SaveAnimation(
+                output_fpath,
+                view,
+                **int_animation_settings,
+            )
+
+        print(f"Saved animation to {output_fpath}")
@@ -0,0 +1,301 @@
+"""
+Headless alternative to the XYChartView line plot movies. All series are sampled along
+the line for every timestep into (ntimes, npoints) arrays saved in a single .npz, then
+frames are drawn from that file with matplotlib in a process pool. Plots can be
+re-styled by calling plot_line_samples again, without touching the simulation data.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import os.path
+import shutil
+
+import numpy as np
+
+from ..utils import (
+    apply_interp_weights,
+    find_vtu_paths,
+    frames_to_movie,
+    get_color_vals,
+    get_frame_window,
+    get_interp_weights,
+    get_mpl_linestyle,
+    line_points,
+    read_point_arrays,
+    read_vtu,
+)
+
+# ParaView chart legend locations => matplotlib equivalents
+_LEGEND_LOCS = dict(
+    TopLeft="upper left",
+    TopRight="upper right",
+    BottomLeft="lower left",
+    BottomRight="lower right",
+    Top="upper center",
+    Bottom="lower center",
+    Left="center left",
+    Right="center right",
+)
+
+
+def extract_line_samples(
+    varnames,
+    data_dirs,
+    output_fpath,
+    axis=None,
+    dt=None,
+    exprs_to_plot=[],
+    pts_arr=None,
+    resolution=1000,
+    series_lbls=None,
+    vtu_basename="",
+):
+    """
+    Sample every variable in <varnames> (one per data dir) and every expression in
+    <exprs_to_plot> along a line, for all timesteps. Saves an .npz with, for each series
+    i, x{i} (arc length, shape (npoints,)), y{i} (shape (ntimes, npoints)) and valid{i}
+    (points found inside the mesh), along with the series labels and times.
+    """
+    if series_lbls is None:
+        series_lbls = varnames
+    fpaths = {
+        data_dir: find_vtu_paths(data_dir, basename=vtu_basename)[0]
+        for data_dir in set(data_dirs)
+    }
+    meshes = {data_dir: read_vtu(fpaths[data_dir][0], arrays=[]) for data_dir in fpaths}
+
+    # Default line spans the first mesh along <axis>
+    if pts_arr is None:
+        axis = 0 if axis is None else axis
+        bounds = meshes[data_dirs[0]].GetBounds()
+        pts = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+        pts[0][axis] = bounds[2 * axis]
+        pts[1][axis] = bounds[2 * axis + 1]
+        pts_arr = [pts]
+    if len(pts_arr) == 1:
+        pts_arr = pts_arr * len(varnames)
+
+    # (label, data_dir, varname or None, PyExpr or None, line end points)
+    series = [
+        (lbl, data_dir, varname, None, pts)
+        for lbl, data_dir, varname, pts in zip(
+            series_lbls, data_dirs, varnames, pts_arr
+        )
+    ]
+    for expr in exprs_to_plot:
+        expr_dir = data_dirs[0] if expr.data_dir is None else expr.data_dir
+        series.append((expr.name, expr_dir, None, expr, pts_arr[0]))
+        if expr_dir not in fpaths:
+            fpaths[expr_dir] = find_vtu_paths(expr_dir, basename=vtu_basename)[0]
+            meshes[expr_dir] = read_vtu(fpaths[expr_dir][0], arrays=[])
+
+    # Interpolation weights are computed once per mesh and line
+    weights = []
+    for _, data_dir, _, _, pts in series:
+        key = ("line", tuple(pts[0]), tuple(pts[1]), resolution)
+        line_pts = line_points(pts[0], pts[1], resolution)
+        weights.append(get_interp_weights(meshes[data_dir], line_pts, key))
+
+    # Only read the arrays that are needed
+    arrays_to_read = {}
+    for _, data_dir, varname, expr, _ in series:
+        needed = [varname] if expr is None else expr.array_names
+        arrays_to_read[data_dir] = sorted(
+            set(arrays_to_read.get(data_dir, [])).union(needed)
+        )
+
+    # Sample variables, and expression inputs, along each line
+    ntimes = min([len(fpaths[data_dir]) for data_dir in arrays_to_read])
+    samples = np.zeros((len(series), ntimes, resolution + 1))
+    expr_inputs = [
+        {name: np.zeros((ntimes, resolution + 1)) for name in expr.array_names}
+        for _, _, _, expr, _ in series
+        if expr is not None
+    ]
+    for itime in range(ntimes):
+        point_data = {
+            data_dir: read_point_arrays(fpaths[data_dir][itime], arrays)
+            for data_dir, arrays in arrays_to_read.items()
+        }
+        iexpr = 0
+        for iseries, (_, data_dir, varname, expr, pts) in enumerate(series):
+            pt_ids, wts, valid = weights[iseries]
+            if expr is None:
+                samples[iseries, itime] = apply_interp_weights(
+                    point_data[data_dir][varname], pt_ids, wts, valid
+                )
+            else:
+                for name in expr.array_names:
+                    expr_inputs[iexpr][name][itime] = apply_interp_weights(
+                        point_data[data_dir][name], pt_ids, wts, valid
+                    )
+                iexpr += 1
+        print(f"extract_line_samples: sampled {itime+1}/{ntimes} timesteps", end="\r")
+    print()
+
+    # Evaluate each expression once, over all timesteps
+    iexpr = 0
+    for iseries, (_, _, _, expr, pts) in enumerate(series):
+        if expr is not None:
+            samples[iseries] = expr.evaluate(
+                expr_inputs[iexpr], line_points(pts[0], pts[1], resolution)
+            )
+            iexpr += 1
+
+    npz_contents = dict(
+        labels=np.array([s[0] for s in series]),
+        times=np.arange(ntimes) * (1.0 if dt is None else dt),
+        has_dt=dt is not None,
+    )
+    for iseries, (_, _, _, _, pts) in enumerate(series):
+        line_pts = line_points(pts[0], pts[1], resolution)
+        npz_contents[f"x{iseries}"] = np.linalg.norm(line_pts - line_pts[0], axis=1)
+        npz_contents[f"y{iseries}"] = samples[iseries]
+        npz_contents[f"valid{iseries}"] = weights[iseries][2]
+    np.savez(output_fpath, **npz_contents)
+    print(f"Saved line samples to {output_fpath}")
+    return output_fpath
+
+
+def _plot_frames(
+    samples_fpath,
+    frame_indices,
+    frame_fpaths,
+    plot_settings,
+    tlbl_settings,
+    image_resolution,
+):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    with np.load(samples_fpath) as samples:
+        labels = list(samples["labels"])
+        times = samples["times"]
+        has_dt = bool(samples["has_dt"])
+        xs = [samples[f"x{ii}"] for ii in range(len(labels))]
+        ys = [
+            np.where(samples[f"valid{ii}"], samples[f"y{ii}"], np.nan)
+            for ii in range(len(labels))
+        ]
+
+    dpi = 100
+    fig, ax = plt.subplots(
+        figsize=(image_resolution[0] / dpi, image_resolution[1] / dpi), dpi=dpi
+    )
+    lines = []
+    for lbl, x, y in zip(labels, xs, ys):
+        (line,) = ax.plot(
+            x,
+            y[frame_indices[0]],
+            color=get_color_vals(plot_settings["colors"].get(lbl, "r")),
+            linestyle=get_mpl_linestyle(plot_settings["lstys"].get(lbl, "1")),
+            label=lbl,
+        )
+        lines.append(line)
+    ax.set_xlim(*plot_settings["xrange"])
+    ax.set_ylim(*plot_settings["yrange"])
+    ax.set_xlabel(plot_settings["xlabel"], fontsize=plot_settings["font_size"])
+    ax.set_ylabel(plot_settings["ylabel"], fontsize=plot_settings["font_size"])
+    if plot_settings["legend_pos"]:
+        ax.legend(
+            loc="lower left",
+            bbox_to_anchor=[
+                plot_settings["legend_pos"][0] / image_resolution[0],
+                plot_settings["legend_pos"][1] / image_resolution[1],
+            ],
+            bbox_transform=fig.transFigure,
+        )
+    else:
+        ax.legend(loc=_LEGEND_LOCS.get(plot_settings["legend_loc"], "best"))
+    tlbl = None
+    if has_dt:
+        tlbl = fig.text(*tlbl_settings["pos"], "", fontsize=tlbl_settings["fontsize"])
+        tlbl_fmt = "Time: {time:" + tlbl_settings["fmt"] + "}"
+        if "unit" in tlbl_settings:
+            tlbl_fmt += " " + tlbl_settings["unit"]
+
+    for idx, frame_fpath in zip(frame_indices, frame_fpaths):
+        for line, y in zip(lines, ys):
+            line.set_ydata(y[idx])
+        if tlbl is not None:
+            tlbl.set_text(tlbl_fmt.format(time=times[idx] + tlbl_settings["init_val"]))
+        fig.savefig(frame_fpath, dpi=dpi)
+    plt.close(fig)
+
+
+def plot_line_samples(
+    samples_fpath,
+    output_fpath,
+    animation_settings={},
+    nprocs=None,
+    plot_settings={},
+    tlbl_settings={},
+):
+    """
+    Draw a line plot movie from an .npz written by extract_line_samples. Frames are
+    drawn with matplotlib in a pool of <nprocs> processes. Settings have the same meaning
+    as in line_plot_1d.
+    """
+    int_plot_settings = dict(
+        legend_loc="TopRight",
+        legend_pos=[],
+        xlabel="x",
+        ylabel="",
+        xrange=[0.0, 2.0],
+        yrange=[-1.1, 2.2],
+        font_size=16,
+        colors={},
+        lstys={},
+    )
+    int_plot_settings.update(plot_settings)
+    tlbl_settings_int = dict(pos=[0.6, 0.1], fmt=".1E", fontsize=14, init_val=0.0)
+    tlbl_settings_int.update(tlbl_settings)
+    int_animation_settings = dict(FrameRate=5, ImageResolution=[1920, 1080])
+    int_animation_settings.update(animation_settings)
+
+    with np.load(samples_fpath) as samples:
+        ntimes = len(samples["times"])
+    fw = get_frame_window(
+        int_animation_settings.get("FrameWindow", [0, ntimes - 1]), ntimes
+    )
+    frame_indices = list(
+        range(fw[0], fw[1] + 1, int_animation_settings.get("FrameStride", 1))
+    )
+    if not frame_indices:
+        raise ValueError(
+            f"plot_line_samples: no frames to plot (frame window {list(fw)} of "
+            f"{ntimes} timesteps)"
+        )
+
+    frames_dir = os.path.splitext(output_fpath)[0] + "_frames"
+    os.makedirs(frames_dir, exist_ok=True)
+    frame_fpaths = [
+        os.path.join(frames_dir, f"frame_{ii:05d}.png")
+        for ii in range(len(frame_indices))
+    ]
+
+    # Divide frames into contiguous chunks, one per process
+    nprocs = os.cpu_count() if nprocs is None else nprocs
+    nchunks = max(min(nprocs, len(frame_indices)), 1)
+    chunks = np.array_split(np.arange(len(frame_indices)), nchunks)
+    with ProcessPoolExecutor(max_workers=nchunks) as executor:
+        futures = [
+            executor.submit(
+                _plot_frames,
+                samples_fpath,
+                [frame_indices[ii] for ii in chunk],
+                [frame_fpaths[ii] for ii in chunk],
+                int_plot_settings,
+                tlbl_settings_int,
+                int_animation_settings["ImageResolution"],
+            )
+            for chunk in chunks
+        ]
+        for future in futures:
+            future.result()
+
+    frames_to_movie(frame_fpaths, output_fpath, int_animation_settings["FrameRate"])
+    shutil.rmtree(frames_dir)
+    print(f"Saved animation to {output_fpath}")
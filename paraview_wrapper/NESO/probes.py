@@ -0,0 +1,75 @@
+import os.path
+
+import numpy as np
+
+from ..utils import (
+    apply_interp_weights,
+    find_vtu_paths,
+    get_chk_times,
+    get_interp_weights,
+    read_point_arrays,
+    read_vtu,
+)
+
+
+def gen_probe_time_series(
+    data_dir,
+    probe_pts,
+    varnames,
+    dt=None,
+    output_dir=".",
+    output_fname="probes.npz",
+    vtu_basename="",
+):
+    """
+    Sample <varnames> at fixed probe positions for every timestep.
+    The cells containing <probe_pts> and the interpolation weights are found once, on
+    the (shared) mesh of the first file; each file is then just read and gathered from.
+    Writes an .npz with:
+        values   : (ntimes, nprobes, nvars) array
+        times    : (ntimes,) array
+        probes   : (nprobes, 3) array of probe coordinates
+        varnames : (nvars,) array of variable names
+        valid    : (nprobes,) mask of probes found inside the mesh
+    """
+    fpaths, _ = find_vtu_paths(data_dir, basename=vtu_basename)
+    if not fpaths:
+        raise RuntimeError(
+            f"gen_probe_time_series: No (p)vtu files found in {data_dir}"
+        )
+
+    probe_pts = np.array(
+        [list(pt) + [0.0] * (3 - len(pt)) for pt in probe_pts], dtype=float
+    )
+    key = ("probes", tuple(map(tuple, probe_pts)))
+    pt_ids, weights, valid = get_interp_weights(
+        read_vtu(fpaths[0], arrays=[]), probe_pts, key
+    )
+    if not valid.all():
+        print(
+            f"gen_probe_time_series: WARNING - probes {list(np.flatnonzero(~valid))} are outside the mesh; their values will be NaN"
+        )
+
+    values = np.zeros((len(fpaths), len(probe_pts), len(varnames)))
+    for ifile, fpath in enumerate(fpaths):
+        point_data = read_point_arrays(fpath, varnames)
+        for ivar, varname in enumerate(varnames):
+            values[ifile, :, ivar] = apply_interp_weights(
+                point_data[varname], pt_ids, weights, valid, fill_value=np.nan
+            )
+        print(
+            f"gen_probe_time_series: processed {ifile+1}/{len(fpaths)} files", end="\r"
+        )
+    print()
+
+    output_fpath = os.path.join(output_dir, output_fname)
+    np.savez(
+        output_fpath,
+        values=values,
+        times=np.array(get_chk_times(data_dir, fpaths, dt=dt)),
+        probes=probe_pts,
+        varnames=np.array(varnames),
+        valid=valid,
+    )
+    print(f"Wrote probe time series to {output_fpath}")
+    return output_fpath
@@ -1,7 +1,24 @@
-from paraview.simple import AnnotateTimeFilter, Show
+from paraview.simple import AnnotateTimeFilter, PythonAnnotation, Show
 
 
-def add_time_filter(dt, input_data, view, tlbl_settings={}):
+def _gen_time_lookup_expr(times, fmt, shift):
+    """
+    PythonAnnotation expression mapping the reader time (a file index, possibly
+    fractional if frames are interpolated) to a physical time in <times>.
+    """
+    nmax = len(times) - 1
+    idx = f"max(0.0, min(float(t_value), {nmax}))"
+    return (
+        f"'{{:{fmt}}}'.format((lambda T, i: {shift!r} + T[int(i)] + (i - int(i)) * "
+        f"(T[min(int(i) + 1, {nmax})] - T[int(i)]))({list(times)!r}, {idx}))"
+    )
+
+
+def add_time_filter(dt, input_data, view, tlbl_settings={}, times=None):
+    """
+    Add a time label to <view>. The time shown is <dt> times the reader time (the file
+    index) or, if <times> (one physical time per file) is given, looked up from that.
+    """
     # Extract representation type name to make this usable for multiple types of images, charts
     repr_name = type(view.Representations[0]).__name__
     if len(view.Representations) != 1:
@@ -13,23 +30,38 @@ def add_time_filter(dt, input_data, view, tlbl_settings={}):
     tlbl_settings_int = dict(pos=[0.6, 0.1], fmt=".1E", fontsize=14, init_val=0.0)
     tlbl_settings_int.update(tlbl_settings)
 
-    # Create an 'Annotate Time Filter'
-    filter = AnnotateTimeFilter(
-        registrationName="annotate_time_filter", Input=input_data
-    )
-
-    filter.Format = "Time: {time:" + tlbl_settings_int["fmt"] + "}"
-    if "unit" in tlbl_settings_int:
-        filter.Format += " " + tlbl_settings_int["unit"]
-    filter.Scale = dt
-    filter.Shift = tlbl_settings_int["init_val"]
+    unit_str = " " + tlbl_settings_int["unit"] if "unit" in tlbl_settings_int else ""
+    if times is None:
+        # Create an 'Annotate Time Filter'
+        filter = AnnotateTimeFilter(
+            registrationName="annotate_time_filter", Input=input_data
+        )
+        filter.Format = "Time: {time:" + tlbl_settings_int["fmt"] + "}" + unit_str
+        filter.Scale = dt
+        filter.Shift = tlbl_settings_int["init_val"]
+    else:
+        # Variable output cadence; look up the time of each file
+        filter = PythonAnnotation(
+            registrationName="annotate_time_filter", Input=input_data
+        )
+        filter.Expression = (
+            "'Time: ' + "
+            + _gen_time_lookup_expr(
+                times, tlbl_settings_int["fmt"], tlbl_settings_int["init_val"]
+            )
+            + f" + {unit_str!r}"
+        )
 
     # Show data in view
     # Includes fudge to make this work for different data representations
     if repr_name == "XYChartRepresentation":
         display = Show(filter, view, "ChartTextRepresentation")
         display.LabelLocation = "Any Location"
-    elif repr_name == "UnstructuredGridRepresentation":
+    elif repr_name in [
+        "GeometryRepresentation",
+        "UniformGridRepresentation",
+        "UnstructuredGridRepresentation",
+    ]:
         display = Show(filter, view, "TextSourceRepresentation")
         display.WindowLocation = "Any Location"
     else:
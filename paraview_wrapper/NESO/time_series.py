@@ -0,0 +1,40 @@
+import os.path
+
+from ..utils import (
+    find_vtu_paths,
+    get_chk_times,
+    reduce_files,
+    write_time_series,
+)
+
+
+def gen_time_series(
+    data_dir,
+    reductions,
+    dt=None,
+    nprocs=None,
+    output_dir=".",
+    output_fname="time_series.csv",
+    vtu_basename="",
+):
+    """
+    Compute scalar time histories from Nektar output and write them to CSV (or NPZ, if
+    <output_fname> ends in .npz).
+    <reductions> maps column names to (reduction, quantity) pairs, where reduction is one
+    of utils.reductions.REDUCTIONS and quantity is a point array name or a PyExpr, e.g.
+        dict(
+            max_ne=("max", "ne"),
+            total_ne=("integral", "ne"),
+            field_energy=("integral", PyExpr("E", "0.5*inputs[0].PointData['phi']**2")),
+        )
+    Integrals and means are weighted by the volume associated with each mesh point.
+    """
+    fpaths, _ = find_vtu_paths(data_dir, basename=vtu_basename)
+    if not fpaths:
+        raise RuntimeError(f"gen_time_series: No (p)vtu files found in {data_dir}")
+
+    times = get_chk_times(data_dir, fpaths, dt=dt)
+
+    results = reduce_files(fpaths, reductions, nprocs=nprocs)
+    write_time_series(os.path.join(output_dir, output_fname), times, results)
+    return times, results
@@ -1,36 +1,23 @@
-import glob
-import os.path
-import sys
+"""
+ParaView is only located and imported when a function that needs it is first used;
+see utils/__init__.py and NESO/__init__.py.
+"""
 
+from . import NESO, utils
+from .utils.system import find_paraview
 
-def _paraview_importable():
-    try:
-        import paraview
+__all__ = sorted(set(utils.__all__) | set(NESO.__all__))
 
-        return True
-    except:
-        return False
 
+def __getattr__(name):
+    # NESO names take precedence, as they did when both were star-imported
+    for module in [NESO, utils]:
+        if name in module.__all__:
+            val = getattr(module, name)
+            globals()[name] = val
+            return val
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def find_paraview():
-    if _paraview_importable():
-        return
-    else:
-        # Try and find via environment variable
-        site_packages_from_envvar = glob.glob(
-            os.path.join(os.getenv("PARAVIEW_ROOT"), "lib/python*/site-packages")
-        )
-        if site_packages_from_envvar:
-            sys.path.append(site_packages_from_envvar[0])
 
-        if _paraview_importable():
-            return
-        else:
-            raise ModuleNotFoundError(
-                "Unable to find paraview - add <paraview>/lib/python*/site-packages to your PYTHONPATH or define PARAVIEW_ROOT env var."
-            )
-
-
-find_paraview()
-from .utils import *
-from .NESO import *
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
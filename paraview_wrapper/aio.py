@@ -0,0 +1,245 @@
+"""
+asyncio interface to the NESO entry points. Each render runs in its own spawned worker
+process, so the event loop isn't blocked, and streams progress events back (stage
+starts/ends and animation frames; see utils/profiling.py), e.g.
+
+    render = gen_movie_async("ne", data_dir, output_dir, dt=0.1)
+    async for event in render.events():
+        print(event)
+    await render  # raises RenderError if the render failed
+
+Renders start when first awaited or iterated over, so gather_limited can run many of
+them with a cap on how many are in progress at once. Cancelling the task awaiting a
+render, or iterating over its events, stops its worker (SIGTERM, so that it can clean
+up, then SIGKILL after a grace period). The worker raises RenderCancelled at the next
+progress event, stopping the animation if it's mid-SaveAnimation; a stage that sends no
+events for longer than the grace period (e.g. reading a large file) is killed.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+
+from .batch import resolve_entry_point
+
+# Events that end a render
+_FINAL_EVENTS = ["done", "failed", "cancelled"]
+
+
+class RenderCancelled(Exception):
+    """
+    A render was stopped before it finished.
+    """
+
+
+class RenderError(RuntimeError):
+    """
+    A render failed; the message includes the worker's traceback.
+    """
+
+
+def _worker(entry_point, args, kwargs, conn):
+    """
+    Run <entry_point> (in a spawned process), sending progress events down <conn>.
+    """
+    from .utils.profiling import set_progress_callback
+
+    mask_sigterm = hasattr(signal, "pthread_sigmask")
+    cancel_requested = False
+
+    def on_sigterm(signum, frame):
+        # Raising here is enough while Python code is running, but during SaveAnimation
+        # this runs in a VTK observer, which swallows the exception, so also set a flag
+        # for progress() to act on
+        nonlocal cancel_requested
+        cancel_requested = True
+        raise RenderCancelled()
+
+    def send(event):
+        # Don't let a cancellation interrupt a message half way through
+        if mask_sigterm:
+            signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGTERM])
+        try:
+            conn.send(event)
+        finally:
+            if mask_sigterm:
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, [signal.SIGTERM])
+
+    def progress(event):
+        # Raised from the frame observer, this stops the animation (see frame_timer)
+        if cancel_requested:
+            raise RenderCancelled()
+        send(event)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    set_progress_callback(progress)
+    start = time.perf_counter()
+    send(dict(event="started", pid=os.getpid(), entry_point=entry_point))
+    try:
+        resolve_entry_point(entry_point)(*args, **kwargs)
+        send(dict(event="done", wall_s=time.perf_counter() - start))
+    except RenderCancelled:
+        send(dict(event="cancelled", wall_s=time.perf_counter() - start))
+    except BaseException:
+        send(dict(event="failed", error=traceback.format_exc()))
+    finally:
+        set_progress_callback(None)
+        conn.close()
+
+
+class AsyncRender:
+    """
+    A call of <entry_point> (see batch.resolve_entry_point) in a worker process.
+    Awaiting it returns the final event (or raises RenderError/RenderCancelled);
+    events() yields progress events as they arrive.
+    """
+
+    def __init__(self, entry_point, args=(), kwargs={}, poll_interval=0.1):
+        self.entry_point = entry_point
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs)
+        self.poll_interval = poll_interval
+        self.result = None
+        self._process = None
+
+    def start(self):
+        """
+        Start the worker, if it hasn't been already. Needs a running event loop.
+        """
+        if self._process is not None:
+            return
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe(duplex=False)
+        self._process = ctx.Process(
+            target=_worker,
+            args=(self.entry_point, self.args, self.kwargs, child_conn),
+            name=self.entry_point,
+        )
+        self._process.start()
+        child_conn.close()
+        self._events = asyncio.Queue()
+        # Always drain the pipe, so the worker can't block on a full one
+        self._pump_task = asyncio.ensure_future(self._pump())
+
+    async def _pump(self):
+        result = None
+        eof = False
+        while not eof:
+            while self._conn.poll():
+                try:
+                    event = self._conn.recv()
+                except EOFError:
+                    eof = True
+                    break
+                if event["event"] in _FINAL_EVENTS:
+                    result = event
+                self._events.put_nowait(event)
+            if not eof and not self._process.is_alive() and not self._conn.poll():
+                break
+            if not eof:
+                await asyncio.sleep(self.poll_interval)
+        self._conn.close()
+        self._process.join()
+        if result is None:
+            exitcode = self._process.exitcode
+            result = dict(event="failed", error=f"worker exited with code {exitcode}")
+            self._events.put_nowait(result)
+        # End of events
+        self._events.put_nowait(None)
+        self.result = result
+        return result
+
+    async def events(self):
+        """
+        Yield progress events until the render ends (the last event is done, failed
+        or cancelled). If the iterating task is cancelled, the render is stopped too.
+        """
+        self.start()
+        while True:
+            try:
+                event = await self._events.get()
+            except asyncio.CancelledError:
+                await self.cancel()
+                raise
+            if event is None:
+                return
+            yield event
+
+    async def wait(self):
+        """
+        Wait for the render to end and return its final event. If the waiting task is
+        cancelled, the render is stopped too.
+        """
+        self.start()
+        try:
+            result = await asyncio.shield(self._pump_task)
+        except asyncio.CancelledError:
+            await self.cancel()
+            raise
+        if result["event"] == "failed":
+            raise RenderError(f"{self.entry_point} failed:\n{result['error']}")
+        elif result["event"] == "cancelled":
+            raise RenderCancelled(f"{self.entry_point} was cancelled")
+        return result
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    async def cancel(self, grace=10.0):
+        """
+        Stop the worker: ask it to exit (so that it can clean up), then kill it if it
+        hasn't after <grace> seconds. Returns the final event.
+        """
+        if self._process is None:
+            return None
+        if self._process.is_alive():
+            self._process.terminate()
+            deadline = time.perf_counter() + grace
+            while self._process.is_alive() and time.perf_counter() < deadline:
+                await asyncio.sleep(self.poll_interval)
+            if self._process.is_alive():
+                self._process.kill()
+        return await self._pump_task
+
+
+def gen_movie_async(*args, **kwargs):
+    """
+    gen_movie in a worker process; see AsyncRender.
+    """
+    return AsyncRender("gen_movie", args, kwargs)
+
+
+def gen_img_async(*args, **kwargs):
+    """
+    gen_img in a worker process; see AsyncRender.
+    """
+    return AsyncRender("gen_img", args, kwargs)
+
+
+def line_plot_1d_async(*args, **kwargs):
+    """
+    line_plot_1d in a worker process; see AsyncRender.
+    """
+    return AsyncRender("line_plot_1d", args, kwargs)
+
+
+async def gather_limited(*aws, limit=None, return_exceptions=False):
+    """
+    asyncio.gather for renders (or other awaitables), with at most <limit> of them
+    awaited at once. Since renders start when first awaited, this caps the number of
+    worker processes.
+    """
+    if limit is None:
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def limited(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *[limited(aw) for aw in aws], return_exceptions=return_exceptions
+    )
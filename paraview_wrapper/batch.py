@@ -0,0 +1,405 @@
+"""
+Batch runs of paraview_wrapper entry points (or any importable function) from a JSON or
+YAML job file. Each job attempt runs in its own spawned worker process, so a crash or
+leak in one job can't affect the others. Usage:
+    python -m paraview_wrapper.batch jobs.json [-n NWORKERS] [--force] [--dry-run]
+
+A job file is a list of jobs, or a dict with "jobs" and optional "defaults" (applied to
+every job). Each job has:
+    entry_point:  name exported by paraview_wrapper (e.g. "gen_movie") or "module.func"
+    args, kwargs: positional/keyword arguments (kwargs may include data_dir etc.)
+    name:         optional; defaults to <index>_<entry_point>
+    inputs:       files/directories the outputs depend on (default: kwargs["data_dir"])
+    outputs:      files the job writes; if all are newer than the inputs and the job
+                  spec hasn't changed since they were written, the job is skipped
+    retries:      extra attempts after a failure (default 0)
+    memory_limit: e.g. "16GB"; the worker is killed if its RSS exceeds this, and
+                  entry points with a memory_budget parameter get a budget below it
+    timeout:      seconds before the worker is killed
+"""
+
+import argparse
+import collections
+import hashlib
+import importlib
+import inspect
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import os.path
+import sys
+import time
+import traceback
+
+from .utils.memory import get_rss, parse_memory_size
+
+_JOB_DEFAULTS = dict(
+    args=[],
+    kwargs={},
+    inputs=None,
+    outputs=[],
+    retries=0,
+    memory_limit=None,
+    timeout=None,
+)
+# Fraction of a job's memory limit passed to entry points as their memory_budget
+_BUDGET_FRACTION = 0.8
+
+
+def load_jobs(fpath):
+    """
+    Read a job file (.json, or .yaml/.yml if PyYAML is installed) and return the list of
+    jobs with defaults filled in.
+    """
+    with open(fpath) as f:
+        if os.path.splitext(fpath)[1] in [".yaml", ".yml"]:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(
+                    f"load_jobs: PyYAML is needed to read {fpath}; use JSON instead"
+                )
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if isinstance(spec, list):
+        spec = dict(jobs=spec)
+
+    jobs = []
+    for idx, job_spec in enumerate(spec["jobs"]):
+        if "entry_point" not in job_spec:
+            raise ValueError(f"load_jobs: job {idx} in {fpath} has no entry_point")
+        job = dict(_JOB_DEFAULTS)
+        job.update(spec.get("defaults", {}))
+        job.update(job_spec)
+        job.setdefault("name", f"{idx}_{job['entry_point']}")
+        if job["inputs"] is None:
+            data_dir = job["kwargs"].get("data_dir")
+            job["inputs"] = [] if data_dir is None else [data_dir]
+        jobs.append(job)
+    names = [job["name"] for job in jobs]
+    duplicates = sorted(set(n for n in names if names.count(n) > 1))
+    if duplicates:
+        raise ValueError(f"load_jobs: duplicate job names in {fpath}: {duplicates}")
+    return jobs
+
+
+def resolve_entry_point(entry_point):
+    if "." not in entry_point:
+        import paraview_wrapper
+
+        return getattr(paraview_wrapper, entry_point)
+    module_name, func_name = entry_point.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def job_hash(job):
+    """
+    Hash of everything that determines a job's outputs.
+    """
+    key = {k: job[k] for k in ["entry_point", "args", "kwargs", "outputs"]}
+    return hashlib.sha1(
+        json.dumps(key, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _newest_mtime(path):
+    """
+    Most recent modification time of <path> or, for a directory, of anything directly
+    inside it.
+    """
+    mtime = os.path.getmtime(path)
+    if os.path.isdir(path):
+        with os.scandir(path) as entries:
+            for entry in entries:
+                mtime = max(mtime, entry.stat().st_mtime)
+    return mtime
+
+
+def _stamp_fpath(stamp_dir, job):
+    return os.path.join(stamp_dir, f"{job['name']}.json")
+
+
+def is_up_to_date(job, stamp_dir):
+    """
+    True if all of <job>'s outputs exist, are newer than its inputs and were written by
+    a job with the same spec.
+    """
+    if not job["outputs"]:
+        return False
+    try:
+        with open(_stamp_fpath(stamp_dir, job)) as f:
+            if json.load(f)["hash"] != job_hash(job):
+                return False
+        oldest_output = min(os.path.getmtime(p) for p in job["outputs"])
+        newest_input = max((_newest_mtime(p) for p in job["inputs"]), default=0.0)
+    except (OSError, KeyError, ValueError):
+        return False
+    return oldest_output >= newest_input
+
+
+def plan_jobs(jobs, stamp_dir, force=False):
+    """
+    Split <jobs> into those to run and those to skip (outputs already current).
+    """
+    to_run, to_skip = [], []
+    for job in jobs:
+        if not force and is_up_to_date(job, stamp_dir):
+            to_skip.append(job)
+        else:
+            to_run.append(job)
+    return to_run, to_skip
+
+
+def _worker(job, conn, log_fpath):
+    """
+    Run one job attempt (in a spawned process) and send its outcome down <conn>.
+    """
+    if log_fpath is not None:
+        # Redirect at the file descriptor level, to catch ParaView/VTK output too
+        log_fd = os.open(log_fpath, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        for stream in [sys.stdout, sys.stderr]:
+            stream.flush()
+            os.dup2(log_fd, stream.fileno())
+    try:
+        func = resolve_entry_point(job["entry_point"])
+        kwargs = dict(job["kwargs"])
+        if (
+            job["memory_limit"] is not None
+            and "memory_budget" in inspect.signature(func).parameters
+            and kwargs.get("memory_budget") is None
+        ):
+            kwargs["memory_budget"] = int(
+                _BUDGET_FRACTION * parse_memory_size(job["memory_limit"])
+            )
+        func(*job["args"], **kwargs)
+        conn.send(dict(status="ok", error=None))
+    except BaseException:
+        traceback.print_exc()
+        conn.send(dict(status="failed", error=traceback.format_exc()))
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        conn.close()
+
+
+class _Attempt:
+    def __init__(self, ctx, job, log_dir):
+        self.job = job
+        self.conn, child_conn = ctx.Pipe(duplex=False)
+        log_fpath = (
+            None if log_dir is None else os.path.join(log_dir, f"{job['name']}.log")
+        )
+        self.process = ctx.Process(
+            target=_worker, args=(job, child_conn, log_fpath), name=job["name"]
+        )
+        self.process.start()
+        child_conn.close()
+        self.start = time.perf_counter()
+        self.peak_rss = None
+        self.kill_reason = None
+        self.result = None
+
+    def receive(self):
+        """
+        Read the worker's result if it has been sent. Called as soon as the pipe is
+        readable, since a large result (e.g. a long traceback) can fill the pipe buffer
+        and block the worker until it's read.
+        """
+        if self.result is None and not self.conn.closed and self.conn.poll():
+            try:
+                self.result = self.conn.recv()
+            except EOFError:
+                self.conn.close()
+
+    def check_limits(self):
+        """
+        Kill the worker if it has exceeded its memory limit or timeout.
+        """
+        rss = get_rss(self.process.pid)
+        # (An exited but unreaped worker reports 0)
+        if rss:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+        limit = self.job["memory_limit"]
+        if limit is not None and rss and rss > parse_memory_size(limit):
+            self.kill_reason = f"RSS {rss / 2**30:.2f} GB exceeded memory limit {limit}"
+        elif (
+            self.job["timeout"] is not None
+            and time.perf_counter() - self.start > self.job["timeout"]
+        ):
+            self.kill_reason = f"timed out after {self.job['timeout']} s"
+        if self.kill_reason is not None:
+            self.process.kill()
+
+    def outcome(self):
+        """
+        Outcome of a finished attempt.
+        """
+        self.receive()
+        result = self.result
+        self.conn.close()
+        self.process.join()
+        if self.kill_reason is not None:
+            result = dict(status="failed", error=self.kill_reason)
+        elif result is None:
+            result = dict(
+                status="failed",
+                error=f"worker exited with code {self.process.exitcode}",
+            )
+        result.update(
+            wall_s=time.perf_counter() - self.start,
+            peak_rss_MB=None if self.peak_rss is None else self.peak_rss / 2**20,
+        )
+        return result
+
+
+def run_jobs(
+    jobs,
+    nworkers=1,
+    stamp_dir=".batch_stamps",
+    log_dir=None,
+    force=False,
+    poll_interval=0.5,
+):
+    """
+    Run <jobs> (see load_jobs) with up to <nworkers> concurrent worker processes,
+    retrying failures and skipping jobs whose outputs are current (unless <force>).
+    Returns a summary dict per job name, in job order.
+    """
+    os.makedirs(stamp_dir, exist_ok=True)
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+    to_run, to_skip = plan_jobs(jobs, stamp_dir, force=force)
+    summary = {
+        job["name"]: dict(status="pending", attempts=0, wall_s=0.0, peak_rss_MB=None)
+        for job in jobs
+    }
+    for job in to_skip:
+        summary[job["name"]]["status"] = "skipped"
+    print(
+        f"run_jobs: {len(to_run)} job(s) to run, {len(to_skip)} up to date, "
+        f"{nworkers} worker(s)"
+    )
+
+    ctx = multiprocessing.get_context("spawn")
+    pending = collections.deque(to_run)
+    running = []
+    while pending or running:
+        while pending and len(running) < nworkers:
+            job = pending.popleft()
+            summary[job["name"]]["attempts"] += 1
+            print(
+                f"[{job['name']}] starting (attempt {summary[job['name']]['attempts']})"
+            )
+            running.append(_Attempt(ctx, job, log_dir))
+
+        multiprocessing.connection.wait(
+            [a.process.sentinel for a in running]
+            + [a.conn for a in running if not a.conn.closed and a.result is None],
+            timeout=poll_interval,
+        )
+        still_running = []
+        for attempt in running:
+            attempt.receive()
+            if attempt.process.is_alive():
+                attempt.check_limits()
+                if attempt.kill_reason is None:
+                    still_running.append(attempt)
+                    continue
+            job = attempt.job
+            job_summary = summary[job["name"]]
+            result = attempt.outcome()
+            job_summary["wall_s"] += result["wall_s"]
+            if result["peak_rss_MB"] is not None:
+                job_summary["peak_rss_MB"] = max(
+                    job_summary["peak_rss_MB"] or 0.0, result["peak_rss_MB"]
+                )
+            job_summary["status"] = result["status"]
+            job_summary["error"] = result["error"]
+            if result["status"] == "ok":
+                with open(_stamp_fpath(stamp_dir, job), "w") as f:
+                    json.dump(dict(hash=job_hash(job), time=time.time()), f)
+                print(f"[{job['name']}] done in {result['wall_s']:.1f} s")
+                continue
+            error = _last_line(result["error"])
+            if job_summary["attempts"] <= job["retries"]:
+                print(f"[{job['name']}] failed ({error}); retrying")
+                pending.append(job)
+            else:
+                print(f"[{job['name']}] failed ({error})")
+        running = still_running
+    return summary
+
+
+def _last_line(error):
+    lines = [l for l in (error or "").strip().splitlines() if l.strip()]
+    return lines[-1] if lines else "unknown error"
+
+
+def print_summary(summary):
+    print(f"{'job':<40} {'status':<8} {'tries':>5} {'wall/s':>9} {'peak RSS/MB':>12}")
+    for name, s in summary.items():
+        rss = "-" if s["peak_rss_MB"] is None else f"{s['peak_rss_MB']:.0f}"
+        print(
+            f"{name:<40} {s['status']:<8} {s['attempts']:>5} "
+            f"{s['wall_s']:>9.1f} {rss:>12}"
+        )
+    failed = [name for name, s in summary.items() if s["status"] == "failed"]
+    counts = collections.Counter(s["status"] for s in summary.values())
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    for name in failed:
+        print(f"\n{name} failed:\n{summary[name].get('error')}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m paraview_wrapper.batch",
+        description="Run paraview_wrapper jobs from a JSON/YAML job file",
+    )
+    parser.add_argument("job_file")
+    parser.add_argument("-n", "--nworkers", type=int, default=1)
+    parser.add_argument(
+        "-f", "--force", action="store_true", help="Run jobs even if up to date"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Print the plan without running"
+    )
+    parser.add_argument(
+        "-l", "--log-dir", help="Write each job's output to <log-dir>/<name>.log"
+    )
+    parser.add_argument(
+        "--stamp-dir",
+        help="Where to record completed jobs (default: .batch_stamps by the job file)",
+    )
+    parser.add_argument("-s", "--summary", help="Write the summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.job_file)
+    stamp_dir = args.stamp_dir or os.path.join(
+        os.path.dirname(os.path.abspath(args.job_file)), ".batch_stamps"
+    )
+    if args.dry_run:
+        to_run, to_skip = plan_jobs(jobs, stamp_dir, force=args.force)
+        for job in jobs:
+            status = "skip" if job in to_skip else "run"
+            print(f"{status:<5}{job['name']} ({job['entry_point']})")
+        return 0
+
+    summary = run_jobs(
+        jobs,
+        nworkers=args.nworkers,
+        stamp_dir=stamp_dir,
+        log_dir=args.log_dir,
+        force=args.force,
+    )
+    failed = print_summary(summary)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,146 @@
-from .locations import get_output_dir, get_output_fpath
-from .misc import report_kwargs, set_default_kwargs
-from .nektar import get_nektar_params
-from .plotting import get_color_array
-from .pv import (
-    data_file_exists,
-    gen_cbar_props,
-    gen_default_opacity_pts,
-    gen_opacity_pts,
-    gen_registration_name,
-    get_ugrid_bounds,
-    get_ugrid_props,
-    get_vtu_data,
-    scale_data,
-)
-from .system import get_desktop_dir
-from .video import avi_to_gif, avi_to_mp4
+"""
+Names are loaded from their submodules on first access, so that using (e.g.)
+get_nektar_params or avi_to_mp4 doesn't import ParaView/VTK.
+"""
+
+import importlib
+
+from .system import find_paraview
+
+# Exported names, by submodule
+_EXPORTS = {
+    "autotune": ["autotune_volume_render"],
+    "deposit": ["DEPOSIT_ARRAY_NAME"],
+    "interp": [
+        "apply_interp_weights",
+        "clear_interp_weights_cache",
+        "compute_interp_weights",
+        "get_interp_weights",
+        "line_points",
+    ],
+    "locations": [
+        "get_cache_dir",
+        "get_cache_fpath",
+        "get_output_dir",
+        "get_output_fpath",
+    ],
+    "manifest": [
+        "find_time_index",
+        "get_time_manifest",
+        "read_time_manifest",
+        "write_time_manifest",
+    ],
+    "memory": [
+        "get_memory_report_fpath",
+        "get_rss",
+        "memory_monitored",
+        "release_caches",
+        "start_memory_monitor",
+        "stop_memory_monitor",
+    ],
+    "misc": [
+        "bisection_levels",
+        "get_chk_num",
+        "get_frame_window",
+        "report_kwargs",
+        "set_default_kwargs",
+    ],
+    "nektar": [
+        "NektarExpr",
+        "evaluate_nektar_function",
+        "get_chk_times",
+        "get_nektar_functions",
+        "get_nektar_params",
+    ],
+    "pipeline": [
+        "count_proxies",
+        "keep_proxy",
+        "pipeline_scope",
+        "release_proxy",
+        "scoped_pipeline",
+    ],
+    "plotting": ["get_color_array", "get_color_vals", "get_mpl_linestyle"],
+    "pv": [
+        "add_text_label",
+        "cached_plot_over_line",
+        "cached_resample_to_image",
+        "data_file_exists",
+        "decimate_surface",
+        "deposit_particles",
+        "difference_from_run",
+        "find_vtu_paths",
+        "gen_cbar_props",
+        "gen_default_opacity_pts",
+        "gen_opacity_pts",
+        "gen_registration_name",
+        "get_frustum_planes",
+        "get_manifest_vtu_data",
+        "get_ugrid_bounds",
+        "get_ugrid_props",
+        "get_vtu_data",
+        "interpolate_in_time",
+        "particle_trails",
+        "python_filter",
+        "python_source",
+        "reduce_particles",
+        "resample_to_image",
+        "resolve_auto_colour_map",
+        "save_animation_coarse_to_fine",
+        "scale_data",
+        "subsample_points",
+        "update_python_filter",
+    ],
+    "profiling": [
+        "frame_timer",
+        "get_trace",
+        "get_trace_fpath",
+        "profiled",
+        "set_progress_callback",
+        "stage",
+        "start_trace",
+        "stop_trace",
+        "traced",
+    ],
+    "pyexpr": ["PyExpr"],
+    "quality": ["get_quality_settings", "label_output_fname", "scale_resolution"],
+    "reductions": ["reduce_files", "write_time_series"],
+    "stats": ["auto_opacities", "auto_range", "get_percentile", "get_series_stats"],
+    "system": ["get_desktop_dir", "find_paraview"],
+    "trails": ["TRAIL_AGE_ARRAY_NAME"],
+    "video": ["avi_to_gif", "avi_to_mp4", "frames_to_movie"],
+    "vtu_io": ["read_point_arrays", "read_vtu"],
+}
+
+# Submodules that import paraview/vtkmodules (which ships with ParaView)
+_PARAVIEW_MODULES = {
+    "autotune",
+    "deposit",
+    "diff",
+    "interp",
+    "particles",
+    "pipeline",
+    "pv",
+    "reductions",
+    "stats",
+    "trails",
+    "vtu_io",
+}
+
+_EXPORT_MODULES = {name: mod for mod, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_EXPORT_MODULES)
+
+
+def __getattr__(name):
+    if name not in _EXPORT_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name = _EXPORT_MODULES[name]
+    if module_name in _PARAVIEW_MODULES:
+        find_paraview()
+    val = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,209 @@
+import json
+import os.path
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from paraview.simple import (
+    ColorBy,
+    GetAnimationScene,
+    GetTimeKeeper,
+    Hide,
+    SaveScreenshot,
+    Show,
+)
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkIOImage import vtkPNGReader
+
+from .pv import resample_to_image
+
+# Volume mappers available for unstructured grids
+UGRID_VOLUME_MAPPERS = [
+    "Projected tetra",
+    "Z sweep",
+    "Bunyk ray cast",
+    "Resample To Image",
+]
+
+
+def _read_png(fpath):
+    reader = vtkPNGReader()
+    reader.SetFileName(fpath)
+    reader.Update()
+    img = reader.GetOutput()
+    return vtk_to_numpy(img.GetPointData().GetScalars()).astype(np.float64) / 255.0
+
+
+def _candidate_lbl(candidate):
+    if candidate["resample_dims"] is None:
+        return candidate["render_mode"]
+    else:
+        dims_str = "x".join([str(d) for d in candidate["resample_dims"]])
+        return f"Resampled {dims_str}"
+
+
+def _apply_candidate(candidate, varname, view):
+    """
+    Show <candidate>'s display with its rendering settings. Unstructured-grid
+    candidates share one display, so its mapper has to be (re)selected each time.
+    """
+    display = candidate["display"]
+    Show(display.Input, view)
+    ColorBy(display, ("POINTS", varname))
+    display.SetRepresentationType("Volume")
+    if candidate["resample_dims"] is None:
+        display.SelectMapper = candidate["render_mode"]
+
+
+def _pick_frame_times(nframes_to_time, animation_settings):
+    times = GetTimeKeeper().TimestepValues
+    if not isinstance(times, (list, tuple)):
+        times = [times]
+    times = list(times)
+    fw = animation_settings.get("FrameWindow", [0, len(times) - 1])
+    times = times[fw[0] : fw[1] + 1]
+    if len(times) <= nframes_to_time:
+        return times
+    # First, last and evenly spaced frames in between
+    step = (len(times) - 1) / (nframes_to_time - 1)
+    return [times[int(round(ii * step))] for ii in range(nframes_to_time)]
+
+
+def autotune_volume_render(
+    varname,
+    vtu_data,
+    view,
+    current_display,
+    animation_settings,
+    autotune_settings={},
+    output_fpath=None,
+):
+    """
+    Time a few representative frames with each volume mapper (and a few explicit
+    resampling resolutions), then choose the fastest whose images differ from the
+    reference mapper's by less than the tolerance (mean absolute RGB difference, as a
+    fraction of the full range).
+    Returns the display to use for the render and a dict describing the choice, which is
+    also written to <output_fpath root>_autotune.json if <output_fpath> is set.
+    """
+    int_autotune_settings = dict(
+        mappers=UGRID_VOLUME_MAPPERS,
+        nframes=3,
+        reference="Projected tetra",
+        resample_dims=[[64, 64, 64], [128, 128, 128], [256, 256, 256]],
+        tolerance=0.02,
+    )
+    int_autotune_settings.update(autotune_settings)
+
+    candidates = [
+        dict(render_mode=mapper, resample_dims=None)
+        for mapper in int_autotune_settings["mappers"]
+    ]
+    candidates.extend(
+        [
+            dict(render_mode="Resample To Image", resample_dims=dims)
+            for dims in int_autotune_settings["resample_dims"]
+        ]
+    )
+    # Reference goes first so that all other candidates can be compared against it
+    candidates.sort(
+        key=lambda c: not (
+            c["resample_dims"] is None
+            and c["render_mode"] == int_autotune_settings["reference"]
+        )
+    )
+    if candidates[0]["render_mode"] != int_autotune_settings["reference"]:
+        raise ValueError(
+            f"autotune_volume_render: reference mapper {int_autotune_settings['reference']} isn't one of the candidates"
+        )
+
+    screenshot_settings = {}
+    if "ImageResolution" in animation_settings:
+        screenshot_settings["ImageResolution"] = animation_settings["ImageResolution"]
+    frame_times = _pick_frame_times(
+        int_autotune_settings["nframes"], animation_settings
+    )
+    anim_scene = GetAnimationScene()
+    initial_time = anim_scene.AnimationTime
+
+    Hide(current_display.Input, view)
+    ugrid_display = None
+    tmp_dir = tempfile.mkdtemp(prefix="pvw_autotune_")
+    ref_imgs = []
+    results = []
+    try:
+        for icand, candidate in enumerate(candidates):
+            # Show data with this candidate's rendering settings
+            if candidate["resample_dims"] is None:
+                if ugrid_display is None:
+                    ugrid_display = Show(
+                        vtu_data, view, "UnstructuredGridRepresentation"
+                    )
+                candidate["display"] = ugrid_display
+            else:
+                resampled_data = resample_to_image(vtu_data, candidate["resample_dims"])
+                candidate["display"] = Show(
+                    resampled_data, view, "UniformGridRepresentation"
+                )
+            _apply_candidate(candidate, varname, view)
+
+            # Time frames, after a warm-up render to exclude setup costs
+            img_fpath = os.path.join(tmp_dir, f"candidate{icand}.png")
+            anim_scene.AnimationTime = frame_times[0]
+            SaveScreenshot(img_fpath, view, **screenshot_settings)
+            wall_time = 0.0
+            max_diff = 0.0
+            for iframe, frame_time in enumerate(frame_times):
+                anim_scene.AnimationTime = frame_time
+                start = time.perf_counter()
+                SaveScreenshot(img_fpath, view, **screenshot_settings)
+                wall_time += time.perf_counter() - start
+                img = _read_png(img_fpath)
+                if icand == 0:
+                    ref_imgs.append(img)
+                elif img.shape == ref_imgs[iframe].shape:
+                    max_diff = max(max_diff, np.mean(np.abs(img - ref_imgs[iframe])))
+                else:
+                    max_diff = 1.0
+            Hide(candidate["display"].Input, view)
+
+            results.append(
+                dict(
+                    candidate=_candidate_lbl(candidate),
+                    render_mode=candidate["render_mode"],
+                    resample_dims=candidate["resample_dims"],
+                    time_per_frame=wall_time / len(frame_times),
+                    img_diff=max_diff,
+                )
+            )
+            print(
+                f"autotune: {results[-1]['candidate']:>24s}  {results[-1]['time_per_frame']:.3f} s/frame  diff={max_diff:.4f}"
+            )
+    finally:
+        shutil.rmtree(tmp_dir)
+        anim_scene.AnimationTime = initial_time
+
+    # Choose the fastest candidate that's within tolerance
+    acceptable = [
+        (result, candidate)
+        for result, candidate in zip(results, candidates)
+        if result["img_diff"] <= int_autotune_settings["tolerance"]
+    ]
+    choice, chosen_candidate = min(acceptable, key=lambda rc: rc[0]["time_per_frame"])
+    _apply_candidate(chosen_candidate, varname, view)
+    print(f"autotune: chose {choice['candidate']}")
+
+    summary = dict(
+        choice=choice,
+        candidates=results,
+        frame_times=frame_times,
+        image_resolution=screenshot_settings.get("ImageResolution"),
+        settings={k: v for k, v in int_autotune_settings.items()},
+    )
+    if output_fpath is not None:
+        summary_fpath = os.path.splitext(output_fpath)[0] + "_autotune.json"
+        with open(summary_fpath, "w") as summary_file:
+            json.dump(summary, summary_file, indent=2)
+        print(f"autotune: wrote summary to {summary_fpath}")
+    return chosen_candidate["display"], choice
@@ -0,0 +1,158 @@
+"""
+Deposition of (weighted) particles onto a regular grid, so that large particle sets can
+be rendered as an image/volume rather than as millions of points.
+Deposition is done for all steps up front, in parallel, and cached; a programmable
+source then serves the grid for the current animation time.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import os
+import os.path
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.vtkCommonDataModel import vtkDataObject
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+
+from .h5part import get_h5part_steps, read_h5part_positions, read_h5part_step
+from .locations import get_cache_fpath
+
+DEPOSIT_ARRAY_NAME = "particle_density"
+
+
+def deposit_grid_geometry(bounds, dims):
+    """
+    Origin and spacing of the image whose points are the centres of the deposition bins.
+    """
+    origin = []
+    spacing = []
+    for idim in range(3):
+        if dims[idim] > 1:
+            spacing.append((bounds[2 * idim + 1] - bounds[2 * idim]) / dims[idim])
+            origin.append(bounds[2 * idim] + 0.5 * spacing[idim])
+        else:
+            # Flat dimension (2D deposition)
+            spacing.append(1.0)
+            origin.append(bounds[2 * idim])
+    return origin, spacing
+
+
+def deposit_step(fpath, step, bounds, dims, weight_name="COMPUTATIONAL_WEIGHT"):
+    """
+    Weighted histogram of particle positions for one step, divided by the bin size to
+    give a density. Returned in VTK (x fastest) order, as a flat array.
+    """
+    ndims = 3 if dims[2] > 1 else 2
+    positions = read_h5part_positions(fpath, step, ndims=ndims)
+    weights = read_h5part_step(fpath, step, [weight_name])[weight_name]
+    hist, _ = np.histogramdd(
+        positions,
+        bins=dims[:ndims],
+        range=[(bounds[2 * idim], bounds[2 * idim + 1]) for idim in range(ndims)],
+        weights=weights,
+    )
+    _, spacing = deposit_grid_geometry(bounds, dims)
+    bin_size = np.prod(spacing[:ndims])
+    return np.ravel(hist / bin_size, order="F")
+
+
+def deposit_all_steps(
+    fpath, bounds, dims, nprocs=None, weight_name="COMPUTATIONAL_WEIGHT"
+):
+    """
+    Deposit every step in <fpath> (in parallel across steps) and cache the result.
+    Steps are written to a memory-mapped file as they finish, so that the whole series
+    never needs to fit in memory. Returns the path of the cached (nsteps, npts) .npy
+    array.
+    """
+    stat = os.stat(fpath)
+    key = ":".join(
+        [
+            os.path.abspath(fpath),
+            str(stat.st_mtime),
+            str(stat.st_size),
+            str(list(bounds)),
+            str(list(dims)),
+            weight_name,
+        ]
+    )
+    cache_fpath = get_cache_fpath(
+        f"deposit_{hashlib.sha1(key.encode()).hexdigest()}.npy"
+    )
+    if os.path.isfile(cache_fpath):
+        return cache_fpath
+
+    steps = get_h5part_steps(fpath)
+    print(f"Depositing particles for {len(steps)} steps...")
+    nprocs = os.cpu_count() if nprocs is None else nprocs
+    # Written under a temporary name, so that an interrupted run doesn't leave a
+    # partial cache behind
+    tmp_fpath = f"{cache_fpath}.{os.getpid()}.tmp.npy"
+    deposited = np.lib.format.open_memmap(
+        tmp_fpath, mode="w+", dtype=np.float64, shape=(len(steps), int(np.prod(dims)))
+    )
+    try:
+        with ProcessPoolExecutor(max_workers=max(nprocs, 1)) as executor:
+            futures = {
+                executor.submit(
+                    deposit_step, fpath, step, bounds, dims, weight_name
+                ): istep
+                for istep, step in enumerate(steps)
+            }
+            for future in as_completed(futures):
+                deposited[futures[future]] = future.result()
+        deposited.flush()
+        del deposited
+        os.replace(tmp_fpath, cache_fpath)
+    finally:
+        if os.path.isfile(tmp_fpath):
+            os.remove(tmp_fpath)
+    return cache_fpath
+
+
+def deposit_info(algorithm, cache_fpath, bounds, dims):
+    """
+    RequestInformation step for a programmable source serving deposited particle data.
+    Time values are step indices (as H5PartReader).
+    """
+    nsteps = np.load(cache_fpath, mmap_mode="r").shape[0]
+    origin, spacing = deposit_grid_geometry(bounds, dims)
+    out_info = algorithm.GetExecutive().GetOutputInformation(0)
+    out_info.Set(
+        vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT(),
+        0,
+        dims[0] - 1,
+        0,
+        dims[1] - 1,
+        0,
+        dims[2] - 1,
+    )
+    out_info.Set(vtkDataObject.ORIGIN(), *origin)
+    out_info.Set(vtkDataObject.SPACING(), *spacing)
+    times = [float(t) for t in range(nsteps)]
+    out_info.Set(vtkStreamingDemandDrivenPipeline.TIME_STEPS(), times, len(times))
+    out_info.Set(
+        vtkStreamingDemandDrivenPipeline.TIME_RANGE(), [times[0], times[-1]], 2
+    )
+
+
+def deposit_data(algorithm, cache_fpath, bounds, dims):
+    """
+    RequestData step for a programmable source serving deposited particle data.
+    """
+    deposited = np.load(cache_fpath, mmap_mode="r")
+    out_info = algorithm.GetOutputInformation(0)
+    time_key = vtkStreamingDemandDrivenPipeline.UPDATE_TIME_STEP()
+    istep = int(round(out_info.Get(time_key))) if out_info.Has(time_key) else 0
+    istep = min(max(istep, 0), deposited.shape[0] - 1)
+
+    img = algorithm.GetOutputDataObject(0)
+    origin, spacing = deposit_grid_geometry(bounds, dims)
+    img.SetDimensions(*dims)
+    img.SetOrigin(*origin)
+    img.SetSpacing(*spacing)
+    vtk_arr = numpy_to_vtk(np.array(deposited[istep]), deep=1)
+    vtk_arr.SetName(DEPOSIT_ARRAY_NAME)
+    img.GetPointData().AddArray(vtk_arr)
+    img.GetPointData().SetActiveScalars(DEPOSIT_ARRAY_NAME)
@@ -0,0 +1,77 @@
+"""
+Streaming difference between two runs on the same mesh. Only the current timestep of
+each run is held in memory.
+"""
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+
+from .vtu_io import read_point_arrays
+
+DIFF_MODES = ["abs", "rel"]
+DIFF_PAIRINGS = ["index", "time"]
+
+
+def pair_fpaths(a_fpaths, b_fpaths, pairing="index", a_times=None, b_times=None):
+    """
+    For each file in <a_fpaths>, choose the file in <b_fpaths> to subtract: the one with
+    the same index, or the one closest in time.
+    """
+    if pairing == "index":
+        if len(b_fpaths) < len(a_fpaths):
+            print(
+                f"pair_fpaths: WARNING - second run has fewer files ({len(b_fpaths)} vs {len(a_fpaths)}); repeating its last file"
+            )
+        return [b_fpaths[min(ii, len(b_fpaths) - 1)] for ii in range(len(a_fpaths))]
+    elif pairing == "time":
+        b_times = np.asarray(b_times)
+        return [b_fpaths[int(np.argmin(np.abs(b_times - t)))] for t in a_times]
+    else:
+        raise ValueError(
+            f"pair_fpaths: pairing must be one of {DIFF_PAIRINGS} (got {pairing})"
+        )
+
+
+def compute_difference(a_vals, b_vals, mode="abs"):
+    if mode == "abs":
+        return a_vals - b_vals
+    elif mode == "rel":
+        b_abs = np.abs(b_vals)
+        return np.divide(
+            a_vals - b_vals,
+            b_abs,
+            out=np.zeros_like(a_vals, dtype=float),
+            where=b_abs > 0,
+        )
+    else:
+        raise ValueError(f"compute_difference: mode must be one of {DIFF_MODES}")
+
+
+def difference_data(algorithm, varname, b_fpaths, mode="abs"):
+    """
+    RequestData step for a programmable filter that replaces <varname> in its input
+    (the current timestep of run A) with the difference from the paired file of run B.
+    """
+    inp = algorithm.GetInputDataObject(0, 0)
+    out = algorithm.GetOutputDataObject(0)
+    out.ShallowCopy(inp)
+
+    # Reader time is the file index
+    out_info = algorithm.GetOutputInformation(0)
+    time_key = vtkStreamingDemandDrivenPipeline.UPDATE_TIME_STEP()
+    idx = int(round(out_info.Get(time_key))) if out_info.Has(time_key) else 0
+    idx = min(max(idx, 0), len(b_fpaths) - 1)
+
+    a_vals = vtk_to_numpy(inp.GetPointData().GetArray(varname))
+    b_vals = read_point_arrays(b_fpaths[idx], [varname])[varname]
+    if b_vals.shape != a_vals.shape:
+        raise RuntimeError(
+            f"difference_data: {varname} has shape {b_vals.shape} in {b_fpaths[idx]}, expected {a_vals.shape}; runs must share a mesh"
+        )
+    diff_arr = numpy_to_vtk(
+        np.ascontiguousarray(compute_difference(a_vals, b_vals, mode)), deep=1
+    )
+    diff_arr.SetName(varname)
+    out.GetPointData().RemoveArray(varname)
+    out.GetPointData().AddArray(diff_arr)
@@ -0,0 +1,50 @@
+"""
+Direct reading of H5Part particle files (groups named Step#<n>, one dataset per
+particle property), for processing that doesn't go through H5PartReader.
+Requires h5py.
+"""
+
+import re
+
+
+def _open(fpath):
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("h5py is required to read H5Part files directly")
+    return h5py.File(fpath, "r")
+
+
+def get_h5part_steps(fpath):
+    """
+    Sorted step numbers in an H5Part file.
+    """
+    pattern = re.compile(r"^Step#([0-9]+)$")
+    with _open(fpath) as f:
+        steps = [
+            int(pattern.match(k).groups()[0]) for k in f.keys() if pattern.match(k)
+        ]
+    return sorted(steps)
+
+
+def read_h5part_step(fpath, step, names):
+    """
+    Read datasets <names> for step <step>; returns a dict of arrays.
+    """
+    with _open(fpath) as f:
+        group = f[f"Step#{step}"]
+        return {name: group[name][()] for name in names}
+
+
+def read_h5part_positions(fpath, step, ndims=None):
+    """
+    Particle positions for step <step> as an (npart, ndims) array. If <ndims> isn't
+    specified, use whichever of x, y, z are present.
+    """
+    import numpy as np
+
+    if ndims is None:
+        with _open(fpath) as f:
+            ndims = 3 if "z" in f[f"Step#{step}"] else 2
+    data = read_h5part_step(fpath, step, ["x", "y", "z"][:ndims])
+    return np.column_stack([data[name] for name in ["x", "y", "z"][:ndims]])
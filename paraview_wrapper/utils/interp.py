@@ -0,0 +1,375 @@
+"""
+Interpolation of point data from a static unstructured mesh onto arbitrary points.
+The expensive part (locating cells and computing interpolation weights) is done once
+per mesh and set of target points, in a single probe pass; each timestep is then a
+vectorized gather.
+"""
+
+import hashlib
+import os.path
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.vtkCommonCore import reference
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkDataObject,
+    vtkGenericCell,
+    vtkPolyData,
+    vtkPolyLine,
+    vtkStaticCellLocator,
+)
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+from vtkmodules.vtkFiltersCore import vtkProbeFilter
+
+from .locations import get_cache_fpath
+
+# In-memory weights, keyed on mesh digest and target point description
+_weights_cache = {}
+# Mesh digests, keyed on the identity and modification times of the points and cells
+_mesh_digests = {}
+
+# Arrays added to the copy of the mesh probed by compute_interp_weights
+_CELL_ID_NAME = "_interp_cell_id"
+_BASIS_NAME = "_interp_basis"
+
+
+def get_mesh_digest(ugrid):
+    """
+    Hash of a mesh's point coordinates and cell connectivity, identifying it between
+    calls (and processes). Only computed once per points/cells pair, unless they are
+    modified.
+    """
+    points = ugrid.GetPoints().GetData()
+    cells = ugrid.GetCells()
+    memo_key = (
+        points.GetAddressAsString("vtkObject"),
+        points.GetMTime(),
+        cells.GetAddressAsString("vtkObject"),
+        cells.GetMTime(),
+    )
+    if memo_key not in _mesh_digests:
+        hasher = hashlib.sha1()
+        for arr in [points, cells.GetOffsetsArray(), cells.GetConnectivityArray()]:
+            hasher.update(vtk_to_numpy(arr).tobytes())
+        _mesh_digests[memo_key] = hasher.hexdigest()
+    return _mesh_digests[memo_key]
+
+
+def _find_cells(ugrid, pts, tol2):
+    """
+    Cell ids and weights for <pts>, one FindCell call at a time. Used for points that
+    compute_interp_weights can't resolve in bulk.
+    """
+    locator = vtkStaticCellLocator()
+    locator.SetDataSet(ugrid)
+    locator.BuildLocator()
+    max_cell_size = ugrid.GetMaxCellSize()
+    cell_ids = np.full(len(pts), -1, dtype=np.int64)
+    weights = np.zeros((len(pts), max_cell_size))
+    gen_cell = vtkGenericCell()
+    sub_id = reference(0)
+    pcoords = [0.0, 0.0, 0.0]
+    cell_weights = [0.0] * max_cell_size
+    for ipt, pt in enumerate(pts):
+        cell_id = locator.FindCell(
+            [float(c) for c in pt], tol2, gen_cell, sub_id, pcoords, cell_weights
+        )
+        if cell_id >= 0:
+            cell_ids[ipt] = cell_id
+            weights[ipt, :] = cell_weights
+    return cell_ids, weights
+
+
+def _probe_cells(ugrid, pts, tol2):
+    """
+    Probe <ugrid> at all of <pts> in one vtkProbeFilter pass over a copy of the mesh
+    carrying its cell ids (cell data is probed as the value of the containing cell) and
+    <max_cell_size> arrays of random point values (probed as the weighted sum over the
+    containing cell's points, so that the weights can be solved for afterwards).
+    Returns cell ids (-1 outside the mesh) and the probed random values.
+    """
+    max_cell_size = ugrid.GetMaxCellSize()
+    source = ugrid.NewInstance()
+    source.CopyStructure(ugrid)
+    cell_id_arr = numpy_to_vtk(
+        np.arange(ugrid.GetNumberOfCells(), dtype=np.int64), deep=1
+    )
+    cell_id_arr.SetName(_CELL_ID_NAME)
+    source.GetCellData().AddArray(cell_id_arr)
+    basis = np.random.default_rng(0).standard_normal(
+        (ugrid.GetNumberOfPoints(), max_cell_size)
+    )
+    basis_arr = numpy_to_vtk(basis, deep=1)
+    basis_arr.SetName(_BASIS_NAME)
+    source.GetPointData().AddArray(basis_arr)
+
+    targets = vtkPolyData()
+    vtk_pts = vtkPoints()
+    vtk_pts.SetData(numpy_to_vtk(np.ascontiguousarray(pts, dtype=float), deep=1))
+    targets.SetPoints(vtk_pts)
+
+    probe = vtkProbeFilter()
+    probe.SetInputData(targets)
+    probe.SetSourceData(source)
+    probe.SetComputeTolerance(False)
+    probe.SetTolerance(np.sqrt(tol2))
+    probe.Update()
+    out_point_data = probe.GetOutput().GetPointData()
+    found = vtk_to_numpy(
+        out_point_data.GetArray(probe.GetValidPointMaskArrayName())
+    ).astype(bool)
+    cell_ids = np.where(
+        found, vtk_to_numpy(out_point_data.GetArray(_CELL_ID_NAME)), -1
+    ).astype(np.int64)
+    probed = vtk_to_numpy(out_point_data.GetArray(_BASIS_NAME)).reshape(
+        len(pts), max_cell_size
+    )
+    return cell_ids, basis, probed
+
+
+def _gather_pt_ids(ugrid, cell_ids):
+    """
+    Point ids of the cells <cell_ids> (-1 for none) from the connectivity arrays, as an
+    (N, max_cell_size) array, and a mask of the slots that are used.
+    """
+    max_cell_size = ugrid.GetMaxCellSize()
+    valid = cell_ids >= 0
+    cells = ugrid.GetCells()
+    connectivity = vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64)
+    offsets = vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64)
+    cell_sizes = np.zeros(len(cell_ids), dtype=np.int64)
+    cell_sizes[valid] = offsets[cell_ids[valid] + 1] - offsets[cell_ids[valid]]
+    pt_ids = np.zeros((len(cell_ids), max_cell_size), dtype=np.int64)
+    for k in range(max_cell_size):
+        has_k = k < cell_sizes
+        pt_ids[has_k, k] = connectivity[offsets[cell_ids[has_k]] + k]
+    in_cell = np.arange(max_cell_size)[None, :] < cell_sizes[:, None]
+    return pt_ids, in_cell
+
+
+def _solve_weights(basis, probed, pt_ids, in_cell):
+    """
+    Each probed random array is sum_k weights[k] * basis[pt_ids[k]], so the weights
+    solve a (cell size)^2 system per point. Unused slots get identity columns, leaving
+    the leading block to determine the real weights.
+    """
+    max_cell_size = pt_ids.shape[1]
+    mat = np.where(in_cell[:, None, :], np.swapaxes(basis[pt_ids], 1, 2), 0.0)
+    diag = np.arange(max_cell_size)
+    mat[:, diag, diag] += ~in_cell
+    with np.errstate(all="ignore"):
+        try:
+            weights = np.linalg.solve(mat, probed[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            # (A singular system; these points are redone individually)
+            weights = np.full(pt_ids.shape, np.nan)
+    weights[~in_cell] = 0.0
+    return weights
+
+
+def compute_interp_weights(ugrid, pts, tol2=1e-12, chunk_size=2**16):
+    """
+    Locate the cell containing each of <pts> (an (N,3) array) in <ugrid> and compute the
+    corresponding interpolation weights.
+    Returns (pt_ids, weights, valid), where pt_ids and weights have shape
+    (N, max_cell_size) and valid is a boolean mask of points found inside the mesh.
+    """
+    pts = np.asarray(pts, dtype=float)
+    npts = len(pts)
+    max_cell_size = ugrid.GetMaxCellSize()
+    cell_ids, basis, probed = _probe_cells(ugrid, pts, tol2)
+    valid = cell_ids >= 0
+    pt_ids, in_cell = _gather_pt_ids(ugrid, cell_ids)
+
+    # Solve for the weights in chunks, to bound the size of the per-point systems
+    weights = np.zeros((npts, max_cell_size))
+    valid_idxs = np.flatnonzero(valid)
+    for start in range(0, len(valid_idxs), chunk_size):
+        idxs = valid_idxs[start : start + chunk_size]
+        weights[idxs] = _solve_weights(basis, probed[idxs], pt_ids[idxs], in_cell[idxs])
+
+    # Weights sum to one; redo any points where the solve was ill-conditioned
+    redo = valid & ~(np.abs(weights.sum(axis=1) - 1.0) < 1e-8)
+    if np.any(redo):
+        cell_ids[redo], weights[redo] = _find_cells(ugrid, pts[redo], tol2)
+        pt_ids[redo], in_cell[redo] = _gather_pt_ids(ugrid, cell_ids[redo])
+        valid = cell_ids >= 0
+        weights[~valid, :] = 0.0
+        weights[~in_cell] = 0.0
+    return pt_ids, weights, valid
+
+
+def get_interp_weights(ugrid, pts, key):
+    """
+    Return interpolation weights for <pts> in <ugrid>, using the in-memory or on-disk
+    cache if weights were already computed for this mesh and <key>.
+    <key> must uniquely describe the target points (e.g. bounds and dimensions of an
+    image grid, or the end points and resolution of a line).
+    """
+    full_key = (get_mesh_digest(ugrid), key)
+    if full_key in _weights_cache:
+        return _weights_cache[full_key]
+
+    # On-disk cache, under the same key
+    hasher = hashlib.sha1(repr(full_key).encode())
+    cache_fpath = get_cache_fpath(f"interp_weights_{hasher.hexdigest()}.npz")
+    if os.path.isfile(cache_fpath):
+        with np.load(cache_fpath) as cached:
+            weights = (cached["pt_ids"], cached["weights"], cached["valid"])
+    else:
+        print(f"Computing interpolation weights for {len(pts)} points...")
+        weights = compute_interp_weights(ugrid, pts)
+        np.savez(cache_fpath, pt_ids=weights[0], weights=weights[1], valid=weights[2])
+    _weights_cache[full_key] = weights
+    return weights
+
+
+def clear_interp_weights_cache():
+    _weights_cache.clear()
+    _mesh_digests.clear()
+
+
+def apply_interp_weights(arr, pt_ids, weights, valid, fill_value=0.0):
+    """
+    Interpolate a point data array (shape (npts,) or (npts, ncomps)) using weights from
+    compute_interp_weights.
+    """
+    result = np.einsum("nk,nk...->n...", weights, arr[pt_ids])
+    result[~valid] = fill_value
+    return result
+
+
+def image_grid_points(bounds, dims):
+    """
+    Coordinates of the points of an image grid spanning <bounds> with <dims> points in
+    each direction, in VTK (x fastest) order.
+    """
+    axes = [
+        np.linspace(bounds[2 * idim], bounds[2 * idim + 1], dims[idim])
+        for idim in range(3)
+    ]
+    zz, yy, xx = np.meshgrid(axes[2], axes[1], axes[0], indexing="ij")
+    return np.column_stack([xx.ravel(), yy.ravel(), zz.ravel()])
+
+
+def image_grid_geometry(bounds, dims):
+    """
+    Return origin and spacing of an image grid spanning <bounds> with <dims> points.
+    """
+    origin = [bounds[2 * idim] for idim in range(3)]
+    spacing = [
+        (bounds[2 * idim + 1] - bounds[2 * idim]) / max(dims[idim] - 1, 1)
+        for idim in range(3)
+    ]
+    return origin, spacing
+
+
+def resample_info(algorithm, bounds, dims, **kwargs):
+    """
+    RequestInformation step for a programmable filter that resamples onto an image grid.
+    """
+    origin, spacing = image_grid_geometry(bounds, dims)
+    out_info = algorithm.GetExecutive().GetOutputInformation(0)
+    out_info.Set(
+        vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT(),
+        0,
+        dims[0] - 1,
+        0,
+        dims[1] - 1,
+        0,
+        dims[2] - 1,
+    )
+    out_info.Set(vtkDataObject.ORIGIN(), *origin)
+    out_info.Set(vtkDataObject.SPACING(), *spacing)
+
+
+def resample_data(algorithm, bounds, dims, arrays, fill_value=0.0):
+    """
+    RequestData step for a programmable filter that resamples point arrays from its
+    (static mesh) input onto an image grid, using cached interpolation weights.
+    """
+    ugrid = algorithm.GetInputDataObject(0, 0)
+    img = algorithm.GetOutputDataObject(0)
+    key = ("image", tuple(bounds), tuple(dims))
+    pt_ids, weights, valid = get_interp_weights(
+        ugrid, image_grid_points(bounds, dims), key
+    )
+
+    origin, spacing = image_grid_geometry(bounds, dims)
+    img.SetDimensions(*dims)
+    img.SetOrigin(*origin)
+    img.SetSpacing(*spacing)
+    for name in arrays:
+        vals = apply_interp_weights(
+            vtk_to_numpy(ugrid.GetPointData().GetArray(name)),
+            pt_ids,
+            weights,
+            valid,
+            fill_value=fill_value,
+        )
+        vtk_arr = numpy_to_vtk(np.ascontiguousarray(vals), deep=1)
+        vtk_arr.SetName(name)
+        img.GetPointData().AddArray(vtk_arr)
+    mask = numpy_to_vtk(valid.astype(np.uint8), deep=1)
+    mask.SetName("vtkValidPointMask")
+    img.GetPointData().AddArray(mask)
+
+
+def line_points(pt1, pt2, resolution):
+    """
+    <resolution>+1 evenly spaced points from <pt1> to <pt2> (as PlotOverLine).
+    """
+    fracs = np.linspace(0.0, 1.0, resolution + 1)[:, None]
+    return (1.0 - fracs) * np.asarray(pt1, dtype=float) + fracs * np.asarray(
+        pt2, dtype=float
+    )
+
+
+def sample_line_data(algorithm, pt1, pt2, resolution, arrays=None, fill_value=0.0):
+    """
+    RequestData step for a programmable filter that samples point arrays from its
+    (static mesh) input along a line, using cached interpolation weights. Output matches
+    PlotOverLine's: a polyline with the sampled arrays, arc_length and vtkValidPointMask.
+    """
+    ugrid = algorithm.GetInputDataObject(0, 0)
+    line = algorithm.GetOutputDataObject(0)
+    pts = line_points(pt1, pt2, resolution)
+    key = ("line", tuple(pt1), tuple(pt2), resolution)
+    pt_ids, weights, valid = get_interp_weights(ugrid, pts, key)
+
+    vtk_pts = vtkPoints()
+    vtk_pts.SetData(numpy_to_vtk(pts, deep=1))
+    line.SetPoints(vtk_pts)
+    polyline = vtkPolyLine()
+    polyline.GetPointIds().SetNumberOfIds(len(pts))
+    for ipt in range(len(pts)):
+        polyline.GetPointIds().SetId(ipt, ipt)
+    cells = vtkCellArray()
+    cells.InsertNextCell(polyline)
+    line.SetLines(cells)
+
+    point_data = ugrid.GetPointData()
+    if arrays is None:
+        arrays = [
+            point_data.GetArrayName(iarr)
+            for iarr in range(point_data.GetNumberOfArrays())
+        ]
+    for name in arrays:
+        vals = apply_interp_weights(
+            vtk_to_numpy(point_data.GetArray(name)),
+            pt_ids,
+            weights,
+            valid,
+            fill_value=fill_value,
+        )
+        vtk_arr = numpy_to_vtk(np.ascontiguousarray(vals), deep=1)
+        vtk_arr.SetName(name)
+        line.GetPointData().AddArray(vtk_arr)
+    arc_length = numpy_to_vtk(np.linalg.norm(pts - pts[0], axis=1), deep=1)
+    arc_length.SetName("arc_length")
+    line.GetPointData().AddArray(arc_length)
+    mask = numpy_to_vtk(valid.astype(np.int8), deep=1)
+    mask.SetName("vtkValidPointMask")
+    line.GetPointData().AddArray(mask)
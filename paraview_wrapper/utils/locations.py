@@ -1,3 +1,4 @@
+import os
 import os.path
 
 LOCATIONS = {}
@@ -5,6 +6,11 @@ LOCATIONS["repo_root"] = os.path.abspath(os.path.dirname(__file__) + "/..")
 LOCATIONS["output_dir"] = os.path.normpath(
     os.path.join(LOCATIONS["repo_root"], "output")
 )
+# Per-user, since the package dir may be read-only (e.g. in site-packages)
+LOCATIONS["cache_dir"] = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "paraview_wrapper",
+)
 
 
 def get_output_dir():
@@ -13,3 +19,12 @@ def get_output_dir():
 
 def get_output_fpath(fname):
     return os.path.join(get_output_dir(), fname)
+
+
+def get_cache_dir():
+    os.makedirs(LOCATIONS["cache_dir"], exist_ok=True)
+    return LOCATIONS["cache_dir"]
+
+
+def get_cache_fpath(fname):
+    return os.path.join(get_cache_dir(), fname)
@@ -0,0 +1,244 @@
+"""
+Time manifests for (p)vtu checkpoint series: a .series (JSON) or .pvd file, readable by
+ParaView, listing each checkpoint's path, physical time and size in bytes.
+Manifests are written next to the data and rewritten whenever the series changes, so
+that subsequent runs don't need to glob the data directory or re-derive times.
+"""
+
+from bisect import bisect_left
+from glob import glob
+import json
+import os
+import os.path
+import re
+import xml.etree.ElementTree as ET
+
+from .misc import get_chk_num
+from .nektar import get_chk_times
+
+MANIFEST_FORMATS = ["series", "pvd"]
+
+_CHK_PATTERN = re.compile(r"(.*)_([0-9]+)\.(p?vtu)$")
+
+
+def _find_series_fpaths(data_dir, basename):
+    """
+    (p)vtu paths for <basename> in <data_dir>, sorted by checkpoint number; pvtus are
+    preferred if both are present.
+    """
+    for ext in ["pvtu", "vtu"]:
+        fpaths = [
+            p
+            for p in glob(os.path.join(data_dir, f"{basename}*.{ext}"))
+            if _CHK_PATTERN.match(os.path.basename(p))
+        ]
+        if fpaths:
+            return sorted(fpaths, key=get_chk_num), ext == "pvtu"
+    return [], False
+
+
+def get_manifest_fpath(data_dir, basename, partitioned, fmt="series"):
+    if fmt == "series":
+        ext = "pvtu" if partitioned else "vtu"
+        return os.path.join(data_dir, f"{basename}.{ext}.series")
+    elif fmt == "pvd":
+        return os.path.join(data_dir, f"{basename}.pvd")
+    raise ValueError(
+        f"get_manifest_fpath: unknown format {fmt}; choose from {MANIFEST_FORMATS}"
+    )
+
+
+def get_file_size(fpath):
+    """
+    Size of a (p)vtu in bytes, including all of its pieces for a pvtu.
+    """
+    size = os.path.getsize(fpath)
+    if fpath.endswith(".pvtu"):
+        fdir = os.path.dirname(fpath)
+        for piece in ET.parse(fpath).getroot().iter("Piece"):
+            piece_fpath = os.path.join(fdir, piece.get("Source", ""))
+            if os.path.isfile(piece_fpath):
+                size += os.path.getsize(piece_fpath)
+    return size
+
+
+def _read_chk_time(chk_path):
+    """
+    Time recorded in a Nektar checkpoint's metadata (XML .chk file or the Info.xml of a
+    .chk directory), or None if it can't be read.
+    """
+    if os.path.isdir(chk_path):
+        chk_path = os.path.join(chk_path, "Info.xml")
+    try:
+        time_node = ET.parse(chk_path).getroot().find("Metadata/Time")
+    except (OSError, ET.ParseError):
+        return None
+    if time_node is None or time_node.text is None:
+        return None
+    try:
+        return float(time_node.text)
+    except ValueError:
+        return None
+
+
+def get_series_times(data_dir, fpaths, dt=None):
+    """
+    Physical time of each (p)vtu in <fpaths>. Times are read from the corresponding
+    Nektar checkpoints if they are all available (so variable output cadence is
+    handled), otherwise they are derived from <dt> or the session (see get_chk_times).
+    """
+    if dt is None:
+        times = [
+            _read_chk_time(os.path.splitext(fpath)[0] + ".chk") for fpath in fpaths
+        ]
+        if fpaths and None not in times:
+            return times
+    return get_chk_times(data_dir, fpaths, dt=dt)
+
+
+def write_time_manifest(fpath, entries, fmt="series"):
+    """
+    Write <entries> (dicts with name, time and size) to <fpath>; names are stored
+    relative to the manifest. The manifest is written to a temporary file and moved into
+    place, so concurrent readers never see a partial one.
+    """
+    fdir = os.path.dirname(fpath)
+    rel_entries = [
+        dict(e, name=os.path.relpath(e["name"], fdir).replace(os.sep, "/"))
+        for e in entries
+    ]
+    if fmt not in MANIFEST_FORMATS:
+        raise ValueError(
+            f"write_time_manifest: unknown format {fmt}; choose from {MANIFEST_FORMATS}"
+        )
+    tmp_fpath = f"{fpath}.{os.getpid()}.tmp"
+    try:
+        if fmt == "series":
+            with open(tmp_fpath, "w") as f:
+                json.dump(
+                    {"file-series-version": "1.0", "files": rel_entries}, f, indent=1
+                )
+        else:
+            root = ET.Element("VTKFile", type="Collection", version="0.1")
+            collection = ET.SubElement(root, "Collection")
+            for e in rel_entries:
+                ET.SubElement(
+                    collection,
+                    "DataSet",
+                    timestep=repr(e["time"]),
+                    part="0",
+                    file=e["name"],
+                    size=str(e["size"]),
+                )
+            ET.ElementTree(root).write(tmp_fpath, xml_declaration=True)
+        os.replace(tmp_fpath, fpath)
+    except BaseException:
+        if os.path.exists(tmp_fpath):
+            os.remove(tmp_fpath)
+        raise
+    # The rename updates the directory's mtime; keep the manifest newer so that it isn't
+    # seen as stale (see _is_stale)
+    os.utime(fpath)
+
+
+def read_time_manifest(fpath):
+    """
+    Entries (dicts with absolute name, time and size) from a .series or .pvd manifest.
+    """
+    fdir = os.path.dirname(fpath)
+    if fpath.endswith(".pvd"):
+        entries = [
+            dict(
+                name=ds.get("file"),
+                time=float(ds.get("timestep")),
+                size=int(ds.get("size", -1)),
+            )
+            for ds in ET.parse(fpath).getroot().iter("DataSet")
+        ]
+    else:
+        with open(fpath) as f:
+            entries = json.load(f)["files"]
+    return [
+        dict(e, name=os.path.normpath(os.path.join(fdir, e["name"]))) for e in entries
+    ]
+
+
+def _read_existing_manifest(fpath):
+    """
+    Entries from the manifest at <fpath>, or None if it can't be read (e.g. it was
+    truncated or hand-edited), in which case it's regenerated.
+    """
+    try:
+        return read_time_manifest(fpath)
+    except (OSError, ValueError, KeyError, TypeError, ET.ParseError) as e:
+        print(f"get_time_manifest: Couldn't read {fpath} ({e}); regenerating it")
+        return None
+
+
+def _is_stale(manifest_fpath, data_dir, entries):
+    manifest_mtime = os.path.getmtime(manifest_fpath)
+    # Adding or removing files changes the directory's mtime
+    if os.path.getmtime(data_dir) > manifest_mtime:
+        return True
+    for e in entries:
+        try:
+            if os.path.getmtime(e["name"]) > manifest_mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def get_time_manifest(data_dir, basename="", dt=None, fmt="series"):
+    """
+    Entries (dicts with name, time and size, ordered by checkpoint) for the (p)vtu
+    series <basename> in <data_dir>, read from its manifest if that's up to date and
+    (re)generated otherwise. If <basename> isn't given, it's taken from the first file.
+    Returns the entries and the manifest path (None if it couldn't be written).
+    """
+    if basename:
+        for partitioned in [True, False]:
+            fpath = get_manifest_fpath(data_dir, basename, partitioned, fmt)
+            if os.path.isfile(fpath) and dt is None:
+                entries = _read_existing_manifest(fpath)
+                if entries is not None and not _is_stale(fpath, data_dir, entries):
+                    return entries, fpath
+
+    fpaths, partitioned = _find_series_fpaths(data_dir, basename)
+    if not fpaths:
+        raise RuntimeError(f"get_time_manifest: No (p)vtu files found in {data_dir}")
+    if not basename:
+        basename = _CHK_PATTERN.match(os.path.basename(fpaths[0])).groups()[0]
+    fpath = get_manifest_fpath(data_dir, basename, partitioned, fmt)
+    if os.path.isfile(fpath) and dt is None:
+        entries = _read_existing_manifest(fpath)
+        if (
+            entries is not None
+            and [e["name"] for e in entries] == [os.path.normpath(p) for p in fpaths]
+            and not _is_stale(fpath, data_dir, entries)
+        ):
+            return entries, fpath
+
+    times = get_series_times(data_dir, fpaths, dt=dt)
+    entries = [
+        dict(name=os.path.normpath(p), time=t, size=get_file_size(p))
+        for p, t in zip(fpaths, times)
+    ]
+    try:
+        write_time_manifest(fpath, entries, fmt=fmt)
+    except OSError:
+        print(f"get_time_manifest: Couldn't write {fpath}; manifest won't be reused")
+        fpath = None
+    return entries, fpath
+
+
+def find_time_index(times, time):
+    """
+    Index of the value in (sorted) <times> closest to <time>.
+    """
+    idx = bisect_left(times, time)
+    if idx == len(times):
+        return idx - 1
+    if idx > 0 and time - times[idx - 1] <= times[idx] - time:
+        return idx - 1
+    return idx
@@ -0,0 +1,190 @@
+"""
+Process memory (RSS) tracking with an optional budget. While a monitor is active, RSS is
+sampled at stage boundaries and every animation frame, peaks are recorded per stage, and
+cached data held by pipeline objects is released whenever usage nears the budget.
+"""
+
+from contextlib import contextmanager
+import gc
+import json
+import os
+import re
+
+# The active monitor, if any
+_monitor = None
+
+_SIZE_UNITS = dict(B=1, KB=2**10, MB=2**20, GB=2**30, TB=2**40)
+
+
+def parse_memory_size(size):
+    """
+    Size in bytes from a number (bytes) or a string such as "48GB" or "512 MB".
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.match(r"^\s*([0-9.]+)\s*([KMGT]?B)\s*$", str(size).upper())
+    if match is None:
+        raise ValueError(f"parse_memory_size: Can't interpret '{size}' as a size")
+    return int(float(match.groups()[0]) * _SIZE_UNITS[match.groups()[1]])
+
+
+def get_rss(pid=None):
+    """
+    Resident set size of process <pid> (default: this process) in bytes, or None if it
+    can't be determined.
+    """
+    try:
+        with open(f"/proc/{'self' if pid is None else pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        return psutil.Process(pid).memory_info().rss
+    except psutil.Error:
+        return None
+
+
+def release_caches():
+    """
+    Release the output data held by every pipeline object (it is regenerated if needed
+    again) and drop in-memory caches kept by this package.
+    """
+    from paraview.simple import GetSources
+
+    from .interp import clear_interp_weights_cache
+    from .pyexpr import clear_pyexpr_cache
+
+    for proxy in GetSources().values():
+        algorithm = proxy.GetClientSideObject()
+        if algorithm is None:
+            continue
+        for port in range(algorithm.GetNumberOfOutputPorts()):
+            data = algorithm.GetOutputDataObject(port)
+            if data is not None:
+                data.ReleaseData()
+    clear_interp_weights_cache()
+    clear_pyexpr_cache()
+    gc.collect()
+
+
+class MemoryMonitor:
+    def __init__(self, budget=None, release_fraction=0.9, regrow_fraction=0.05):
+        self.budget = None if budget is None else parse_memory_size(budget)
+        self.release_fraction = release_fraction
+        self.regrow_fraction = regrow_fraction
+        self.active_stages = []
+        self.peaks = {}
+        self.nreleases = 0
+        self.last_release_rss = None
+
+    def _should_release(self, rss):
+        if self.budget is None or rss <= self.release_fraction * self.budget:
+            return False
+        # Freed memory isn't always returned to the OS, so RSS can stay over the
+        # threshold after a release; only release again once it has grown further
+        return (
+            self.last_release_rss is None
+            or rss > self.last_release_rss + self.regrow_fraction * self.budget
+        )
+
+    def sample(self):
+        """
+        Record current RSS against all active stages, releasing caches if it's over
+        the threshold (and has grown by <regrow_fraction> of the budget since any
+        previous release). Returns RSS in bytes (before any release).
+        """
+        rss = get_rss()
+        if rss is None:
+            return None
+        for name in ["total"] + self.active_stages:
+            self.peaks[name] = max(self.peaks.get(name, 0), rss)
+        if self._should_release(rss):
+            release_caches()
+            self.nreleases += 1
+            self.last_release_rss = rss
+            print(
+                f"RSS {rss / 2**30:.2f} GB is near the memory budget "
+                f"({self.budget / 2**30:.2f} GB); released caches"
+            )
+        return rss
+
+    def enter_stage(self, name):
+        self.active_stages.append(name)
+        self.sample()
+
+    def exit_stage(self, name):
+        self.sample()
+        # Remove the innermost occurrence
+        idx = len(self.active_stages) - 1 - self.active_stages[::-1].index(name)
+        del self.active_stages[idx]
+
+    def report(self):
+        return dict(
+            budget_MB=None if self.budget is None else self.budget / 2**20,
+            nreleases=self.nreleases,
+            peak_rss_MB={name: peak / 2**20 for name, peak in self.peaks.items()},
+        )
+
+
+def get_memory_monitor():
+    return _monitor
+
+
+def start_memory_monitor(budget=None, release_fraction=0.9, regrow_fraction=0.05):
+    """
+    Start tracking RSS; if <budget> is set, caches are released when RSS exceeds
+    <release_fraction> of it, and again each time it grows by a further
+    <regrow_fraction> of it. Replaces any monitor already active.
+    """
+    global _monitor
+    _monitor = MemoryMonitor(
+        budget=budget,
+        release_fraction=release_fraction,
+        regrow_fraction=regrow_fraction,
+    )
+    _monitor.sample()
+    return _monitor
+
+
+def stop_memory_monitor(fpath=None):
+    """
+    Stop tracking, print per-stage peak RSS and optionally write the report to <fpath>.
+    """
+    global _monitor
+    monitor, _monitor = _monitor, None
+    if monitor is None:
+        return None
+    monitor.sample()
+    report = monitor.report()
+    print(f"Peak RSS by stage ({report['nreleases']} cache releases):")
+    for name, peak in sorted(report["peak_rss_MB"].items(), key=lambda kv: -kv[1]):
+        print(f"  {name}: {peak:.1f} MB")
+    if fpath:
+        with open(fpath, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote memory report to {fpath}")
+    return report
+
+
+@contextmanager
+def memory_monitored(budget=None, fpath=None, enabled=True):
+    """
+    Track RSS while the block runs (if <enabled>; see start_memory_monitor), stopping
+    the monitor on exit, including on error, and writing its report to <fpath> if set.
+    """
+    if not enabled:
+        yield None
+        return
+    monitor = start_memory_monitor(budget)
+    try:
+        yield monitor
+    finally:
+        stop_memory_monitor(fpath)
+
+
+def get_memory_report_fpath(output_fpath):
+    return os.path.splitext(output_fpath)[0] + "_memory.json"
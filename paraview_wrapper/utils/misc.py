@@ -1,3 +1,5 @@
+import os.path
+import re
 import sys
 
 
@@ -21,3 +23,42 @@ def report_kwargs(kwargs):
 def set_default_kwargs(kwargs, defaults):
     for key in defaults:
         kwargs[key] = kwargs.pop(key, defaults[key])
+
+
+def get_frame_window(fw, nfiles, interp_frames=0):
+    """
+    Clip a [first, last] checkpoint window to the available files and convert it to frame
+    indices, accounting for any interpolated frames inserted between checkpoints.
+    """
+    fw = [max(fw[0], 0), min(fw[1], nfiles - 1)]
+    return [idx * (interp_frames + 1) for idx in fw]
+
+
+def bisection_levels(nframes):
+    """
+    Yield frame indices in coarse-to-fine order, one list per refinement level:
+    [0], [N/2], [N/4, 3N/4], ...
+    Every index in range(nframes) is yielded exactly once.
+    """
+    if nframes < 1:
+        return
+    yield [0]
+    step = 1
+    while step < nframes:
+        step *= 2
+    while step > 1:
+        half = step // 2
+        level = list(range(half, nframes, step))
+        if level:
+            yield level
+        step = half
+
+
+def get_chk_num(fpath):
+    """
+    Checkpoint number from a Nektar output path (<basename>_<num>.<ext>)
+    """
+    match = re.compile(r".*_([0-9]+)\.[a-z]+$").search(os.path.basename(fpath))
+    if match is None:
+        raise ValueError(f"get_chk_num: No checkpoint number in {fpath}")
+    return int(match.groups()[0])
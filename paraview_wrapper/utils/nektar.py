@@ -2,25 +2,98 @@
 Stripped-down Nektar utils to avoid having to import (e.g.) NekPlot
 """
 
+import ast
 import xml.etree.ElementTree as ET
 import os.path
 from glob import glob
 import math
 
+from .misc import get_chk_num
+
+# Max number of elements to look at before giving up on finding CONDITIONS near the
+# start of an XML file
+_MAX_HEAD_ELEMENTS = 64
+# Chunk size for byte-level searches of large files
+_SEARCH_CHUNK_SIZE = 8 * 2**20
+# Files larger than this that start with mesh data only have their end searched
+_MAX_FULL_SEARCH_SIZE = 4 * _SEARCH_CHUNK_SIZE
+
+# Caches keyed on (path, mtime, size)
+_is_config_cache = {}
+_params_cache = {}
+_functions_cache = {}
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _file_contains(path, pattern, start=0):
+    """
+    Streaming byte search for <pattern> from byte <start> onwards, without parsing (or
+    loading) the file.
+    """
+    overlap = len(pattern) - 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        tail = b""
+        while True:
+            chunk = f.read(_SEARCH_CHUNK_SIZE)
+            if not chunk:
+                return False
+            if pattern in tail + chunk:
+                return True
+            tail = chunk[-overlap:]
+
+
+def _scan_nektar_xml(path):
+    """
+    Incrementally parse the start of <path> and return True if it has a top-level
+    CONDITIONS node, or False if it isn't a Nektar XML at all. If the top of the file is
+    mesh data (GEOMETRY etc.), fall back to a byte search for a CONDITIONS tag rather
+    than parsing the whole mesh; for large files, only the end is searched, since a
+    combined mesh + session file has its CONDITIONS after the mesh.
+    """
+    depth = 0
+    try:
+        for nelements, (event, elem) in enumerate(
+            ET.iterparse(path, events=("start", "end"))
+        ):
+            if event == "end":
+                depth -= 1
+                continue
+            depth += 1
+            if depth == 1 and elem.tag != "NEKTAR":
+                return False
+            if depth == 2:
+                if elem.tag == "CONDITIONS":
+                    return True
+                if elem.tag in ["GEOMETRY", "EXPANSIONS"]:
+                    # Mesh data; only a combined mesh + session file has CONDITIONS
+                    break
+            if nelements > _MAX_HEAD_ELEMENTS:
+                break
+    except ET.ParseError:
+        return False
+    size = os.path.getsize(path)
+    if size <= _MAX_FULL_SEARCH_SIZE:
+        return _file_contains(path, b"<CONDITIONS")
+    return _file_contains(path, b"<CONDITIONS", start=size - _SEARCH_CHUNK_SIZE)
+
 
 def is_nektar_config(path):
     """
     Return True if <path> is a valid xml file with a root/CONDITIONS node, False otherwise.
+    Only the start of the file is parsed, and results are cached per path and mtime.
     """
-    is_config = False
     try:
-        root = ET.parse(path).getroot()
-        conditions_node = root.find("./CONDITIONS")
-        is_config = conditions_node is not None
-    except:
-        pass
-    finally:
-        return is_config
+        key = _file_key(path)
+    except OSError:
+        return False
+    if key not in _is_config_cache:
+        _is_config_cache[key] = _scan_nektar_xml(path)
+    return _is_config_cache[key]
 
 
 def find_nektar_config(dir):
@@ -40,55 +113,350 @@ def find_nektar_config(dir):
     return nektar_configs[-1]
 
 
+# Functions and constants available in Nektar expressions (see LibUtilities/Interpreter)
+_EXPR_FUNCS = dict(
+    abs=abs,
+    acos=math.acos,
+    ang=lambda x, y: math.atan2(y, x),
+    asin=math.asin,
+    atan=math.atan,
+    atan2=math.atan2,
+    ceil=math.ceil,
+    cos=math.cos,
+    cosh=math.cosh,
+    exp=math.exp,
+    fabs=math.fabs,
+    floor=math.floor,
+    log=math.log,
+    log10=math.log10,
+    max=max,
+    min=min,
+    pow=math.pow,
+    rad=math.hypot,
+    sign=lambda x: (x > 0) - (x < 0),
+    sin=math.sin,
+    sinh=math.sinh,
+    sqrt=math.sqrt,
+    tan=math.tan,
+    tanh=math.tanh,
+)
+_EXPR_CONSTANTS = dict(
+    DEG=180 / math.pi,
+    E=math.e,
+    GAMMA=0.57721566490153286060,
+    LN10=math.log(10),
+    LN2=math.log(2),
+    LOG10E=math.log10(math.e),
+    LOG2E=math.log2(math.e),
+    PHI=(1 + math.sqrt(5)) / 2,
+    PI=math.pi,
+    PI_2=math.pi / 2,
+    PI_4=math.pi / 4,
+    SQRT1_2=math.sqrt(0.5),
+    SQRT2=math.sqrt(2),
+)
+# Numpy equivalents, used when an expression is evaluated on arrays
+_NP_FUNC_NAMES = dict(
+    abs="abs",
+    acos="arccos",
+    asin="arcsin",
+    atan="arctan",
+    atan2="arctan2",
+    ceil="ceil",
+    cos="cos",
+    cosh="cosh",
+    exp="exp",
+    fabs="fabs",
+    floor="floor",
+    log="log",
+    log10="log10",
+    max="maximum",
+    min="minimum",
+    pow="power",
+    rad="hypot",
+    sign="sign",
+    sin="sin",
+    sinh="sinh",
+    sqrt="sqrt",
+    tan="tan",
+    tanh="tanh",
+)
+_EXPR_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.Pow,
+    ast.Mod,
+    ast.UAdd,
+    ast.USub,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.Eq,
+    ast.NotEq,
+)
+
+
+class NektarExpr:
+    """
+    A Nektar expression string, parsed and checked once. Only arithmetic, comparisons,
+    numeric literals, the functions/constants in _EXPR_FUNCS/_EXPR_CONSTANTS and
+    variable names are allowed. <names> holds the variables it refers to.
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+        # Nektar uses ^ for powers
+        tree = ast.parse(expr.strip().replace("^", "**"), mode="eval")
+        for node in ast.walk(tree):
+            if not isinstance(node, _EXPR_NODES):
+                raise ValueError(
+                    f"NektarExpr: unsupported syntax ({type(node).__name__}) in '{expr}'"
+                )
+            if isinstance(node, ast.Constant) and not isinstance(
+                node.value, (int, float)
+            ):
+                raise ValueError(f"NektarExpr: non-numeric literal in '{expr}'")
+            if isinstance(node, ast.Call) and (
+                not isinstance(node.func, ast.Name)
+                or node.func.id not in _EXPR_FUNCS
+                or node.keywords
+            ):
+                raise ValueError(f"NektarExpr: unsupported function call in '{expr}'")
+        func_names = {n.func.id for n in ast.walk(tree) if isinstance(n, ast.Call)}
+        self.names = {
+            n.id
+            for n in ast.walk(tree)
+            if isinstance(n, ast.Name)
+            and n.id not in func_names
+            and n.id not in _EXPR_CONSTANTS
+        }
+        self._code = compile(tree, f"<NektarExpr {expr}>", "eval")
+
+    def evaluate(self, values={}):
+        """
+        Evaluate with variables taken from <values>. If any of them are numpy arrays,
+        functions are evaluated element-wise.
+        """
+        missing = self.names - set(values)
+        if missing:
+            raise NameError(
+                f"NektarExpr: no value for {', '.join(sorted(missing))} in '{self.expr}'"
+            )
+        if any(hasattr(values[k], "shape") for k in self.names):
+            import numpy as np
+
+            funcs = {k: getattr(np, v) for k, v in _NP_FUNC_NAMES.items()}
+            funcs["ang"] = lambda x, y: np.arctan2(y, x)
+        else:
+            funcs = _EXPR_FUNCS
+        namespace = dict(funcs)
+        namespace.update(_EXPR_CONSTANTS)
+        namespace.update({k: values[k] for k in self.names})
+        return eval(self._code, {"__builtins__": {}}, namespace)
+
+    def __repr__(self):
+        return f"NektarExpr('{self.expr}')"
+
+
+def _evaluation_order(exprs, known):
+    """
+    Order the keys of <exprs> so that each follows the (non-<known>) keys it refers to.
+    Keys that are part of a cycle or depend on an undefined name (directly or not) are
+    returned separately, with a reason.
+    """
+    deps = {k: e.names - set(known) for k, e in exprs.items()}
+    nblockers = {k: len(d) for k, d in deps.items()}
+    dependents = {k: [] for k in exprs}
+    failed = {}
+    for k, d in deps.items():
+        for dep in d:
+            if dep in dependents:
+                dependents[dep].append(k)
+            else:
+                failed[k] = f"undefined name {dep}"
+
+    # Kahn's algorithm, in file order where there's a choice
+    order = []
+    ready = [k for k in exprs if nblockers[k] == 0]
+    while ready:
+        k = ready.pop(0)
+        order.append(k)
+        for dependent in dependents[k]:
+            nblockers[dependent] -= 1
+            if nblockers[dependent] == 0:
+                ready.append(dependent)
+    # Anything left over either (indirectly) needs an undefined name or is in a cycle
+    remaining = [k for k in exprs if k not in order and k not in failed]
+    changed = True
+    while changed:
+        changed = False
+        for k in remaining:
+            undefined = [dep for dep in deps[k] if dep in failed]
+            if k not in failed and undefined:
+                failed[k] = f"depends on undefined {undefined[0]}"
+                changed = True
+    for k in remaining:
+        if k not in failed:
+            failed[k] = "circular reference"
+    return order, failed
+
+
 def convert_str_dict(sd, d={}):
     """
     Convert Nektar params with string values to ints and floats.
-    Handle param references by calling recursively.
+    Each value is parsed once; params are then evaluated in dependency order, with
+    values in <d> available to all of them. Params that can't be evaluated are discarded.
     """
-    nd_in = len(d)
-    ops = {"sqrt(": "math.sqrt("}
+    d = dict(d)
+    exprs = {}
+    for k, vs in sd.items():
+        try:
+            exprs[k] = NektarExpr(vs)
+        except (SyntaxError, ValueError):
+            print(
+                f"convert_str_dict: Unable to convert {k} value {vs} to a number; discarding"
+            )
 
-    # Any purely numeric strings can be converted straight away
-    for k in list(sd.keys()):
-        for op_k, op_v in ops.items():
-            if op_v not in sd[k] and op_k in sd[k]:
-                sd[k] = sd[k].replace(op_k, op_v)
+    order, failed = _evaluation_order(exprs, d)
+    for k in order:
         try:
-            val = eval(sd[k])
-            discard = sd.pop(k)
-            d[k] = val
-        except:
-            pass
-    # If entries have been added to d (new numeric values are available)
-    # and there are still strings to be processed; try subbing in values, then call convert again
-    if sd and len(d) > nd_in:
-        for ks, vs in list(sd.items()):
-            tmp = vs
-            for k, v in d.items():
-                if k in tmp:
-                    tmp = tmp.replace(k, str(v))
-            sd[ks] = tmp
-        convert_str_dict(sd, d)
-    for ks, vs in list(sd.items()):
+            d[k] = exprs[k].evaluate(d)
+        except (ArithmeticError, NameError, TypeError, ValueError) as e:
+            failed[k] = str(e)
+    for k, reason in failed.items():
         print(
-            f"convert_str_dict: Unable to convert {ks} value {vs} to a number; discarding"
+            f"convert_str_dict: Unable to convert {k} value {sd[k]} to a number ({reason}); discarding"
         )
-
     return d
 
 
-def get_nektar_params(dir, fname=""):
+def _read_param_strs(path):
+    """
+    Read the CONDITIONS/PARAMETERS node, stopping as soon as it has been parsed.
+    """
+    tags = []
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            tags.append(elem.tag)
+            continue
+        tags.pop()
+        if elem.tag == "PARAMETERS" and tags == ["NEKTAR", "CONDITIONS"]:
+            return {
+                t[0].strip(): t[1].strip() for t in [p.text.split("=") for p in elem]
+            }
+        elif len(tags) > 1 and tags[1] in ["GEOMETRY", "EXPANSIONS"]:
+            # Don't hold on to mesh data while looking for the parameters
+            elem.clear()
+    raise RuntimeError(f"No CONDITIONS/PARAMETERS node found in {path}")
+
+
+def _read_function_strs(path):
     """
-    Read params node from Nektar XML and return in a dict
+    Read the expressions in each CONDITIONS/FUNCTION node, as {name: {var: expr}}.
+    Variables defined by files rather than expressions are skipped.
     """
+    funcs = {}
+    tags = []
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            tags.append(elem.tag)
+            continue
+        tags.pop()
+        if elem.tag == "FUNCTION" and tags == ["NEKTAR", "CONDITIONS"]:
+            funcs[elem.get("NAME")] = {
+                e.get("VAR").strip(): e.get("VALUE").strip()
+                for e in elem
+                if e.tag == "E" and e.get("VALUE") is not None
+            }
+        elif elem.tag == "CONDITIONS" and tags == ["NEKTAR"]:
+            return funcs
+        elif len(tags) > 1 and tags[1] in ["GEOMETRY", "EXPANSIONS"]:
+            elem.clear()
+    raise RuntimeError(f"No CONDITIONS node found in {path}")
 
+
+def _get_session_path(dir, fname):
     if fname:
-        path = os.path.join(dir, fname)
-    else:
-        path = find_nektar_config(dir)
-
-    tree = ET.parse(path)
-    root = tree.getroot()
-    params = root.find("./CONDITIONS/PARAMETERS")
-    str_dict = {t[0].strip(): t[1].strip() for t in [p.text.split("=") for p in params]}
-    return convert_str_dict(str_dict, d={})
+        return os.path.join(dir, fname)
+    return find_nektar_config(dir)
+
+
+def get_nektar_params(dir, fname=""):
+    """
+    Read params node from Nektar XML and return in a dict.
+    Results are cached per path and mtime.
+    """
+    path = _get_session_path(dir, fname)
+    key = _file_key(path)
+    if key not in _params_cache:
+        _params_cache[key] = convert_str_dict(_read_param_strs(path), d={})
+    return dict(_params_cache[key])
+
+
+def get_nektar_functions(dir, fname=""):
+    """
+    Read FUNCTION nodes from Nektar XML and return {name: {var: NektarExpr}}.
+    Expressions are in terms of x, y, z, t and the session parameters (see
+    evaluate_nektar_function). Results are cached per path and mtime.
+    """
+    path = _get_session_path(dir, fname)
+    key = _file_key(path)
+    if key not in _functions_cache:
+        funcs = {}
+        for name, var_strs in _read_function_strs(path).items():
+            funcs[name] = {}
+            for var, expr in var_strs.items():
+                try:
+                    funcs[name][var] = NektarExpr(expr)
+                except (SyntaxError, ValueError):
+                    print(
+                        f"get_nektar_functions: Unable to parse {name}/{var} expression {expr}; discarding"
+                    )
+        _functions_cache[key] = funcs
+    return {name: dict(var_exprs) for name, var_exprs in _functions_cache[key].items()}
+
+
+def evaluate_nektar_function(dir, name, x=0.0, y=0.0, z=0.0, t=0.0, fname=""):
+    """
+    Evaluate each variable of the Nektar FUNCTION <name> at the given coordinates
+    (scalars or numpy arrays) and time. Returns {var: value}.
+    """
+    funcs = get_nektar_functions(dir, fname=fname)
+    if name not in funcs:
+        raise KeyError(
+            f"evaluate_nektar_function: no FUNCTION named {name}; choose from {list(funcs)}"
+        )
+    try:
+        values = get_nektar_params(dir, fname=fname)
+    except RuntimeError:
+        # Sessions with no PARAMETERS node can still define functions
+        values = {}
+    values.update(x=x, y=y, z=z, t=t)
+    return {var: expr.evaluate(values) for var, expr in funcs[name].items()}
+
+
+def get_chk_times(dir, fpaths, dt=None):
+    """
+    Times of the checkpoint files in <fpaths>. If <dt> (the time between checkpoints)
+    isn't given, it's read from the Nektar session in <dir>; if that fails, checkpoint
+    numbers are returned instead.
+    """
+    if dt is None:
+        try:
+            nek_params = get_nektar_params(dir)
+            dt = nek_params["TimeStep"] * nek_params["IO_CheckSteps"]
+        except (KeyError, RuntimeError):
+            print("get_chk_times: couldn't determine dt; using checkpoint numbers")
+            dt = 1.0
+    return [get_chk_num(fpath) * dt for fpath in fpaths]
@@ -0,0 +1,88 @@
+"""
+Reduction of particle data before rendering: subsampling (with weights rescaled so that
+the represented density is unchanged) and culling to a bounding box or view frustum.
+"""
+
+import numpy as np
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray,
+    vtk_to_numpy,
+)
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+
+
+def select_particles(pts, stride=1, fraction=None, seed=0, bounds=None, planes=None):
+    """
+    Indices of particles (rows of <pts>) to keep, and the factor by which their weights
+    must be scaled to preserve density.
+        stride   : keep every nth particle
+        fraction : keep a random fraction of particles (same subset for a given seed)
+        bounds   : [xmin, xmax, ymin, ymax, zmin, zmax]; discard particles outside
+        planes   : list of (a, b, c, d); discard particles with ax + by + cz + d < 0
+    Culling doesn't change the weight factor; particles that remain are unaffected.
+    """
+    npts = pts.shape[0]
+    keep = np.zeros(npts, dtype=bool)
+    keep[::stride] = True
+    weight_fac = float(stride)
+    if fraction is not None and fraction < 1:
+        keep &= np.random.default_rng(seed).random(npts) < fraction
+        weight_fac /= fraction
+    if bounds is not None:
+        for idim in range(pts.shape[1]):
+            keep &= (pts[:, idim] >= bounds[2 * idim]) & (
+                pts[:, idim] <= bounds[2 * idim + 1]
+            )
+    if planes is not None:
+        for a, b, c, d in planes:
+            keep &= pts @ np.array([a, b, c]) + d >= 0
+    return np.nonzero(keep)[0], weight_fac
+
+
+def reduce_particles(
+    algorithm,
+    stride=1,
+    fraction=None,
+    seed=0,
+    bounds=None,
+    planes=None,
+    weight_name="COMPUTATIONAL_WEIGHT",
+):
+    """
+    RequestData step for a programmable filter that subsamples and/or culls particles
+    (polydata with one vertex per particle).
+    """
+    inp = algorithm.GetInputDataObject(0, 0)
+    out = algorithm.GetOutputDataObject(0)
+    if inp.GetNumberOfPoints() == 0:
+        out.ShallowCopy(inp)
+        return
+
+    pts = vtk_to_numpy(inp.GetPoints().GetData())
+    idx, weight_fac = select_particles(
+        pts, stride=stride, fraction=fraction, seed=seed, bounds=bounds, planes=planes
+    )
+
+    vtk_pts = vtkPoints()
+    vtk_pts.SetData(numpy_to_vtk(np.ascontiguousarray(pts[idx]), deep=1))
+    out.SetPoints(vtk_pts)
+    verts = vtkCellArray()
+    verts.SetData(
+        numpy_to_vtkIdTypeArray(np.arange(idx.size + 1, dtype=np.int64), deep=1),
+        numpy_to_vtkIdTypeArray(np.arange(idx.size, dtype=np.int64), deep=1),
+    )
+    out.SetVerts(verts)
+
+    in_pd = inp.GetPointData()
+    for iarr in range(in_pd.GetNumberOfArrays()):
+        in_arr = in_pd.GetArray(iarr)
+        if in_arr is None:
+            continue
+        vals = vtk_to_numpy(in_arr)[idx]
+        if in_arr.GetName() == weight_name:
+            vals = vals * weight_fac
+        out_arr = numpy_to_vtk(np.ascontiguousarray(vals), deep=1)
+        out_arr.SetName(in_arr.GetName())
+        out.GetPointData().AddArray(out_arr)
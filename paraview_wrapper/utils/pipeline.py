@@ -0,0 +1,137 @@
+"""
+Pipeline scopes: track the proxies (sources, views, layouts, transfer functions, ...)
+registered while a block of code runs and delete them on exit, so that repeated calls in
+a long session (e.g. a batch of jobs) don't accumulate pipeline objects.
+Proxies passed to keep_proxy (and everything upstream of them) survive all scopes.
+"""
+
+from contextlib import contextmanager
+import functools
+import gc
+
+from paraview import servermanager
+
+from .pyexpr import clear_pyexpr_cache
+
+# Proxy groups tracked by scopes, in the order they're cleaned up. Views go before
+# layouts and transfer functions, taking their representations (incl. scalar bars) with
+# them.
+_SCOPED_GROUPS = [
+    "sources",
+    "views",
+    "layouts",
+    "scalar_bars",
+    "lookup_tables",
+    "piecewise_functions",
+    "transfer_2d_functions",
+]
+
+# Global IDs of proxies that scopes never delete
+_kept_ids = set()
+
+
+def _proxy_id(proxy):
+    return proxy.SMProxy.GetGlobalIDAsString()
+
+
+def _registered_proxies(group):
+    """
+    {global id: proxy} for the proxies in <group> of the active session.
+    """
+    pxm = servermanager.ProxyManager()
+    if pxm is None:
+        return {}
+    return {key[1]: proxy for key, proxy in pxm.GetProxiesInGroup(group).items()}
+
+
+def _snapshot():
+    return {group: set(_registered_proxies(group)) for group in _SCOPED_GROUPS}
+
+
+def _upstream_ids(proxy):
+    """
+    Global IDs of <proxy> and every proxy it takes input from, recursively.
+    """
+    ids = {_proxy_id(proxy)}
+    if "Input" in proxy.ListProperties():
+        inputs = proxy.Input
+        for input in inputs if isinstance(inputs, list) else [inputs]:
+            if input is not None:
+                ids |= _upstream_ids(input)
+    return ids
+
+
+def keep_proxy(proxy):
+    """
+    Exempt <proxy> and its inputs from deletion by pipeline scopes, so that (e.g.) a
+    reader can be shared by successive jobs. Returns <proxy>.
+    """
+    _kept_ids.update(_upstream_ids(proxy))
+    return proxy
+
+
+def release_proxy(proxy):
+    """
+    Undo keep_proxy; <proxy> is deleted by the next scope that created it, or by
+    delete_new_proxies.
+    """
+    _kept_ids.difference_update(_upstream_ids(proxy))
+
+
+def delete_new_proxies(snapshot):
+    """
+    Delete proxies registered since <snapshot> (see _snapshot), apart from any that
+    are kept. Returns the number deleted.
+    """
+    controller = servermanager.vtkSMParaViewPipelineControllerWithRendering()
+    ndeleted = 0
+    for group in _SCOPED_GROUPS:
+        # Newest first, so that filters are deleted before their inputs
+        new_ids = sorted(
+            set(_registered_proxies(group)) - snapshot.get(group, set()) - _kept_ids,
+            key=int,
+            reverse=True,
+        )
+        for proxy_id in new_ids:
+            # Deleting a view or source can take other proxies with it
+            proxy = _registered_proxies(group).get(proxy_id)
+            if proxy is None:
+                continue
+            controller.UnRegisterProxy(proxy.SMProxy)
+            ndeleted += 1
+    gc.collect()
+    return ndeleted
+
+
+def count_proxies():
+    """
+    Number of proxies in the groups tracked by pipeline scopes.
+    """
+    return sum(len(_registered_proxies(group)) for group in _SCOPED_GROUPS)
+
+
+@contextmanager
+def pipeline_scope():
+    """
+    Delete every (non-kept) proxy created within the block when it exits, including
+    on error, and drop the expression results cached for them.
+    """
+    snapshot = _snapshot()
+    try:
+        yield
+    finally:
+        delete_new_proxies(snapshot)
+        clear_pyexpr_cache()
+
+
+def scoped_pipeline(func):
+    """
+    Decorator running every call of <func> in a pipeline scope.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with pipeline_scope():
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -1,7 +1,17 @@
 predef_colors = dict(r=[1.0, 0.0, 0.0], g=[0.0, 1.0, 0.0], b=[0.0, 0.0, 1.0])
 
+# ParaView chart line styles => matplotlib equivalents
+pv_to_mpl_lstys = {
+    "0": "None",
+    "1": "-",
+    "2": "--",
+    "3": ":",
+    "4": "-.",
+    "5": (0, (3, 1, 1, 1, 1, 1)),
+}
 
-def get_color_array(name, arg):
+
+def get_color_vals(arg):
     if isinstance(arg, str):
         vals = predef_colors.get(arg, predef_colors["r"])
     elif isinstance(arg, list):
@@ -15,6 +25,14 @@ def get_color_array(name, arg):
                 raise TypeError(
                     f"get_color_array: expected all floats in values array but got {type(val)}"
                 )
+    return vals
+
+
+def get_color_array(name, arg):
     result = [name]
-    result.extend([str(v) for v in vals])
+    result.extend([str(v) for v in get_color_vals(arg)])
     return result
+
+
+def get_mpl_linestyle(arg):
+    return pv_to_mpl_lstys.get(str(arg), "-")
@@ -0,0 +1,311 @@
+"""
+Opt-in timing of pipeline stages and animation frames. While a trace is active,
+stages record wall and CPU time; the trace is written in Chrome trace format
+(load in chrome://tracing or Perfetto), with a per-stage summary alongside the events.
+The same hooks feed the memory monitor (see memory.py), if one is active, and a
+progress callback, if one is set (see set_progress_callback).
+When none of these is active, stage() and profiled() reduce to a few global lookups.
+"""
+
+from contextlib import contextmanager, nullcontext
+import functools
+import json
+import os
+import os.path
+import threading
+import time
+
+from . import memory as _memory
+
+_NULL_CONTEXT = nullcontext()
+
+# The active trace, if any
+_trace = None
+# Function called with a dict for each progress event, if any
+_progress = None
+
+
+class Trace:
+    def __init__(self):
+        self.events = []
+        self.pid = os.getpid()
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+
+    def _ts(self, t):
+        # Chrome trace timestamps are in microseconds
+        return (t - self.t0) * 1e6
+
+    def add_event(self, name, cat, wall_start, wall_end, cpu=None, args={}):
+        event_args = dict(args)
+        if cpu is not None:
+            event_args["cpu_ms"] = cpu * 1e3
+        self.events.append(
+            dict(
+                name=name,
+                cat=cat,
+                ph="X",
+                ts=self._ts(wall_start),
+                dur=(wall_end - wall_start) * 1e6,
+                pid=self.pid,
+                tid=threading.get_ident(),
+                args=event_args,
+            )
+        )
+
+    def add_counter(self, name, t, values):
+        self.events.append(
+            dict(name=name, ph="C", ts=self._ts(t), pid=self.pid, args=values)
+        )
+
+    def summary(self):
+        """
+        Count, total wall time and total CPU time for each (category, name).
+        """
+        summary = {}
+        for event in self.events:
+            if event["ph"] != "X":
+                continue
+            key = f"{event['cat']}:{event['name']}"
+            entry = summary.setdefault(key, dict(count=0, wall_ms=0.0, cpu_ms=0.0))
+            entry["count"] += 1
+            entry["wall_ms"] += event["dur"] / 1e3
+            entry["cpu_ms"] += event["args"].get("cpu_ms", 0.0)
+        return summary
+
+    def write(self, fpath):
+        with open(fpath, "w") as f:
+            json.dump(
+                dict(
+                    traceEvents=self.events,
+                    displayTimeUnit="ms",
+                    summary=self.summary(),
+                ),
+                f,
+            )
+
+
+def get_trace():
+    return _trace
+
+
+def start_trace():
+    """
+    Start recording stage and frame timings; replaces any trace already active.
+    """
+    global _trace
+    _trace = Trace()
+    return _trace
+
+
+def stop_trace(fpath=None):
+    """
+    Stop recording and optionally write the trace to <fpath>.
+    """
+    global _trace
+    trace, _trace = _trace, None
+    if trace is None:
+        return None
+    trace.add_event(
+        "total",
+        "total",
+        trace.t0,
+        time.perf_counter(),
+        cpu=time.process_time() - trace.cpu0,
+    )
+    if fpath:
+        trace.write(fpath)
+        print(f"Wrote timing trace to {fpath}")
+    return trace
+
+
+def get_trace_fpath(output_fpath):
+    return os.path.splitext(output_fpath)[0] + "_trace.json"
+
+
+@contextmanager
+def traced(fpath=None, enabled=True):
+    """
+    Record a trace while the block runs (if <enabled>), stopping it on exit, including
+    on error, and writing it to <fpath> if set.
+    """
+    if not enabled:
+        yield None
+        return
+    trace = start_trace()
+    try:
+        yield trace
+    finally:
+        stop_trace(fpath)
+
+
+def set_progress_callback(callback):
+    """
+    Call <callback> with a dict for each progress event: stage_start and stage_end
+    (with the stage name) and frame (with the animation time and end time).
+    Pass None to stop. Returns the previous callback.
+    """
+    global _progress
+    previous, _progress = _progress, callback
+    return previous
+
+
+def _is_active():
+    return _trace is not None or _memory._monitor is not None or _progress is not None
+
+
+@contextmanager
+def _timed_stage(trace, name, cat, args):
+    monitor = _memory._monitor
+    progress = _progress
+    if monitor is not None:
+        monitor.enter_stage(name)
+    if progress is not None:
+        progress(dict(event="stage_start", name=name))
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        if progress is not None:
+            progress(
+                dict(
+                    event="stage_end",
+                    name=name,
+                    wall_s=time.perf_counter() - wall_start,
+                )
+            )
+        if trace is not None:
+            trace.add_event(
+                name,
+                cat,
+                wall_start,
+                time.perf_counter(),
+                cpu=time.process_time() - cpu_start,
+                args=args,
+            )
+        if monitor is not None:
+            monitor.exit_stage(name)
+
+
+def stage(name, cat="stage", **args):
+    """
+    Context manager timing a block of code, if a trace is active.
+    """
+    if not _is_active():
+        return _NULL_CONTEXT
+    return _timed_stage(_trace, name, cat, args)
+
+
+def profiled(name=None, cat="stage"):
+    """
+    Decorator timing every call of a function, if a trace is active.
+    """
+
+    def decorator(func):
+        stage_name = func.__name__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _is_active():
+                return func(*args, **kwargs)
+            with _timed_stage(_trace, stage_name, cat, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def frame_timer(anim_scene, view=None):
+    """
+    Record one event per animation frame (time between scene ticks, covering reading,
+    filtering, rendering and writing) and, if <view> is given, one per render. If a
+    memory monitor is active, RSS is also sampled every frame, and if a progress
+    callback is set, it's called every frame. If the callback raises (e.g. to cancel
+    the render), the animation is stopped and the exception re-raised once it returns,
+    since VTK swallows exceptions raised in observers.
+    Does nothing if none of these is active.
+    """
+    trace = _trace
+    monitor = _memory._monitor
+    progress = _progress
+    if trace is None and monitor is None and progress is None:
+        yield
+        return
+
+    scene = anim_scene.GetClientSideObject()
+    last_tick = dict(wall=None, cpu=None, time=None)
+    aborted = []
+
+    def on_tick(obj, event):
+        try:
+            record_tick(obj)
+        except BaseException as e:
+            # VTK would print and swallow it; stop the animation and re-raise it below
+            if not aborted:
+                aborted.append(e)
+                anim_scene.Stop()
+
+    def record_tick(obj):
+        now, cpu_now = time.perf_counter(), time.process_time()
+        if progress is not None and obj is not None:
+            progress(
+                dict(
+                    event="frame",
+                    time=anim_scene.AnimationTime,
+                    end_time=anim_scene.EndTime,
+                )
+            )
+        if monitor is not None:
+            rss = monitor.sample()
+            if trace is not None and rss is not None:
+                trace.add_counter("rss", now, dict(MB=rss / 2**20))
+        if trace is None:
+            return
+        if last_tick["wall"] is not None:
+            trace.add_event(
+                "frame",
+                "frame",
+                last_tick["wall"],
+                now,
+                cpu=cpu_now - last_tick["cpu"],
+                args=dict(time=last_tick["time"]),
+            )
+        last_tick.update(wall=now, cpu=cpu_now, time=anim_scene.AnimationTime)
+
+    observers = [(scene, scene.AddObserver("AnimationCueTickEvent", on_tick))]
+
+    if trace is not None and view is not None:
+        render_start = {}
+
+        def on_render_start(obj, event):
+            render_start.update(wall=time.perf_counter(), cpu=time.process_time())
+
+        def on_render_end(obj, event):
+            if render_start:
+                trace.add_event(
+                    "render",
+                    "render",
+                    render_start["wall"],
+                    time.perf_counter(),
+                    cpu=time.process_time() - render_start["cpu"],
+                )
+
+        render_window = view.GetRenderWindow()
+        observers.append(
+            (render_window, render_window.AddObserver("StartEvent", on_render_start))
+        )
+        observers.append(
+            (render_window, render_window.AddObserver("EndEvent", on_render_end))
+        )
+    try:
+        yield
+    finally:
+        # Close the final frame
+        on_tick(None, None)
+        for obj, tag in observers:
+            obj.RemoveObserver(tag)
+    if aborted:
+        raise aborted[0]
@@ -2,14 +2,37 @@ import datetime
 import os.path
 from paraview.simple import (
     CreateView,
+    Decimate,
     Delete,
+    ExtractSurface,
+    GetAnimationScene,
+    GetTimeKeeper,
+    MaskPoints,
+    ProgrammableFilter,
+    ProgrammableSource,
+    ResampleToImage,
+    SaveScreenshot,
     Show,
+    TemporalInterpolator,
+    Text,
     Transform,
+    Triangulate,
     XMLUnstructuredGridReader,
     XMLPartitionedUnstructuredGridReader,
 )
 import paraview.util
 import re
+import shutil
+
+from .locations import LOCATIONS
+from .deposit import deposit_all_steps
+from .diff import pair_fpaths
+from .manifest import find_time_index, get_time_manifest
+from .misc import bisection_levels
+from .nektar import get_chk_times
+from .profiling import profiled, stage
+from .stats import auto_opacities, auto_range, get_series_stats
+from .video import frames_to_movie
 
 
 def get_ugrid_bounds(d, axis):
@@ -22,6 +45,7 @@ def get_ugrid_bounds(d, axis):
     return min_max
 
 
+@profiled()
 def get_ugrid_props(data):
     # Dummy Show() required to force initialisation of data info
     dummy_view = CreateView("RenderView")
@@ -144,6 +168,7 @@ def my_glob(path, rootDir=None):
     return foundFiles
 
 
+@profiled()
 def get_paths(data_dir, basename, ext):
     pattern = f"{data_dir}/{basename}*.{ext}"
     # PV glov is extremely slow for some reason, use a custom version
@@ -154,16 +179,12 @@ def get_paths(data_dir, basename, ext):
     return fpaths
 
 
-def get_vtu_data(
-    data_dir,
-    basename="",
-    nektar_fname_fmt=False,
-    registration_name=None,
-):
-    # Default registration name
-    if registration_name is None:
-        registration_name = gen_registration_name("vtu_data")
-
+@profiled()
+def find_vtu_paths(data_dir, basename="", nektar_fname_fmt=False):
+    """
+    Find (p)vtu files in <data_dir>, sorted by checkpoint number.
+    Returns the list of paths and whether they are partitioned (pvtu) files.
+    """
     # Look for pvtu first
     fpaths = get_paths(data_dir, basename, "pvtu")
     if fpaths:
@@ -184,7 +205,27 @@ def get_vtu_data(
             print(
                 f"get_vtu_data: WARNING - Found pvtus/vtus with multiple basenames in {data_dir}; pass 'basename=' to choose one"
             )
+    return fpaths, partitioned
+
+
+@profiled()
+def get_vtu_data(
+    data_dir,
+    basename="",
+    nektar_fname_fmt=False,
+    registration_name=None,
+):
+    # Default registration name
+    if registration_name is None:
+        registration_name = gen_registration_name("vtu_data")
+
+    fpaths, partitioned = find_vtu_paths(
+        data_dir, basename=basename, nektar_fname_fmt=nektar_fname_fmt
+    )
+    return _read_vtus(fpaths, partitioned, registration_name)
+
 
+def _read_vtus(fpaths, partitioned, registration_name):
     if partitioned:
         data = XMLPartitionedUnstructuredGridReader(
             registrationName=registration_name, FileName=fpaths
@@ -196,6 +237,32 @@ def get_vtu_data(
     return data
 
 
+@profiled()
+def get_manifest_vtu_data(
+    data_dir, basename="", dt=None, time=None, registration_name=None
+):
+    """
+    Like get_vtu_data, but with the files listed in (and timed by) a time manifest,
+    which is (re)generated if necessary, rather than found by globbing <data_dir>.
+    Reader times are still file indices. If <time> is given, only the file closest to
+    that physical time is read.
+    Returns the reader, the physical time of each file and the index of the file
+    closest to <time> (0 if not given).
+    """
+    if registration_name is None:
+        registration_name = gen_registration_name("vtu_data")
+
+    entries, _ = get_time_manifest(data_dir, basename=basename, dt=dt)
+    times = [e["time"] for e in entries]
+    fpaths = [e["name"] for e in entries]
+    time_idx = 0
+    if time is not None:
+        time_idx = find_time_index(times, time)
+        fpaths = fpaths[time_idx : time_idx + 1]
+    data = _read_vtus(fpaths, fpaths[0].endswith(".pvtu"), registration_name)
+    return data, times, time_idx
+
+
 def scale_data(data, scale_facs):
     if type(scale_facs) != list:
         raise TypeError("scale_data: expected scaling factors in a list")
@@ -211,3 +278,371 @@ def scale_data(data, scale_facs):
     scaled_data.Transform = "Transform"
     scaled_data.Transform.Scale = scale_facs
     return scaled_data
+
+
+def interpolate_in_time(data, interp_frames):
+    """
+    Linearly interpolate point data onto <interp_frames> extra times between each pair of
+    consecutive timesteps. Relies on all timesteps sharing the same mesh.
+    """
+    if interp_frames < 0:
+        raise ValueError(
+            f"interpolate_in_time: interp_frames must be >= 0 (got {interp_frames})"
+        )
+    interp_data = TemporalInterpolator(
+        registrationName=gen_registration_name("TemporalInterpolator"), Input=data
+    )
+    interp_data.DiscreteTimeStepInterval = 1.0 / (interp_frames + 1)
+    return interp_data
+
+
+# SaveAnimation options that save_animation_coarse_to_fine handles itself, and those it
+# passes on to SaveScreenshot for each frame
+_COARSE_TO_FINE_OPTIONS = ["FrameWindow", "FrameStride", "FrameRate"]
+_SCREENSHOT_OPTIONS = [
+    "CompressionLevel",
+    "FontScaling",
+    "ImageResolution",
+    "OverrideColorPalette",
+    "SaveAllViews",
+    "SeparatorColor",
+    "SeparatorWidth",
+    "StereoMode",
+    "TransparentBackground",
+]
+
+
+@profiled()
+def save_animation_coarse_to_fine(output_fpath, view, **animation_settings):
+    """
+    Alternative to SaveAnimation that renders frames in bisection order (0, N/2, N/4,
+    3N/4, ...) and writes a low frame-rate preview movie after each level. The full
+    movie is assembled in the normal order once all frames have been rendered.
+    Options that SaveScreenshot also takes (e.g. TransparentBackground) apply to each
+    frame; those that only apply to SaveAnimation's movie writers (e.g. Quality) can't
+    be honoured, so a warning is printed if any are passed.
+    """
+    ignored = sorted(
+        set(animation_settings) - set(_COARSE_TO_FINE_OPTIONS + _SCREENSHOT_OPTIONS)
+    )
+    if ignored:
+        print(
+            "save_animation_coarse_to_fine: ignoring SaveAnimation options not "
+            f"supported with bisection render order: {', '.join(ignored)}"
+        )
+    anim_scene = GetAnimationScene()
+    times = GetTimeKeeper().TimestepValues
+    if not isinstance(times, (list, tuple)):
+        times = [times]
+    times = list(times)
+
+    fw = animation_settings.get("FrameWindow", [0, len(times) - 1])
+    stride = animation_settings.get("FrameStride", 1)
+    times = times[fw[0] : fw[1] + 1 : stride]
+    nframes = len(times)
+    frame_rate = animation_settings.get("FrameRate", 5)
+    screenshot_settings = {
+        k: v for k, v in animation_settings.items() if k in _SCREENSHOT_OPTIONS
+    }
+
+    output_root, output_ext = os.path.splitext(output_fpath)
+    frames_dir = output_root + "_frames"
+    preview_fpath = f"{output_root}_preview{output_ext}"
+    os.makedirs(frames_dir, exist_ok=True)
+    frame_fpaths = [
+        os.path.join(frames_dir, f"frame_{idx:05d}.png") for idx in range(nframes)
+    ]
+
+    rendered = []
+    for level_idx, level in enumerate(bisection_levels(nframes)):
+        for idx in level:
+            with stage("frame", cat="frame", time=times[idx]):
+                anim_scene.AnimationTime = times[idx]
+                SaveScreenshot(frame_fpaths[idx], view, **screenshot_settings)
+        rendered = sorted(rendered + level)
+        if len(rendered) < nframes:
+            # Scale frame rate so that the preview has the same duration as the movie
+            preview_rate = max(frame_rate * len(rendered) / nframes, 1.0)
+            frames_to_movie(
+                [frame_fpaths[idx] for idx in rendered], preview_fpath, preview_rate
+            )
+            print(
+                f"Level {level_idx}: {len(rendered)}/{nframes} frames rendered, preview saved to {preview_fpath}"
+            )
+
+    frames_to_movie(frame_fpaths, output_fpath, frame_rate)
+    shutil.rmtree(frames_dir)
+
+
+def resample_to_image(data, dims):
+    resampled_data = ResampleToImage(
+        registrationName=gen_registration_name("ResampleToImage"), Input=data
+    )
+    resampled_data.UseInputBounds = 1
+    resampled_data.SamplingDimensions = dims
+    return resampled_data
+
+
+def decimate_surface(data, target_reduction):
+    surface = ExtractSurface(
+        registrationName=gen_registration_name("ExtractSurface"), Input=data
+    )
+    triangles = Triangulate(
+        registrationName=gen_registration_name("Triangulate"), Input=surface
+    )
+    decimated_data = Decimate(
+        registrationName=gen_registration_name("Decimate"), Input=triangles
+    )
+    decimated_data.TargetReduction = target_reduction
+    return decimated_data
+
+
+def subsample_points(data, stride):
+    subsampled_data = MaskPoints(
+        registrationName=gen_registration_name("MaskPoints"), Input=data
+    )
+    subsampled_data.OnRatio = stride
+    subsampled_data.MaximumNumberofPoints = 2**31 - 1
+    subsampled_data.GenerateVertices = 1
+    subsampled_data.SingleVertexPerCell = 1
+    return subsampled_data
+
+
+def add_text_label(view, text, lbl_settings={}):
+    lbl_settings_int = dict(loc="Upper Center", fontsize=18, color=[1.0, 0.0, 0.0])
+    lbl_settings_int.update(lbl_settings)
+    lbl = Text(registrationName=gen_registration_name("Text"), Text=text)
+    display = Show(lbl, view, "TextSourceRepresentation")
+    display.WindowLocation = lbl_settings_int["loc"]
+    display.FontSize = lbl_settings_int["fontsize"]
+    display.Color = lbl_settings_int["color"]
+    return lbl
+
+
+def _gen_python_call_script(func_path, kwargs):
+    """
+    Generate a programmable filter/source script that calls <func_path> ("module.func")
+    with the algorithm (self) and <kwargs>, which must all be Python literals.
+    """
+    module_name, func_name = func_path.rsplit(".", 1)
+    pkg_parent = os.path.dirname(LOCATIONS["repo_root"])
+    return "\n".join(
+        [
+            "import importlib, sys",
+            f"if {repr(pkg_parent)} not in sys.path:",
+            f"    sys.path.append({repr(pkg_parent)})",
+            f"func = getattr(importlib.import_module({repr(module_name)}), {repr(func_name)})",
+            f"func(self, **{repr(kwargs)})",
+        ]
+    )
+
+
+def python_filter(
+    input_data,
+    data_func,
+    kwargs={},
+    info_func=None,
+    output_type="Same as Input",
+    prefix="PythonFilter",
+):
+    """
+    Create a programmable filter whose RequestData (and optionally RequestInformation)
+    steps are implemented by functions in this package.
+    """
+    filter = ProgrammableFilter(
+        registrationName=gen_registration_name(prefix), Input=input_data
+    )
+    filter.OutputDataSetType = output_type
+    filter.Script = _gen_python_call_script(data_func, kwargs)
+    if info_func is not None:
+        filter.RequestInformationScript = _gen_python_call_script(info_func, kwargs)
+    return filter
+
+
+def update_python_filter(filter, data_func, kwargs={}):
+    """
+    Replace the arguments passed to the RequestData function of a filter created with
+    python_filter.
+    """
+    filter.Script = _gen_python_call_script(data_func, kwargs)
+
+
+def python_source(
+    data_func,
+    kwargs={},
+    info_func=None,
+    output_type="vtkPolyData",
+    prefix="PythonSource",
+):
+    """
+    Programmable source equivalent of python_filter.
+    """
+    source = ProgrammableSource(registrationName=gen_registration_name(prefix))
+    source.OutputDataSetType = output_type
+    source.Script = _gen_python_call_script(data_func, kwargs)
+    if info_func is not None:
+        source.ScriptRequestInformation = _gen_python_call_script(info_func, kwargs)
+    return source
+
+
+@profiled()
+def deposit_particles(particle_fpath, bounds, dims, nprocs=None):
+    """
+    Source serving weighted particle densities on a regular grid covering <bounds>.
+    All steps are deposited (in parallel) and cached before the source is created.
+    """
+    bounds = [float(v) for v in bounds]
+    dims = [int(v) for v in dims]
+    cache_fpath = deposit_all_steps(particle_fpath, bounds, dims, nprocs=nprocs)
+    return python_source(
+        "paraview_wrapper.utils.deposit.deposit_data",
+        kwargs=dict(cache_fpath=cache_fpath, bounds=bounds, dims=dims),
+        info_func="paraview_wrapper.utils.deposit.deposit_info",
+        output_type="vtkImageData",
+        prefix="ParticleDeposit",
+    )
+
+
+def particle_trails(particle_fpath, trail_len, id_name="PARTICLE_ID"):
+    """
+    Source generating polylines through the last <trail_len> positions of each particle.
+    Positions are buffered between frames, so each new frame only reads one step.
+    """
+    return python_source(
+        "paraview_wrapper.utils.trails.trails_data",
+        kwargs=dict(fpath=particle_fpath, trail_len=int(trail_len), id_name=id_name),
+        info_func="paraview_wrapper.utils.trails.trails_info",
+        output_type="vtkPolyData",
+        prefix="ParticleTrails",
+    )
+
+
+def reduce_particles(part_data, settings):
+    """
+    Subsample and/or cull particles before rendering. <settings> are passed to
+    utils.particles.reduce_particles (stride, fraction, seed, bounds, planes,
+    weight_name); weights are rescaled to preserve density.
+    """
+    return python_filter(
+        part_data,
+        "paraview_wrapper.utils.particles.reduce_particles",
+        kwargs=settings,
+        output_type="vtkPolyData",
+        prefix="ReduceParticles",
+    )
+
+
+def get_frustum_planes(view):
+    """
+    The four side planes (a, b, c, d) of the current view frustum, normals pointing in.
+    The near and far planes are left out: the camera's clipping range is only reset to
+    fit the scene when it's rendered, so before the first render they'd be stale.
+    """
+    width, height = view.ViewSize
+    planes = [0.0] * 24
+    view.GetActiveCamera().GetFrustumPlanes(width / max(height, 1), planes)
+    # Ordered left, right, bottom, top, near, far
+    return [planes[4 * ii : 4 * ii + 4] for ii in range(4)]
+
+
+def cached_resample_to_image(data, dims, arrays, bounds=None, fill_value=0.0):
+    """
+    Equivalent of ResampleToImage for data on a static mesh. Cell locations and
+    interpolation weights are computed on the first frame and cached, so that subsequent
+    frames only apply the weights to the new point data.
+    """
+    if bounds is None:
+        bounds = get_ugrid_props(data)["bounds"]
+    return python_filter(
+        data,
+        "paraview_wrapper.utils.interp.resample_data",
+        kwargs=dict(
+            bounds=list(bounds),
+            dims=list(dims),
+            arrays=list(arrays),
+            fill_value=fill_value,
+        ),
+        info_func="paraview_wrapper.utils.interp.resample_info",
+        output_type="vtkImageData",
+        prefix="CachedResampleToImage",
+    )
+
+
+@profiled()
+def resolve_auto_colour_map(
+    settings,
+    data_dir,
+    varname,
+    basename="",
+    range_key="range",
+    percentiles_key="range_percentiles",
+):
+    """
+    Replace "auto" range and/or opacities in a settings dict (in place) with values
+    derived from the global stats of <varname>, which are computed once per file set and
+    cached.
+    """
+    auto_range_requested = settings.get(range_key) == "auto"
+    auto_opacities_requested = settings.get("opacities") == "auto"
+    if not (auto_range_requested or auto_opacities_requested):
+        return settings
+
+    fpaths, _ = find_vtu_paths(data_dir, basename=basename)
+    var_stats = get_series_stats(fpaths, [varname])[varname]
+    if auto_range_requested:
+        settings[range_key] = auto_range(var_stats, settings.get(percentiles_key))
+        print(f"Auto range for {varname}: {settings[range_key]}")
+    if auto_opacities_requested:
+        settings["opacities"] = auto_opacities(var_stats, settings[range_key])
+    return settings
+
+
+def cached_plot_over_line(data, pt1, pt2, resolution=1000, arrays=None):
+    """
+    Equivalent of PlotOverLine for data on a static mesh. The cells containing each
+    sample point and the interpolation weights are computed once per mesh and line, so
+    each subsequent timestep is just a gather. Runs as a programmable filter importing
+    this package, so it needs a local (or builtin) server.
+    """
+    return python_filter(
+        data,
+        "paraview_wrapper.utils.interp.sample_line_data",
+        kwargs=dict(
+            pt1=[float(c) for c in pt1],
+            pt2=[float(c) for c in pt2],
+            resolution=resolution,
+            arrays=arrays,
+        ),
+        output_type="vtkPolyData",
+        prefix="CachedLine",
+    )
+
+
+def difference_from_run(data, data_dir, varname, diff_data_dir, diff_settings={}):
+    """
+    Replace <varname> in <data> (a reader for the run in <data_dir>) with its difference
+    from the equivalent timestep of the run in <diff_data_dir>, computed one timestep at
+    a time. Timesteps are paired by index or by (physical) time.
+    """
+    int_diff_settings = dict(basename="", mode="abs", pairing="index")
+    int_diff_settings.update(diff_settings)
+
+    a_fpaths = list(data.FileName)
+    b_fpaths, _ = find_vtu_paths(diff_data_dir, basename=int_diff_settings["basename"])
+    if not b_fpaths:
+        raise RuntimeError(f"difference_from_run: No (p)vtu files in {diff_data_dir}")
+    a_times = b_times = None
+    if int_diff_settings["pairing"] == "time":
+        a_times = get_chk_times(data_dir, a_fpaths)
+        b_times = get_chk_times(diff_data_dir, b_fpaths)
+    paired_fpaths = pair_fpaths(
+        a_fpaths, b_fpaths, int_diff_settings["pairing"], a_times, b_times
+    )
+    return python_filter(
+        data,
+        "paraview_wrapper.utils.diff.difference_data",
+        kwargs=dict(
+            varname=varname, b_fpaths=paired_fpaths, mode=int_diff_settings["mode"]
+        ),
+        prefix="Difference",
+    )
@@ -0,0 +1,146 @@
+"""
+Expressions written in PythonCalculator syntax (referring to inputs[0].PointData[...]
+and inputs[0].Points), parsed and compiled once, then evaluated with NumPy directly on
+arrays. Point data arrays may be stacked along a leading time axis, so that a single
+evaluation covers many timesteps; point coordinates are assumed to be static.
+"""
+
+import ast
+import functools
+
+import numpy as np
+
+# Functions available to expressions (as in PythonCalculator, which exposes numpy)
+_EXPR_NAMESPACE = {k: getattr(np, k) for k in dir(np) if not k.startswith("_")}
+_POINTS_NAME = "_pyexpr_points"
+
+
+def _is_input0(node):
+    # Matches inputs[0]
+    return (
+        isinstance(node, ast.Subscript)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "inputs"
+        and isinstance(node.slice, ast.Constant)
+        and node.slice.value == 0
+    )
+
+
+class _InputRefReplacer(ast.NodeTransformer):
+    """
+    Replace inputs[0].PointData['name'] and inputs[0].Points with plain names, recording
+    which arrays are needed.
+    """
+
+    def __init__(self):
+        self.array_names = {}
+        self.uses_points = False
+
+    def visit_Subscript(self, node):
+        if (
+            isinstance(node.value, ast.Attribute)
+            and node.value.attr == "PointData"
+            and _is_input0(node.value.value)
+            and isinstance(node.slice, ast.Constant)
+            and isinstance(node.slice.value, str)
+        ):
+            array_name = node.slice.value
+            if array_name not in self.array_names:
+                self.array_names[array_name] = f"_pyexpr_arr{len(self.array_names)}"
+            return ast.copy_location(
+                ast.Name(id=self.array_names[array_name], ctx=ast.Load()), node
+            )
+        return self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if node.attr == "Points" and _is_input0(node.value):
+            self.uses_points = True
+            return ast.copy_location(ast.Name(id=_POINTS_NAME, ctx=ast.Load()), node)
+        return self.generic_visit(node)
+
+
+class PyExpr:
+    def __init__(self, name, expr, data_dir=None):
+        self.name = name
+        self.expr = expr
+        self.data_dir = data_dir
+
+        # Parse and compile once
+        tree = ast.parse(expr.strip(), mode="eval")
+        replacer = _InputRefReplacer()
+        tree = ast.fix_missing_locations(replacer.visit(tree))
+        unresolved = [
+            n for n in ast.walk(tree) if isinstance(n, ast.Name) and n.id == "inputs"
+        ]
+        if unresolved:
+            raise ValueError(
+                f"PyExpr {name}: only inputs[0].PointData['...'] and inputs[0].Points references are supported"
+            )
+        self._code = compile(tree, f"<PyExpr {name}>", "eval")
+        self._array_vars = replacer.array_names
+        self.array_names = list(replacer.array_names.keys())
+        self.uses_points = replacer.uses_points
+
+    def __getstate__(self):
+        # Code objects can't be pickled; recompile on unpickling instead
+        return dict(name=self.name, expr=self.expr, data_dir=self.data_dir)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def evaluate(self, point_data, points=None):
+        """
+        Evaluate with <point_data> (dict of arrays, shape (npts,) or (ntimes, npts)) and
+        <points> (shape (npts, 3)). The result has the broadcast shape of the inputs.
+        """
+        namespace = dict(_EXPR_NAMESPACE)
+        for array_name, var_name in self._array_vars.items():
+            namespace[var_name] = np.asarray(point_data[array_name])
+        if self.uses_points:
+            if points is None:
+                raise ValueError(f"PyExpr {self.name}: expression needs point coords")
+            namespace[_POINTS_NAME] = np.asarray(points)
+        return eval(self._code, namespace)
+
+
+@functools.lru_cache(maxsize=None)
+def get_pyexpr(name, expr):
+    """
+    Shared, compiled PyExpr instance for <expr>.
+    """
+    return PyExpr(name, expr)
+
+
+def clear_pyexpr_cache():
+    """
+    Discard the shared PyExpr instances.
+    """
+    get_pyexpr.cache_clear()
+
+
+def append_expr_array(algorithm, name, expr):
+    """
+    RequestData step for a programmable filter that evaluates <expr> on its input's
+    point data (typically a sampled line) and appends the result as array <name>.
+    """
+    from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+
+    inp = algorithm.GetInputDataObject(0, 0)
+    out = algorithm.GetOutputDataObject(0)
+    out.ShallowCopy(inp)
+
+    pyexpr = get_pyexpr(name, expr)
+    in_point_data = inp.GetPointData()
+    point_data = {
+        array_name: vtk_to_numpy(in_point_data.GetArray(array_name))
+        for array_name in pyexpr.array_names
+    }
+    points = vtk_to_numpy(inp.GetPoints().GetData())
+    # (Evaluating on a sampled line is cheap, so results aren't cached between frames)
+    vals = pyexpr.evaluate(point_data, points)
+    vals = np.ascontiguousarray(
+        np.broadcast_to(vals, (inp.GetNumberOfPoints(),)), dtype=float
+    )
+    vtk_arr = numpy_to_vtk(vals, deep=1)
+    vtk_arr.SetName(name)
+    out.GetPointData().AddArray(vtk_arr)
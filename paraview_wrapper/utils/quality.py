@@ -0,0 +1,52 @@
+import os.path
+
+# Cuts applied for each render quality level.
+#   resolution_scale : factor applied to the output image resolution
+#   resample_dims    : sampling dimensions used to resample volume renders onto an image
+#   decimation       : target reduction for surface renders (fraction of triangles removed)
+#   particle_stride  : only every nth particle is rendered
+#   frame_stride     : only every nth frame is rendered (frame rate reduced to match)
+QUALITY_LEVELS = dict(
+    full=dict(
+        resolution_scale=1.0,
+        resample_dims=None,
+        decimation=0.0,
+        particle_stride=1,
+        frame_stride=1,
+    ),
+    preview=dict(
+        resolution_scale=0.5,
+        resample_dims=[64, 64, 64],
+        decimation=0.75,
+        particle_stride=10,
+        frame_stride=4,
+    ),
+)
+
+QUALITY_LABELS = dict(full="", preview="quicklook")
+
+
+def get_quality_settings(quality, user_settings={}):
+    if quality not in QUALITY_LEVELS:
+        raise ValueError(
+            f"get_quality_settings: quality must be one of {list(QUALITY_LEVELS.keys())} (got {quality})"
+        )
+    settings = dict(QUALITY_LEVELS[quality])
+    settings.update(user_settings)
+    return settings
+
+
+def label_output_fname(fname, quality):
+    """
+    Append a quality label to <fname> (before the extension), so that low quality
+    outputs can't be mistaken for (or overwrite) full quality ones.
+    """
+    lbl = QUALITY_LABELS.get(quality, quality)
+    if not lbl:
+        return fname
+    root, ext = os.path.splitext(fname)
+    return f"{root}_{lbl}{ext}"
+
+
+def scale_resolution(res, fac):
+    return [max(int(round(v * fac)), 1) for v in res]
@@ -0,0 +1,169 @@
+"""
+Scalar reductions (min, max, mean, integrals, ...) of point data, computed for every
+timestep in a streaming pass over the files, distributed across processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import os
+
+import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkFiltersVerdict import vtkCellSizeFilter
+
+from .interp import get_mesh_digest
+from .pyexpr import PyExpr
+from .vtu_io import get_point_arrays, read_vtu
+
+# Reductions that need point volumes are volume-weighted
+VOLUME_WEIGHTED_REDUCTIONS = ["integral", "mean"]
+REDUCTIONS = ["abs_max", "integral", "max", "mean", "min", "rms", "sum"]
+
+# Point volumes, per process, keyed on mesh digest (coordinates and connectivity)
+_point_volumes_cache = {}
+
+
+def get_point_volumes(ugrid):
+    """
+    Lumped volume associated with each point: every cell's size (length, area or volume,
+    depending on its dimension) is shared equally between its points.
+    """
+    key = get_mesh_digest(ugrid)
+    if key in _point_volumes_cache:
+        return _point_volumes_cache[key]
+
+    size_filter = vtkCellSizeFilter()
+    size_filter.SetInputData(ugrid)
+    size_filter.Update()
+    cell_data = size_filter.GetOutput().GetCellData()
+    # Only the size matching each cell's dimension is non-zero
+    cell_sizes = sum(
+        [
+            vtk_to_numpy(cell_data.GetArray(name))
+            for name in ["Length", "Area", "Volume"]
+        ]
+    )
+
+    cells = ugrid.GetCells()
+    connectivity = vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64)
+    offsets = vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64)
+    npts_per_cell = np.diff(offsets)
+    point_volumes = np.zeros(ugrid.GetNumberOfPoints())
+    np.add.at(
+        point_volumes,
+        connectivity,
+        np.repeat(cell_sizes / npts_per_cell, npts_per_cell),
+    )
+    _point_volumes_cache[key] = point_volumes
+    return point_volumes
+
+
+def parse_reductions(reductions):
+    """
+    Validate a dict mapping output column names to (reduction, quantity) pairs, where the
+    quantity is a point array name or a PyExpr.
+    """
+    parsed = {}
+    for col_name, (op, quantity) in reductions.items():
+        if op not in REDUCTIONS:
+            raise ValueError(
+                f"parse_reductions: unknown reduction '{op}' for {col_name}; choose from {REDUCTIONS}"
+            )
+        if not isinstance(quantity, (str, PyExpr)):
+            raise TypeError(
+                f"parse_reductions: quantity for {col_name} must be an array name or a PyExpr"
+            )
+        parsed[col_name] = (op, quantity)
+    return parsed
+
+
+def get_required_arrays(reductions):
+    arrays = set()
+    for op, quantity in reductions.values():
+        if isinstance(quantity, PyExpr):
+            arrays.update(quantity.array_names)
+        else:
+            arrays.add(quantity)
+    return sorted(arrays)
+
+
+def apply_reduction(op, vals, point_volumes=None):
+    if op == "abs_max":
+        return float(np.max(np.abs(vals)))
+    elif op == "integral":
+        return float(np.dot(point_volumes, vals))
+    elif op == "max":
+        return float(np.max(vals))
+    elif op == "mean":
+        return float(np.dot(point_volumes, vals) / point_volumes.sum())
+    elif op == "min":
+        return float(np.min(vals))
+    elif op == "rms":
+        return float(np.sqrt(np.mean(vals**2)))
+    elif op == "sum":
+        return float(np.sum(vals))
+    raise ValueError(f"apply_reduction: unknown reduction '{op}'")
+
+
+def reduce_file(fpath, reductions):
+    """
+    Compute all <reductions> for a single (p)vtu file.
+    """
+    ugrid = read_vtu(fpath, arrays=get_required_arrays(reductions))
+    point_data = get_point_arrays(ugrid, get_required_arrays(reductions))
+    points = None
+    point_volumes = None
+    if any([op in VOLUME_WEIGHTED_REDUCTIONS for op, _ in reductions.values()]):
+        point_volumes = get_point_volumes(ugrid)
+
+    result = {}
+    for col_name, (op, quantity) in reductions.items():
+        if isinstance(quantity, PyExpr):
+            if quantity.uses_points and points is None:
+                points = vtk_to_numpy(ugrid.GetPoints().GetData())
+            vals = np.broadcast_to(
+                quantity.evaluate(point_data, points), (ugrid.GetNumberOfPoints(),)
+            )
+        else:
+            vals = point_data[quantity]
+        result[col_name] = apply_reduction(op, vals, point_volumes)
+    return result
+
+
+def reduce_files(fpaths, reductions, nprocs=None):
+    """
+    Compute <reductions> for every file in <fpaths>, in parallel over files.
+    Returns a dict mapping column names to arrays with one value per file.
+    """
+    reductions = parse_reductions(reductions)
+    nprocs = os.cpu_count() if nprocs is None else nprocs
+    results = {col_name: np.zeros(len(fpaths)) for col_name in reductions}
+    with ProcessPoolExecutor(max_workers=max(nprocs, 1)) as executor:
+        file_results = executor.map(
+            reduce_file,
+            fpaths,
+            [reductions] * len(fpaths),
+            chunksize=max(len(fpaths) // (4 * max(nprocs, 1)), 1),
+        )
+        for ifile, file_result in enumerate(file_results):
+            for col_name, val in file_result.items():
+                results[col_name][ifile] = val
+            print(f"reduce_files: processed {ifile+1}/{len(fpaths)} files", end="\r")
+    print()
+    return results
+
+
+def write_time_series(fpath, times, results):
+    """
+    Write reduction results to .csv (one row per timestep) or .npz.
+    """
+    if fpath.endswith(".npz"):
+        np.savez(fpath, time=times, **results)
+    else:
+        col_names = list(results.keys())
+        with open(fpath, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["time"] + col_names)
+            for itime, t in enumerate(times):
+                writer.writerow([t] + [results[c][itime] for c in col_names])
+    print(f"Wrote time series to {fpath}")
@@ -0,0 +1,156 @@
+"""
+Global statistics (min, max, percentiles, histograms) of point arrays across all
+timesteps of a run, computed in a single streaming pass and cached per file set.
+"""
+
+import hashlib
+import json
+import os.path
+
+import numpy as np
+
+from .locations import get_cache_fpath
+from .vtu_io import read_point_arrays
+
+# Number of quantiles / histogram bins kept per file; these are merged to get the
+# global percentiles and histogram
+_NQUANTILES_PER_FILE = 1001
+_NBINS_PER_FILE = 1024
+
+
+def _file_set_key(fpaths, nbins):
+    hasher = hashlib.sha1(f"nbins={nbins}".encode())
+    for fpath in fpaths:
+        stat = os.stat(fpath)
+        hasher.update(
+            f"{os.path.abspath(fpath)}:{stat.st_mtime}:{stat.st_size}".encode()
+        )
+    return hasher.hexdigest()
+
+
+def _file_stats(vals):
+    vals = vals[np.isfinite(vals)]
+    if vals.size == 0:
+        return None
+    vmin = float(vals.min())
+    vmax = float(vals.max())
+    counts, edges = np.histogram(
+        vals, bins=_NBINS_PER_FILE, range=(vmin, vmax if vmax > vmin else vmin + 1)
+    )
+    return dict(
+        count=int(vals.size),
+        min=vmin,
+        max=vmax,
+        mean=float(vals.mean()),
+        quantiles=np.quantile(vals, np.linspace(0.0, 1.0, _NQUANTILES_PER_FILE)),
+        hist_centres=0.5 * (edges[1:] + edges[:-1]),
+        hist_counts=counts,
+    )
+
+
+def _merge_file_stats(file_stats, nbins):
+    valid_stats = [fs for fs in file_stats if fs is not None]
+    if not valid_stats:
+        raise RuntimeError("No finite values found")
+    vmin = min([fs["min"] for fs in valid_stats])
+    vmax = max([fs["max"] for fs in valid_stats])
+
+    # Percentiles from the per-file quantiles, each weighted by the file's point count
+    quantiles = np.concatenate([fs["quantiles"] for fs in valid_stats])
+    weights = np.concatenate(
+        [np.full(_NQUANTILES_PER_FILE, fs["count"]) for fs in valid_stats]
+    )
+    order = np.argsort(quantiles)
+    cum_weights = np.cumsum(weights[order]) / weights.sum()
+    pcts = np.arange(101)
+    pct_vals = np.interp(pcts / 100.0, cum_weights, quantiles[order])
+    pct_vals[0] = vmin
+    pct_vals[-1] = vmax
+
+    # Global histogram by rebinning the per-file histograms
+    hist_counts, hist_edges = np.histogram(
+        np.concatenate([fs["hist_centres"] for fs in valid_stats]),
+        bins=nbins,
+        range=(vmin, vmax if vmax > vmin else vmin + 1),
+        weights=np.concatenate([fs["hist_counts"] for fs in valid_stats]),
+    )
+    return dict(
+        min=vmin,
+        max=vmax,
+        percentiles=[float(v) for v in pct_vals],
+        hist_edges=[float(v) for v in hist_edges],
+        hist_counts=[int(v) for v in hist_counts],
+        step_min=[fs["min"] if fs else None for fs in file_stats],
+        step_max=[fs["max"] if fs else None for fs in file_stats],
+        step_mean=[fs["mean"] if fs else None for fs in file_stats],
+    )
+
+
+def compute_series_stats(fpaths, varnames, nbins=256):
+    """
+    Stream through <fpaths> one file at a time, returning global stats for each of
+    <varnames>. Percentiles are stored for every integer percentile 0-100.
+    """
+    file_stats = {varname: [] for varname in varnames}
+    for ifile, fpath in enumerate(fpaths):
+        arrs = read_point_arrays(fpath, varnames)
+        for varname in varnames:
+            file_stats[varname].append(_file_stats(np.ravel(arrs[varname])))
+        print(
+            f"compute_series_stats: processed {ifile+1}/{len(fpaths)} files", end="\r"
+        )
+    print()
+    return {
+        varname: _merge_file_stats(file_stats[varname], nbins) for varname in varnames
+    }
+
+
+def get_series_stats(fpaths, varnames, nbins=256, use_cache=True):
+    """
+    Return global stats for <varnames> over <fpaths>, reading the files only for
+    variables that aren't in the cache for this file set.
+    """
+    cache_fpath = get_cache_fpath(f"series_stats_{_file_set_key(fpaths, nbins)}.json")
+    stats = {}
+    if use_cache and os.path.isfile(cache_fpath):
+        with open(cache_fpath) as cache_file:
+            stats = json.load(cache_file)
+    missing = [varname for varname in varnames if varname not in stats]
+    if missing:
+        stats.update(compute_series_stats(fpaths, missing, nbins=nbins))
+        with open(cache_fpath, "w") as cache_file:
+            json.dump(stats, cache_file)
+    return {varname: stats[varname] for varname in varnames}
+
+
+def get_percentile(var_stats, pct):
+    """
+    Percentile from cached stats (linearly interpolated between integer percentiles).
+    """
+    return float(np.interp(pct, np.arange(101), var_stats["percentiles"]))
+
+
+def auto_range(var_stats, percentiles=None):
+    """
+    Colour map range from stats: [min, max], or the values at a pair of percentiles.
+    """
+    if percentiles is None:
+        return [var_stats["min"], var_stats["max"]]
+    else:
+        return [get_percentile(var_stats, pct) for pct in percentiles]
+
+
+def auto_opacities(var_stats, vrange):
+    """
+    Opacity points based on the data distribution. Ranges that straddle zero get a
+    symmetric map that is transparent at zero; others ramp from transparent at the
+    median to opaque at the top of the range.
+    """
+    lo, hi = vrange
+    if lo < 0.0 < hi:
+        return [(lo, 1.0), (0.0, 0.0), (hi, 1.0)]
+    median = min(max(get_percentile(var_stats, 50), lo), hi)
+    p90 = min(max(get_percentile(var_stats, 90), median), hi)
+    pts = [(lo, 0.0), (median, 0.0), (p90, 0.5), (hi, 1.0)]
+    # Drop any coincident points
+    return [pt for ii, pt in enumerate(pts) if ii == 0 or pt[0] > pts[ii - 1][0]]
@@ -1,5 +1,13 @@
+import glob
 import os
 import os.path
+import sys
+
+from .locations import get_cache_fpath
+
+# site-packages dir that made paraview importable, once found
+_paraview_path = None
+
 
 def get_desktop_dir():
     loc = ""
@@ -9,3 +17,69 @@ def get_desktop_dir():
         return loc
     else:
         raise (RuntimeError("get_desktop_dir: Desktop dir not found"))
+
+
+def _paraview_importable():
+    try:
+        import paraview
+
+        return True
+    except:
+        return False
+
+
+def _try_paraview_path(path):
+    if not path or not os.path.isdir(path):
+        return False
+    added = path not in sys.path
+    if added:
+        sys.path.append(path)
+    if _paraview_importable():
+        return True
+    # Don't leave a path that didn't work on sys.path
+    if added:
+        sys.path.remove(path)
+    return False
+
+
+def find_paraview():
+    """
+    Make paraview importable, if it isn't already (e.g. via PYTHONPATH). Tries
+    $PARAVIEW_ROOT/lib/python*/site-packages, then the site-packages dir found by a
+    previous call (cached on disk), so that changing PARAVIEW_ROOT takes effect.
+    """
+    global _paraview_path
+    if _paraview_path is not None or _paraview_importable():
+        _paraview_path = _paraview_path or ""
+        return _paraview_path
+
+    try:
+        cache_fpath = get_cache_fpath("paraview_path.txt")
+    except OSError:
+        cache_fpath = None
+
+    # Try and find via environment variable
+    paraview_root = os.getenv("PARAVIEW_ROOT")
+    if paraview_root:
+        for path in glob.glob(os.path.join(paraview_root, "lib/python*/site-packages")):
+            if _try_paraview_path(path):
+                _paraview_path = path
+                # Caching the path is only an optimisation
+                if cache_fpath is not None:
+                    try:
+                        with open(cache_fpath, "w") as f:
+                            f.write(path)
+                    except OSError:
+                        pass
+                return _paraview_path
+
+    if cache_fpath is not None and os.path.isfile(cache_fpath):
+        with open(cache_fpath) as f:
+            cached_path = f.read().strip()
+        if _try_paraview_path(cached_path):
+            _paraview_path = cached_path
+            return _paraview_path
+
+    raise ModuleNotFoundError(
+        "Unable to find paraview - add <paraview>/lib/python*/site-packages to your PYTHONPATH or define PARAVIEW_ROOT env var."
+    )
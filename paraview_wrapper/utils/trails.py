@@ -0,0 +1,140 @@
+"""
+Particle trails: polylines through the positions of each particle over the last K
+steps of an H5Part file. Positions are kept in a ring buffer, matched by particle id,
+so that advancing one step only requires reading that step.
+"""
+
+from collections import deque
+
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+
+from .h5part import get_h5part_steps, read_h5part_positions, read_h5part_step
+
+TRAIL_AGE_ARRAY_NAME = "trail_age"
+
+# Ring buffers, keyed on (fpath, trail_len, id_name)
+_trail_buffers = {}
+
+
+class TrailBuffer:
+    """
+    The (id-sorted) ids and positions of particles in the last <trail_len> steps.
+    """
+
+    def __init__(self, fpath, trail_len, id_name):
+        self.fpath = fpath
+        self.id_name = id_name
+        self.steps = get_h5part_steps(fpath)
+        self.entries = deque(maxlen=trail_len)
+        self.last_idx = None
+
+    def _read(self, idx):
+        step = self.steps[idx]
+        ids = read_h5part_step(self.fpath, step, [self.id_name])[self.id_name]
+        pos = read_h5part_positions(self.fpath, step)
+        if pos.shape[1] == 2:
+            pos = np.column_stack([pos, np.zeros(pos.shape[0])])
+        order = np.argsort(ids, kind="stable")
+        return ids[order], pos[order]
+
+    def advance_to(self, idx):
+        """
+        Update the buffer so that its newest entry is step index <idx>. Stepping forward
+        by one only reads the new step; any other seek refills the buffer.
+        """
+        if idx == self.last_idx:
+            return
+        if self.last_idx is not None and idx == self.last_idx + 1:
+            self.entries.append(self._read(idx))
+        else:
+            self.entries.clear()
+            first_idx = max(idx - self.entries.maxlen + 1, 0)
+            for ii in range(first_idx, idx + 1):
+                self.entries.append(self._read(ii))
+        self.last_idx = idx
+
+    def polylines(self):
+        """
+        Points, line offsets and connectivity for the trails of particles present in the
+        newest step. Each trail runs through consecutive steps in which the particle is
+        present; particles present for fewer than 2 steps have no trail.
+        """
+        cur_ids, cur_pos = self.entries[-1]
+        nsteps = len(self.entries)
+        npart = cur_ids.size
+        pos = np.zeros((nsteps, npart, 3))
+        present = np.zeros((nsteps, npart), dtype=bool)
+        for istep, (ids, step_pos) in enumerate(self.entries):
+            if ids.size == 0:
+                continue
+            idx = np.minimum(np.searchsorted(ids, cur_ids), ids.size - 1)
+            present[istep] = ids[idx] == cur_ids
+            pos[istep] = step_pos[idx]
+
+        # Only keep the unbroken run of steps ending at the newest one
+        in_trail = np.flip(np.cumprod(np.flip(present, axis=0), axis=0), axis=0)
+        in_trail = in_trail.astype(bool)
+        lengths = in_trail.sum(axis=0)
+        has_trail = lengths >= 2
+        in_trail &= has_trail[np.newaxis, :]
+
+        # Particle-major ordering, oldest to newest along each trail
+        pts = pos.transpose(1, 0, 2)[in_trail.T]
+        # Age is 0 at the newest position, 1 at the oldest buffered one
+        step_ages = np.arange(nsteps - 1, -1, -1, dtype=float) / max(nsteps - 1, 1)
+        ages = np.broadcast_to(step_ages, (npart, nsteps))[in_trail.T]
+        offsets = np.concatenate([[0], np.cumsum(lengths[has_trail])]).astype(np.int64)
+        connectivity = np.arange(pts.shape[0], dtype=np.int64)
+        return pts, ages, offsets, connectivity
+
+
+def get_trail_buffer(fpath, trail_len, id_name):
+    key = (fpath, trail_len, id_name)
+    if key not in _trail_buffers:
+        _trail_buffers[key] = TrailBuffer(fpath, trail_len, id_name)
+    return _trail_buffers[key]
+
+
+def trails_info(algorithm, fpath, trail_len, id_name):
+    """
+    RequestInformation step for a programmable source generating particle trails.
+    Time values are step indices (as H5PartReader).
+    """
+    nsteps = len(get_trail_buffer(fpath, trail_len, id_name).steps)
+    out_info = algorithm.GetExecutive().GetOutputInformation(0)
+    times = [float(t) for t in range(nsteps)]
+    out_info.Set(vtkStreamingDemandDrivenPipeline.TIME_STEPS(), times, len(times))
+    out_info.Set(
+        vtkStreamingDemandDrivenPipeline.TIME_RANGE(), [times[0], times[-1]], 2
+    )
+
+
+def trails_data(algorithm, fpath, trail_len, id_name):
+    """
+    RequestData step for a programmable source generating particle trails.
+    """
+    buffer = get_trail_buffer(fpath, trail_len, id_name)
+    out_info = algorithm.GetOutputInformation(0)
+    time_key = vtkStreamingDemandDrivenPipeline.UPDATE_TIME_STEP()
+    idx = int(round(out_info.Get(time_key))) if out_info.Has(time_key) else 0
+    buffer.advance_to(min(max(idx, 0), len(buffer.steps) - 1))
+    pts, ages, offsets, connectivity = buffer.polylines()
+
+    polydata = algorithm.GetOutputDataObject(0)
+    vtk_pts = vtkPoints()
+    vtk_pts.SetData(numpy_to_vtk(np.ascontiguousarray(pts), deep=1))
+    polydata.SetPoints(vtk_pts)
+    lines = vtkCellArray()
+    lines.SetData(
+        numpy_to_vtkIdTypeArray(offsets, deep=1),
+        numpy_to_vtkIdTypeArray(connectivity, deep=1),
+    )
+    polydata.SetLines(lines)
+    vtk_ages = numpy_to_vtk(np.ascontiguousarray(ages), deep=1)
+    vtk_ages.SetName(TRAIL_AGE_ARRAY_NAME)
+    polydata.GetPointData().AddArray(vtk_ages)
+    polydata.GetPointData().SetActiveScalars(TRAIL_AGE_ARRAY_NAME)
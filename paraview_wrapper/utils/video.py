@@ -1,7 +1,10 @@
 import ffmpeg
 import os.path
 
+from .profiling import profiled
 
+
+@profiled()
 def avi_to_gif(
     common_dir,
     fbase,
@@ -29,6 +32,7 @@ def avi_to_gif(
     ).run(overwrite_output=overwrite_output)
 
 
+@profiled()
 def avi_to_mp4(
     common_dir,
     fbase,
@@ -52,3 +56,35 @@ def avi_to_mp4(
     ffmpeg.input(fpath_in, f="avi").output(
         fpath_out, f="mp4", **ffmpeg_output_options_int
     ).run(overwrite_output=overwrite_output)
+
+
+@profiled()
+def frames_to_movie(
+    frame_fpaths,
+    fpath_out,
+    frame_rate,
+    overwrite_output=True,
+    ffmpeg_output_options={},
+):
+    """
+    Assemble a movie from a list of image paths, in the order given.
+    """
+    if not frame_fpaths:
+        raise ValueError("frames_to_movie: No frames supplied")
+    # Use ffmpeg's concat demuxer so that the frames needn't be numbered contiguously
+    list_fpath = os.path.splitext(fpath_out)[0] + "_frames.txt"
+    frame_duration = 1.0 / frame_rate
+    with open(list_fpath, "w") as list_file:
+        for fpath in frame_fpaths:
+            list_file.write(f"file '{os.path.abspath(fpath)}'\n")
+            list_file.write(f"duration {frame_duration}\n")
+        # Last entry needs repeating, otherwise its duration is ignored
+        list_file.write(f"file '{os.path.abspath(frame_fpaths[-1])}'\n")
+    ffmpeg_output_options_int = dict(r=frame_rate, vf="pad=ceil(iw/2)*2:ceil(ih/2)*2")
+    ffmpeg_output_options_int.update(ffmpeg_output_options)
+    try:
+        ffmpeg.input(list_fpath, f="concat", safe=0).output(
+            fpath_out, **ffmpeg_output_options_int
+        ).run(overwrite_output=overwrite_output)
+    finally:
+        os.remove(list_fpath)
@@ -0,0 +1,50 @@
+"""
+Direct (non-pipeline) reading of Nektar (p)vtu output, for passes over every timestep
+that don't need to render anything.
+"""
+
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkIOXML import (
+    vtkXMLPUnstructuredGridReader,
+    vtkXMLUnstructuredGridReader,
+)
+
+
+def get_vtu_reader(fpath):
+    if fpath.endswith(".pvtu"):
+        reader = vtkXMLPUnstructuredGridReader()
+    else:
+        reader = vtkXMLUnstructuredGridReader()
+    reader.SetFileName(fpath)
+    return reader
+
+
+def read_vtu(fpath, arrays=None):
+    """
+    Read a single (p)vtu file. If <arrays> is set, only those point arrays are read.
+    """
+    reader = get_vtu_reader(fpath)
+    reader.UpdateInformation()
+    if arrays is not None:
+        point_array_selection = reader.GetPointDataArraySelection()
+        point_array_selection.DisableAllArrays()
+        for name in arrays:
+            point_array_selection.EnableArray(name)
+        reader.GetCellDataArraySelection().DisableAllArrays()
+    reader.Update()
+    return reader.GetOutput()
+
+
+def get_point_arrays(ugrid, arrays):
+    point_data = ugrid.GetPointData()
+    result = {}
+    for name in arrays:
+        vtk_arr = point_data.GetArray(name)
+        if vtk_arr is None:
+            raise KeyError(f"get_point_arrays: No point array named {name}")
+        result[name] = vtk_to_numpy(vtk_arr)
+    return result
+
+
+def read_point_arrays(fpath, arrays):
+    return get_point_arrays(read_vtu(fpath, arrays), arrays)